@@ -1 +1 @@
-__all__ = ["cli", "pld", "report"]
\ No newline at end of file
+__all__ = ["api", "benchmark", "cache", "cli", "inputs", "journal", "manifest", "metrics", "pld", "report", "server", "store", "workqueue"]
\ No newline at end of file
@@ -0,0 +1,113 @@
+import itertools
+import tempfile
+
+from contextlib import contextmanager
+from pathlib import Path
+from typing import BinaryIO, Iterable, Iterator, List, Union
+
+from src.metrics import StageTimings
+from src.pld import PdfLanguageDetector
+from src.store import MemoryStore
+
+# A PDF file given by its path, its content, or a binary file object to read it from
+Document = Union[str, Path, bytes, BinaryIO]
+
+class InMemoryDetector:
+    # Options of PdfLanguageDetector changing how the pages are analysed. The others
+    # read or write the output directory, or schedule the PDF files of a run.
+    OPTIONS = ('text_layer', 'min_text_chars', 'ocr_backend', 'confidence_margin', 'script_detection',
+               'narrow_after', 'narrow_langs', 'narrow_min_confidence', 'dpi', 'color', 'crop', 'adaptive_dpi',
+               'skip_blank_pages', 'skip_duplicate_pages', 'weighting')
+
+    def __init__(self, languages: List[str], max_pages: int = 5, **options):
+        """
+        Initialize the InMemoryDetector class, which detects the language of PDF files
+        given by another program and returns the results without an output directory.
+        The Lingua model and the OCR engine are loaded once and reused by every call.
+
+        Args:
+            languages: List of ISO3 language codes.
+            max_pages: Maximum number of pages to process per PDF file.
+            **options: Options of PdfLanguageDetector (see OPTIONS).
+
+        Raises:
+            ValueError: If an option isn't one of OPTIONS.
+        """
+        for name in options:
+            if name not in InMemoryDetector.OPTIONS:
+                raise ValueError(f"{name} can't be used in memory, options are: {', '.join(InMemoryDetector.OPTIONS)}")
+        self.detector = PdfLanguageDetector(languages, Path(), Path(), max_pages, store=MemoryStore.STORE_NAME,
+                                            **options)
+        self.counter = itertools.count(1)
+
+    @contextmanager
+    def open_document(self, document: Document) -> Iterator[Path]:
+        """
+        Get a path to a PDF file for the poppler tools. The content of a PDF file given
+        in memory is written to a temporary file, deleted once the file is analysed.
+
+        Args:
+            document: Path, content or binary file object of the PDF file.
+
+        Returns:
+            A context manager giving the path to the PDF file.
+        """
+        if isinstance(document, (str, Path)):
+            yield Path(document)
+            return
+        content = document if isinstance(document, bytes) else document.read()
+        with tempfile.NamedTemporaryFile(prefix='pld-', suffix='.pdf') as pdf_file:
+            pdf_file.write(content)
+            pdf_file.flush()
+            yield Path(pdf_file.name)
+
+    def detect(self, document: Document) -> dict:
+        """
+        Detect the language of a PDF file.
+
+        Args:
+            document: Path, content or binary file object of the PDF file.
+
+        Returns:
+            The result with the detected language (lang), the average coefficient of each
+            language (avgs), the language information of each page (pages), the number of
+            pages used (pages_used) and of pages skipped by reason (pages_skipped), and the
+            time spent in each stage (timings, see StageTimings).
+
+        Raises:
+            ErrorReturnCode: If the PDF file can't be read by the poppler tools, as raised by sh.
+        """
+        store = self.detector.store
+        # Only identifies the document in the memory store
+        output_file_dir = Path(f'document-{next(self.counter)}')
+        stage_timings = StageTimings()
+        try:
+            with self.open_document(document) as input_file, stage_timings.activate():
+                store.save_meta(output_file_dir, dict())
+                coeff_avgs = self.detector.analyse_pages(input_file, output_file_dir)
+                lang = self.detector.aggregate_pages(output_file_dir, coeff_avgs)
+            meta = store.get_meta(output_file_dir)
+            return dict(status=PdfLanguageDetector.STATUS_DONE, lang=lang, avgs=store.get_avgs(output_file_dir),
+                        pages=[dict(name=page['name'], langs=page['langs']) for page in store.get_pages(output_file_dir)],
+                        pages_used=meta['pages_used'], pages_skipped=meta['pages_skipped'],
+                        timings=stage_timings.to_dict())
+        finally:
+            store.delete(output_file_dir)
+
+    def detect_batch(self, documents: Iterable[Document]) -> Iterator[dict]:
+        """
+        Detect the language of several PDF files, one after the other. A PDF file
+        which can't be analysed doesn't stop the batch.
+
+        Args:
+            documents: Paths, contents or binary file objects of the PDF files.
+
+        Returns:
+            An iterator of results in the order of the documents (see detect), with a
+            FAILED status and the error for the PDF files which couldn't be analysed.
+        """
+        for document in documents:
+            try:
+                yield self.detect(document)
+            except Exception as error:
+                yield dict(status=PdfLanguageDetector.STATUS_FAILED, error=repr(error))
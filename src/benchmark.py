@@ -0,0 +1,692 @@
+import io
+import json
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+
+from multiprocessing import Process, Queue
+from queue import Empty
+from pathlib import Path
+from PIL import Image, ImageDraw, ImageFont
+from rich import print
+from src.pld import PdfLanguageDetector
+from typing import Callable, Iterator, List, Optional
+
+# A4 pages, in points
+PAGE_WIDTH = 595
+PAGE_HEIGHT = 842
+# Fonts tried in order to draw scanned pages (fonts-dejavu-core on Debian)
+SCANNED_PAGE_FONTS = ('DejaVuSans.ttf', 'DejaVuSans')
+
+class PdfWriter:
+    """
+    Minimal PDF writer for the benchmark corpus: pages with a text layer (in a
+    standard font, so only for languages written with Windows-1252 characters),
+    pages with a single JPEG image, and blank pages.
+    """
+    FONT_SIZE = 11
+    LINE_HEIGHT = 14
+    MARGIN = 50
+
+    def __init__(self):
+        # Object bodies, numbered from 1. The catalog, pages tree and font come first.
+        self.objects = [None, None, b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>']
+        self.pages = []
+
+    def add_object(self, body: bytes) -> int:
+        """
+        Add an object to the document.
+
+        Args:
+            body: Body of the object.
+
+        Returns:
+            The number of the object.
+        """
+        self.objects.append(body)
+        return len(self.objects)
+
+    def add_stream(self, data: bytes, attributes: str = '') -> int:
+        """
+        Add a stream object to the document.
+
+        Args:
+            data: Data of the stream.
+            attributes: Attributes of the stream dictionary, besides its length.
+
+        Returns:
+            The number of the object.
+        """
+        header = f'<< {attributes} /Length {len(data)} >>\nstream\n'.encode('ascii')
+        return self.add_object(header + data + b'\nendstream')
+
+    def add_page(self, content: bytes = b'', resources: str = ''):
+        """
+        Add a page to the document.
+
+        Args:
+            content: Content stream of the page.
+            resources: Resources dictionary of the page.
+        """
+        content_id = self.add_stream(content)
+        self.pages.append(self.add_object(f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] '
+                                          f'/Resources << {resources} >> /Contents {content_id} 0 R >>'.encode('ascii')))
+
+    def add_text_page(self, lines: List[str]):
+        """
+        Add a page with a text layer.
+
+        Args:
+            lines: Lines of text of the page.
+        """
+        content = [f'BT /F1 {self.FONT_SIZE} Tf {self.LINE_HEIGHT} TL {self.MARGIN} {PAGE_HEIGHT - self.MARGIN} Td'.encode('ascii')]
+        for line in lines:
+            escaped = line.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+            content.append(b'(' + escaped.encode('cp1252') + b") '")
+        content.append(b'ET')
+        self.add_page(b'\n'.join(content), '/Font << /F1 3 0 R >>')
+
+    def add_image_page(self, image: Image.Image):
+        """
+        Add a page covered by an image, as a scanned page.
+
+        Args:
+            image: Image of the page, in grayscale.
+        """
+        data = io.BytesIO()
+        image.save(data, format='JPEG', quality=75)
+        image_id = self.add_stream(data.getvalue(), f'/Type /XObject /Subtype /Image /Width {image.width} '
+                                                    f'/Height {image.height} /ColorSpace /DeviceGray '
+                                                    '/BitsPerComponent 8 /Filter /DCTDecode')
+        content = f'q {PAGE_WIDTH} 0 0 {PAGE_HEIGHT} 0 0 cm /Im1 Do Q'.encode('ascii')
+        self.add_page(content, f'/XObject << /Im1 {image_id} 0 R >>')
+
+    def write(self, pdf_file: Path):
+        """
+        Write the document.
+
+        Args:
+            pdf_file: Path to the PDF file.
+        """
+        kids = ' '.join(f'{page} 0 R' for page in self.pages)
+        self.objects[0] = b'<< /Type /Catalog /Pages 2 0 R >>'
+        self.objects[1] = f'<< /Type /Pages /Kids [{kids}] /Count {len(self.pages)} >>'.encode('ascii')
+        output = io.BytesIO()
+        output.write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        offsets = []
+        for number, body in enumerate(self.objects, start=1):
+            offsets.append(output.tell())
+            output.write(f'{number} 0 obj\n'.encode('ascii') + body + b'\nendobj\n')
+        xref = output.tell()
+        output.write(f'xref\n0 {len(self.objects) + 1}\n0000000000 65535 f \n'.encode('ascii'))
+        for offset in offsets:
+            output.write(f'{offset:010d} 00000 n \n'.encode('ascii'))
+        output.write(f'trailer\n<< /Size {len(self.objects) + 1} /Root 1 0 R >>\n'
+                     f'startxref\n{xref}\n%%EOF\n'.encode('ascii'))
+        pdf_file.write_bytes(output.getvalue())
+
+
+class Corpus:
+    """
+    Reproducible multilingual corpus of PDF files, with the language of each
+    document and page as ground truth.
+    """
+    GROUND_TRUTH_FILE = 'ground_truth.json'
+    # Born-digital PDF files with a text layer
+    KIND_TEXT = 'text'
+    # Scanned PDF files: slightly rotated and noisy images of text, to OCR
+    KIND_IMAGE = 'image'
+    # Scanned PDF files with blank pages between the pages of text
+    KIND_BLANK = 'blank'
+    # PDF files with pages in two languages, mixing text layers and images
+    KIND_MIXED = 'mixed'
+    KINDS = (KIND_TEXT, KIND_IMAGE, KIND_BLANK, KIND_MIXED)
+    # Minimum number of characters of a page of text
+    PAGE_CHARS = 700
+    LINE_CHARS = 80
+    # Resolution of the images of scanned pages
+    IMAGE_DPI = 100
+    SENTENCES = {
+        'eng': [
+            "The committee will meet again next week to review the annual budget.",
+            "Several witnesses described the events of that night in great detail.",
+            "According to the report, the company transferred the funds through three banks.",
+            "The new regulations come into force at the beginning of the next fiscal year.",
+            "Most of the documents were signed by the director of the foundation.",
+            "The journalists spent months comparing the contracts with public records.",
+            "Farmers in the region are worried about the lack of rain this summer.",
+            "The minister refused to answer questions about the offshore accounts.",
+        ],
+        'fra': [
+            "Le comité se réunira de nouveau la semaine prochaine pour examiner le budget annuel.",
+            "Plusieurs témoins ont décrit les événements de cette nuit avec beaucoup de détails.",
+            "Selon le rapport, la société a transféré les fonds par l'intermédiaire de trois banques.",
+            "La nouvelle réglementation entrera en vigueur au début du prochain exercice.",
+            "La plupart des documents ont été signés par le directeur de la fondation.",
+            "Les journalistes ont passé des mois à comparer les contrats avec les registres publics.",
+            "Les agriculteurs de la région s'inquiètent du manque de pluie cet été.",
+            "Le ministre a refusé de répondre aux questions sur les comptes à l'étranger.",
+        ],
+        'deu': [
+            "Der Ausschuss wird nächste Woche erneut zusammentreten, um den Jahreshaushalt zu prüfen.",
+            "Mehrere Zeugen beschrieben die Ereignisse jener Nacht sehr ausführlich.",
+            "Laut dem Bericht überwies das Unternehmen die Gelder über drei verschiedene Banken.",
+            "Die neuen Vorschriften treten zu Beginn des nächsten Geschäftsjahres in Kraft.",
+            "Die meisten Unterlagen wurden vom Direktor der Stiftung unterschrieben.",
+            "Die Journalisten verglichen monatelang die Verträge mit öffentlichen Registern.",
+            "Die Landwirte in der Region machen sich Sorgen über den fehlenden Regen in diesem Sommer.",
+            "Der Minister weigerte sich, Fragen zu den Konten im Ausland zu beantworten.",
+        ],
+        'spa': [
+            "El comité volverá a reunirse la próxima semana para revisar el presupuesto anual.",
+            "Varios testigos describieron los acontecimientos de aquella noche con gran detalle.",
+            "Según el informe, la empresa transfirió los fondos a través de tres bancos.",
+            "La nueva normativa entrará en vigor al comienzo del próximo ejercicio fiscal.",
+            "La mayoría de los documentos fueron firmados por el director de la fundación.",
+            "Los periodistas pasaron meses comparando los contratos con los registros públicos.",
+            "Los agricultores de la región están preocupados por la falta de lluvia este verano.",
+            "El ministro se negó a responder preguntas sobre las cuentas en el extranjero.",
+        ],
+        'ita': [
+            "Il comitato si riunirà di nuovo la prossima settimana per esaminare il bilancio annuale.",
+            "Diversi testimoni hanno descritto gli eventi di quella notte con molti dettagli.",
+            "Secondo il rapporto, la società ha trasferito i fondi attraverso tre banche.",
+            "Le nuove norme entreranno in vigore all'inizio del prossimo esercizio finanziario.",
+            "La maggior parte dei documenti è stata firmata dal direttore della fondazione.",
+            "I giornalisti hanno passato mesi a confrontare i contratti con i registri pubblici.",
+            "Gli agricoltori della regione sono preoccupati per la mancanza di pioggia quest'estate.",
+            "Il ministro si è rifiutato di rispondere alle domande sui conti all'estero.",
+        ],
+    }
+    LANGUAGES = tuple(SENTENCES)
+
+    def __init__(self, corpus_dir: Path, languages: List[str], docs_per_kind: int = 4, pages: int = 3, seed: int = 0):
+        """
+        Initialize the Corpus class.
+
+        Args:
+            corpus_dir: Path to the directory of the corpus.
+            languages: ISO3 codes of the languages of the documents (see LANGUAGES).
+            docs_per_kind: Number of documents of each kind (see KINDS).
+            pages: Number of pages of each document.
+            seed: Seed of the random generator, the same seed generates the same corpus.
+        """
+        self.corpus_dir = corpus_dir
+        self.languages = languages
+        self.docs_per_kind = docs_per_kind
+        self.pages = pages
+        self.seed = seed
+
+    @property
+    def settings(self) -> dict:
+        return dict(languages=list(self.languages), docs_per_kind=self.docs_per_kind, pages=self.pages, seed=self.seed)
+
+    @property
+    def ground_truth_file(self) -> Path:
+        return self.corpus_dir / Corpus.GROUND_TRUTH_FILE
+
+    def get_documents(self) -> dict:
+        """
+        Get the documents of the corpus, generating it unless it was already
+        generated with the same settings.
+
+        Returns:
+            A dictionary with the kind, language and pages languages (None for
+            blank pages) of each document, by path relative to the corpus directory.
+        """
+        if self.ground_truth_file.exists():
+            ground_truth = json.loads(self.ground_truth_file.read_text(encoding="UTF-8"))
+            if ground_truth['settings'] == self.settings:
+                return ground_truth['documents']
+        return self.generate()
+
+    def generate(self) -> dict:
+        """
+        Generate the documents of the corpus and their ground truth.
+
+        Returns:
+            A dictionary with the kind, language and pages languages of each document.
+        """
+        rng = random.Random(self.seed)
+        documents = dict()
+        for kind in Corpus.KINDS:
+            (self.corpus_dir / kind).mkdir(parents=True, exist_ok=True)
+            for index in range(self.docs_per_kind):
+                lang = self.languages[index % len(self.languages)]
+                pages_langs = self.get_pages_langs(rng, kind, lang)
+                writer = PdfWriter()
+                for page, page_lang in enumerate(pages_langs):
+                    self.add_page(writer, rng, kind, page, page_lang)
+                name = f'{kind}/{kind}-{index + 1:03d}-{lang}.pdf'
+                writer.write(self.corpus_dir / name)
+                documents[name] = dict(kind=kind, lang=lang.upper(), pages=[None if page_lang is None else page_lang.upper()
+                                                                           for page_lang in pages_langs])
+        self.ground_truth_file.write_text(json.dumps(dict(settings=self.settings, documents=documents), indent=2),
+                                          encoding="UTF-8")
+        return documents
+
+    def get_pages_langs(self, rng: random.Random, kind: str, lang: str) -> List[Optional[str]]:
+        """
+        Get the language of each page of a document.
+
+        Args:
+            rng: Random generator of the corpus.
+            kind: Kind of the document.
+            lang: Dominant language of the document.
+
+        Returns:
+            The language of each page, None for blank pages.
+        """
+        if kind == Corpus.KIND_BLANK:
+            return [lang if page % 2 == 0 else None for page in range(self.pages)]
+        if kind == Corpus.KIND_MIXED and len(self.languages) > 1:
+            other = rng.choice([other for other in self.languages if other != lang])
+            # Less than half of the pages are in the other language
+            others = rng.sample(range(self.pages), (self.pages - 1) // 2)
+            return [other if page in others else lang for page in range(self.pages)]
+        return [lang] * self.pages
+
+    def add_page(self, writer: PdfWriter, rng: random.Random, kind: str, page: int, lang: Optional[str]):
+        """
+        Add a page of a document.
+
+        Args:
+            writer: Writer of the document.
+            rng: Random generator of the corpus.
+            kind: Kind of the document.
+            page: Index of the page (starting at 0).
+            lang: Language of the page, None for a blank page.
+        """
+        if lang is None:
+            return writer.add_image_page(self.get_scanned_page(rng, []))
+        lines = self.get_page_lines(rng, lang)
+        if kind == Corpus.KIND_TEXT or (kind == Corpus.KIND_MIXED and page % 2 == 0):
+            writer.add_text_page(lines)
+        else:
+            writer.add_image_page(self.get_scanned_page(rng, lines))
+
+    def get_page_lines(self, rng: random.Random, lang: str) -> List[str]:
+        """
+        Get the lines of a page of random sentences.
+
+        Args:
+            rng: Random generator of the corpus.
+            lang: Language of the page.
+
+        Returns:
+            The lines of the page.
+        """
+        sentences = []
+        while sum(len(sentence) + 1 for sentence in sentences) < Corpus.PAGE_CHARS:
+            sentences.append(rng.choice(Corpus.SENTENCES[lang]))
+        lines, line = [], ''
+        for word in ' '.join(sentences).split():
+            if line and len(line) + len(word) + 1 > Corpus.LINE_CHARS:
+                lines.append(line)
+                line = ''
+            line = f'{line} {word}' if line else word
+        return lines + [line]
+
+    def get_scanned_page(self, rng: random.Random, lines: List[str]) -> Image.Image:
+        """
+        Draw lines of text on a page, slightly rotated and with some noise, as if scanned.
+
+        Args:
+            rng: Random generator of the corpus.
+            lines: Lines of text of the page. The page is blank if empty.
+
+        Returns:
+            The page, in grayscale.
+        """
+        scale = Corpus.IMAGE_DPI / 72
+        image = Image.new('L', (int(PAGE_WIDTH * scale), int(PAGE_HEIGHT * scale)), 255)
+        draw = ImageDraw.Draw(image)
+        font = get_font(int(PdfWriter.FONT_SIZE * scale))
+        y = PdfWriter.MARGIN * scale
+        for line in lines:
+            draw.text((PdfWriter.MARGIN * scale, y), line, fill=0, font=font)
+            y += PdfWriter.LINE_HEIGHT * scale * 1.4
+        for _ in range(200):
+            x, y = rng.randrange(image.width), rng.randrange(image.height)
+            draw.point((x, y), fill=rng.randrange(128, 224))
+        return image.rotate(rng.uniform(-1, 1), fillcolor=255)
+
+
+def get_font(size: int) -> ImageFont.ImageFont:
+    """
+    Get a TrueType font with accented characters to draw scanned pages, or the
+    default font of Pillow if none is installed.
+
+    Args:
+        size: Size of the font, in pixels.
+
+    Returns:
+        A font.
+    """
+    for font in SCANNED_PAGE_FONTS:
+        try:
+            return ImageFont.truetype(font, size)
+        except OSError:
+            continue
+    try:
+        return ImageFont.load_default(size=size)
+    # Versions of Pillow before 10.1 only have a bitmap default font
+    except TypeError:
+        return ImageFont.load_default()
+
+
+def get_peak_rss() -> dict:
+    """
+    Get the peak resident set size of the current process and of its terminated children.
+
+    Returns:
+        The peak RSS of the process (self) and children, in MiB.
+    """
+    # ru_maxrss is in bytes on macOS, and in kibibytes elsewhere
+    unit = 1 if sys.platform == 'darwin' else 1024
+    return dict(self=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit / 2 ** 20,
+                children=resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * unit / 2 ** 20)
+
+
+class Benchmark:
+    MODE_POOL = 'pool'
+    MODE_PIPELINE = 'pipeline'
+    MODE_ASYNC = 'async'
+    MODES = (MODE_POOL, MODE_PIPELINE, MODE_ASYNC)
+    STAGES = ('text_layer', 'render', 'ocr', 'detect', 'aggregate')
+    # Seconds between the checks that a measure process is still running
+    POLL_INTERVAL = 1
+
+    def __init__(self, corpus: Corpus, max_pages: int = 5, parallel: int = 1, mode: str = MODE_POOL,
+                 stages: bool = True):
+        """
+        Initialize the Benchmark class, measuring the analysis of a corpus end to end
+        and stage by stage. Each measure runs in its own process, so its peak RSS
+        isn't the peak of the previous ones.
+
+        Args:
+            corpus: Corpus of PDF files to analyse.
+            max_pages: Maximum number of pages to process per PDF file.
+            parallel: Number of worker processes for the end-to-end run.
+            mode: How the end-to-end run processes files (see MODES).
+            stages: Measure each stage on its own after the end-to-end run.
+        """
+        self.corpus = corpus
+        self.max_pages = max_pages
+        self.parallel = parallel
+        self.mode = mode
+        self.stages = stages
+        self.documents = dict()
+        self.output_dir = None
+
+    def run(self) -> dict:
+        """
+        Run the benchmark.
+
+        Returns:
+            The settings and the measures of the benchmark, serializable in JSON.
+        """
+        self.documents = self.corpus.get_documents()
+        with tempfile.TemporaryDirectory() as output_dir:
+            self.output_dir = Path(output_dir)
+            results = dict(end_to_end=self.run_isolated(self.measure_end_to_end))
+            if self.stages:
+                results['stages'] = {stage: self.run_isolated(getattr(self, f'measure_{stage}')) for stage in Benchmark.STAGES}
+        return dict(settings=dict(self.corpus.settings, max_pages=self.max_pages, parallel=self.parallel, mode=self.mode),
+                    system=dict(platform=platform.platform(), python=platform.python_version(), cpus=os.cpu_count()),
+                    time=time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+                    corpus=dict(docs=len(self.documents), pages=sum(len(self.get_pages(doc)) for doc in self.documents.values())),
+                    results=results)
+
+    def run_isolated(self, measure: Callable[[], dict]) -> dict:
+        """
+        Run a measure in a new process.
+
+        Args:
+            measure: Function returning the measure.
+
+        Returns:
+            The measure, with the peak RSS of the process and its children.
+        """
+        results = Queue()
+        process = Process(target=self.measure_process, args=(measure, results))
+        process.start()
+        result = None
+        while result is None:
+            try:
+                result = results.get(timeout=Benchmark.POLL_INTERVAL)
+            except Empty:
+                # A process killed by a crash or the OOM killer fails the measure, not the whole
+                # benchmark. Its result is in the queue once it exited, if it sent one.
+                if not process.is_alive() and results.empty():
+                    result = dict(error=f"The measure process exited with code {process.exitcode}")
+        process.join()
+        return result
+
+    def measure_process(self, measure: Callable[[], dict], results: Queue):
+        try:
+            result = measure()
+        except Exception as error:
+            # A missing tool fails the measure, not the whole benchmark
+            result = dict(error=repr(error))
+        results.put(dict(result, peak_rss_mib=get_peak_rss()))
+
+    def create_detector(self, output_dir: Optional[Path] = None, parallel: int = 1) -> PdfLanguageDetector:
+        """
+        Create the detector analysing the corpus.
+
+        Args:
+            output_dir: Path to the output directory. Default is a temporary directory.
+            parallel: Number of worker processes.
+
+        Returns:
+            A PdfLanguageDetector instance.
+        """
+        output_dir = self.output_dir / 'stages' if output_dir is None else output_dir
+        return PdfLanguageDetector(self.corpus.languages, self.corpus.corpus_dir, output_dir, self.max_pages,
+                                   parallel=parallel, input_list=self.write_input_list(),
+                                   pipeline=self.mode == Benchmark.MODE_PIPELINE,
+                                   async_executor=self.mode == Benchmark.MODE_ASYNC)
+
+    def write_input_list(self) -> Path:
+        """
+        Write the list of the PDF files of the corpus, leaving out other files of its directory.
+
+        Returns:
+            Path to the input list.
+        """
+        input_list = self.output_dir / 'input_list.txt'
+        input_list.write_text(''.join(f'{self.corpus.corpus_dir / name}\n' for name in self.documents), encoding="UTF-8")
+        return input_list
+
+    def get_pages(self, document: dict) -> List[Optional[str]]:
+        """
+        Get the languages of the pages of a document analysed by the detector.
+
+        Args:
+            document: Ground truth of the document.
+
+        Returns:
+            The language of each page up to max_pages, None for blank pages.
+        """
+        return document['pages'][:self.max_pages]
+
+    def get_throughput(self, seconds: float, pages: int, docs: Optional[int] = None) -> dict:
+        """
+        Get the throughput of a measure.
+
+        Args:
+            seconds: Duration of the measure.
+            pages: Number of pages processed.
+            docs: Number of documents processed, if documents are processed as a whole.
+
+        Returns:
+            The duration, number of pages (and documents) and their number per second.
+        """
+        seconds = max(seconds, 1e-6)
+        throughput = dict(seconds=seconds, pages=pages, pages_per_second=pages / seconds)
+        if docs is not None:
+            throughput.update(docs=docs, docs_per_second=docs / seconds)
+        return throughput
+
+    def get_accuracy(self, results: Iterator[tuple]) -> dict:
+        """
+        Get the accuracy of detected languages, overall and for each kind of document.
+
+        Args:
+            results: Iterator of (kind, expected language, detected language) tuples.
+
+        Returns:
+            The fraction of correct languages, overall and by kind.
+        """
+        counts = dict()
+        for kind, expected, detected in results:
+            for key in ('all', kind):
+                total, correct = counts.get(key, (0, 0))
+                counts[key] = (total + 1, correct + (expected == detected))
+        return {key: correct / total for key, (total, correct) in counts.items()}
+
+    def measure_end_to_end(self) -> dict:
+        """
+        Analyse the corpus with the detector, as `pld detect` does.
+
+        Returns:
+            The throughput and accuracy of the analysis.
+        """
+        detector = self.create_detector(self.output_dir / 'end_to_end', self.parallel)
+        start = time.monotonic()
+        detector.process_input_files()
+        seconds = time.monotonic() - start
+        results = []
+        for name, document in self.documents.items():
+            try:
+                avgs = detector.read_coeff_avgs_file(detector.get_output_dir(self.corpus.corpus_dir / name))
+                detected = max(avgs, key=avgs.get)
+            except (OSError, ValueError):
+                detected = None
+            results.append((document['kind'], document['lang'], detected))
+        pages = sum(len(self.get_pages(document)) for document in self.documents.values())
+        failed = sum(detected is None for _, _, detected in results)
+        return dict(self.get_throughput(seconds, pages, len(self.documents)), failed=failed,
+                    accuracy=self.get_accuracy(results))
+
+    def measure_text_layer(self) -> dict:
+        """
+        Extract the text layer of every document with pdftotext.
+
+        Returns:
+            The throughput of the extraction.
+        """
+        detector = self.create_detector()
+        start = time.monotonic()
+        pages = sum(len(detector.extract_text_layer(self.corpus.corpus_dir / name)) for name in self.documents)
+        return self.get_throughput(time.monotonic() - start, pages, len(self.documents))
+
+    def measure_render(self) -> dict:
+        """
+        Render every page of every document with pdftoppm.
+
+        Returns:
+            The throughput of the rendering.
+        """
+        detector = self.create_detector()
+        start = time.monotonic()
+        pages = 0
+        for name, document in self.documents.items():
+            for page in range(1, len(self.get_pages(document)) + 1):
+                detector.render_page(self.corpus.corpus_dir / name, page)
+                pages += 1
+        return self.get_throughput(time.monotonic() - start, pages, len(self.documents))
+
+    def measure_ocr(self) -> dict:
+        """
+        OCR the scanned pages with text, then detect their language to measure the OCR quality.
+
+        Returns:
+            The throughput of the OCR, and the accuracy of the languages detected in its text.
+        """
+        detector = self.create_detector()
+        scanned_pages = []
+        for name, document in self.documents.items():
+            text_layer = detector.extract_text_layer(self.corpus.corpus_dir / name)
+            for page, lang in enumerate(self.get_pages(document), start=1):
+                page_text = text_layer[page - 1] if page <= len(text_layer) else ''
+                if lang is not None and not detector.has_enough_text(page_text):
+                    scanned_pages.append((document['kind'], lang, detector.render_page(self.corpus.corpus_dir / name, page)))
+        start = time.monotonic()
+        texts = [(kind, lang, detector.extract_text(image)) for kind, lang, image in scanned_pages]
+        seconds = time.monotonic() - start
+        results = [(kind, lang, self.detect_lang(detector, text)) for kind, lang, text in texts]
+        return dict(self.get_throughput(seconds, len(texts)), accuracy=self.get_accuracy(results))
+
+    def measure_detect(self) -> dict:
+        """
+        Detect the language of the text layer of every page with Lingua.
+
+        Returns:
+            The throughput and accuracy of the language detection.
+        """
+        detector = self.create_detector()
+        texts = []
+        for name, document in self.documents.items():
+            text_layer = detector.extract_text_layer(self.corpus.corpus_dir / name)
+            for page_text, lang in zip(text_layer, self.get_pages(document)):
+                if detector.has_enough_text(page_text):
+                    texts.append((document['kind'], lang, page_text))
+        start = time.monotonic()
+        results = [(kind, lang, self.detect_lang(detector, text)) for kind, lang, text in texts]
+        return dict(self.get_throughput(time.monotonic() - start, len(texts)), accuracy=self.get_accuracy(results))
+
+    def measure_aggregate(self) -> dict:
+        """
+        Average the language files of every document analysed by the end-to-end run.
+
+        Returns:
+            The throughput of the aggregation.
+        """
+        detector = self.create_detector(self.output_dir / 'end_to_end')
+        langs_dirs = [detector.get_output_dir(self.corpus.corpus_dir / name) / 'langs' for name in self.documents]
+        start = time.monotonic()
+        pages = 0
+        for langs_dir in langs_dirs:
+            pages += len(detector.get_lang_files(langs_dir))
+            detector.calculate_coeff_avgs(langs_dir)
+        return self.get_throughput(time.monotonic() - start, pages, len(langs_dirs))
+
+    def detect_lang(self, detector: PdfLanguageDetector, text: str) -> Optional[str]:
+        """
+        Detect the language of a text.
+
+        Args:
+            detector: Detector holding the Lingua model.
+            text: Text to detect the language of.
+
+        Returns:
+            The most likely language, as an uppercase ISO 639-3 code, or None.
+        """
+        coeffs = detector.get_coeffs(detector.lang_detector.compute_language_confidence_values(text))
+        return max(coeffs, key=coeffs.get) if coeffs else None
+
+    def print_results(self, results: dict):
+        """
+        Print a summary of the results of the benchmark.
+
+        Args:
+            results: Results returned by run().
+        """
+        measures = dict(end_to_end=results['results']['end_to_end'], **results['results'].get('stages', dict()))
+        for name, measure in measures.items():
+            if 'error' in measure:
+                print(f"{name}: [red]{measure['error']}[/red]")
+                continue
+            line = f"{name}: {measure['pages_per_second']:.2f} pages/s"
+            if 'docs_per_second' in measure:
+                line += f", {measure['docs_per_second']:.2f} docs/s"
+            if 'accuracy' in measure:
+                line += f", {measure['accuracy'].get('all', 0):.0%} accuracy"
+            line += f", {measure['peak_rss_mib']['self']:.0f} MiB peak RSS ({measure['peak_rss_mib']['children']:.0f} MiB children)"
+            print(line)
@@ -0,0 +1,98 @@
+import hashlib
+import json
+import sqlite3
+
+from pathlib import Path
+from typing import Optional, List
+
+class ResultCache:
+    # Size of the chunks read to compute the digest of a file
+    CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, cache_file: Path):
+        """
+        Initialize the ResultCache class, a SQLite database of analysis results
+        indexed by the content of the analysed files.
+
+        Args:
+            cache_file: Path to the SQLite database file.
+        """
+        self.cache_file = cache_file
+        self._connection = None
+
+    def __getstate__(self):
+        # SQLite connections can't be shared between processes: each
+        # worker process opens its own connection.
+        return dict(self.__dict__, _connection=None)
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """
+        Get the connection to the cache database, creating it on first use.
+
+        Returns:
+            A sqlite3.Connection instance.
+        """
+        if self._connection is None:
+            self._connection = sqlite3.connect(str(self.cache_file), timeout=60)
+            # Let readers and writers from several processes work concurrently
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute('CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, result TEXT NOT NULL)')
+            self._connection.commit()
+        return self._connection
+
+    def get_key(self, input_file: Path, languages: List[str], max_pages: int, settings: Optional[dict] = None) -> str:
+        """
+        Get the cache key of a file, from its content and the analysis settings.
+
+        Args:
+            input_file: Path to the input file.
+            languages: Languages detected in the file.
+            max_pages: Maximum number of pages processed in the file.
+            settings: Other settings changing the result of the analysis, serializable in JSON.
+
+        Returns:
+            The cache key.
+        """
+        digest = hashlib.sha256()
+        with input_file.open('rb') as source:
+            for chunk in iter(lambda: source.read(self.CHUNK_SIZE), b''):
+                digest.update(chunk)
+        settings_digest = hashlib.sha256(json.dumps(settings or dict(), sort_keys=True).encode('UTF-8')).hexdigest()
+        return f"{digest.hexdigest()}:{'+'.join(sorted(languages))}:{max_pages}:{settings_digest[:16]}"
+
+    def get(self, key: str) -> Optional[dict]:
+        """
+        Get the result saved for a cache key.
+
+        Args:
+            key: The cache key.
+
+        Returns:
+            The saved result, or None if there is none.
+        """
+        row = self.connection.execute('SELECT result FROM results WHERE key = ?', (key,)).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def has(self, key: str) -> bool:
+        """
+        Check if a result is saved for a cache key.
+
+        Args:
+            key: The cache key.
+
+        Returns:
+            True if a result is saved for the key.
+        """
+        return self.connection.execute('SELECT 1 FROM results WHERE key = ?', (key,)).fetchone() is not None
+
+    def set(self, key: str, result: dict):
+        """
+        Save the result for a cache key.
+
+        Args:
+            key: The cache key.
+            result: The result to save.
+        """
+        with self.connection:
+            self.connection.execute('INSERT OR REPLACE INTO results (key, result) VALUES (?, ?)', (key, json.dumps(result)))
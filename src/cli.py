@@ -1,9 +1,16 @@
+import json
 import typer
 import os
 from pathlib import Path
-from typing import Optional, List
-from src.pld import PdfLanguageDetector
+from typing import Optional, List, Tuple
+from src.pld import PdfLanguageDetector, OCR_BACKENDS, CoeffAverages, RenderProfile, TesserocrBackend
 from src.report import Report
+from src.benchmark import Benchmark, Corpus
+from src.inputs import InputFiles
+from src.metrics import RunMetrics
+from src.server import DetectionServer
+from src.store import DIRECTORY_STORE, STORES
+from src.workqueue import WORK_QUEUES, Coordinator, SqliteWorkQueue
 from langcodes import Language
 from langcodes.tag_parser import LanguageTagError
 
@@ -11,18 +18,23 @@ app = typer.Typer()
 
 def validate_relative_to(ctx: typer.Context, param: typer.CallbackParam, value: Optional[Path]) -> Optional[Path]:
     """
-    Validate that 'relative_to' is a parent of 'input_dir' or the input_dir itself.
+    Validate that 'relative_to' is an existing directory, and a parent of 'input_dir' or the input_dir itself.
     """
+    if value is not None and not value.is_dir():
+        raise typer.BadParameter("relative_to must be an existing directory")
     input_dir = ctx.params.get("input_dir")
+    # PDF files read from an input list may be anywhere under relative_to
+    if input_dir is None:
+        return value
     if value is not None and value.resolve() != input_dir.resolve() and not value.resolve() in input_dir.resolve().parents:
         raise typer.BadParameter("relative_to must be a parent directory of input_dir, or the input_dir itself")
     return value
 
-def validate_input_dir(ctx: typer.Context, param: typer.CallbackParam, value: Path) -> Path:
+def validate_input_dir(ctx: typer.Context, param: typer.CallbackParam, value: Optional[Path]) -> Optional[Path]:
     """
     Validate that 'input_dir' exists.
     """
-    if not value.is_dir():
+    if value is not None and not value.is_dir():
         raise typer.BadParameter("input_dir must exist and be a directory")
     return value
 
@@ -56,32 +68,341 @@ def validate_max_pages(ctx: typer.Context, param: typer.CallbackParam, value: in
         raise typer.BadParameter("max_pages must be a positive integer")
     return value
 
+def validate_min_text_chars(ctx: typer.Context, param: typer.CallbackParam, value: int) -> int:
+    """
+    Validate that 'min_text_chars' is positive.
+    """
+    if value <= 0:
+        raise typer.BadParameter("min_text_chars must be a positive integer")
+    return value
+
+def validate_ocr_backend(ctx: typer.Context, param: typer.CallbackParam, value: str) -> str:
+    """
+    Validate that 'ocr_backend' is a known and installed OCR backend.
+    """
+    if value not in OCR_BACKENDS:
+        raise typer.BadParameter(f"ocr_backend must be one of: {', '.join(OCR_BACKENDS)}")
+    if value == TesserocrBackend.name and not TesserocrBackend.is_available():
+        raise typer.BadParameter("tesserocr must be installed to use this backend (pip install tesserocr)")
+    return value
+
+def validate_confidence_margin(ctx: typer.Context, param: typer.CallbackParam, value: Optional[float]) -> Optional[float]:
+    """
+    Validate that 'confidence_margin' is between 0 and 1.
+    """
+    if value is not None and not 0 < value <= 1:
+        raise typer.BadParameter("confidence_margin must be between 0 (excluded) and 1")
+    return value
+
+def validate_pages_per_task(ctx: typer.Context, param: typer.CallbackParam, value: Optional[int]) -> Optional[int]:
+    """
+    Validate that 'pages_per_task' is positive.
+    """
+    if value is not None and value <= 0:
+        raise typer.BadParameter("pages_per_task must be a positive integer")
+    return value
+
+def validate_narrow_after(ctx: typer.Context, param: typer.CallbackParam, value: Optional[int]) -> Optional[int]:
+    """
+    Validate that 'narrow_after' is positive.
+    """
+    if value is not None and value <= 0:
+        raise typer.BadParameter("narrow_after must be a positive integer")
+    return value
+
+def validate_narrow_langs(ctx: typer.Context, param: typer.CallbackParam, value: int) -> int:
+    """
+    Validate that 'narrow_langs' is positive.
+    """
+    if value <= 0:
+        raise typer.BadParameter("narrow_langs must be a positive integer")
+    return value
+
+def validate_narrow_min_confidence(ctx: typer.Context, param: typer.CallbackParam, value: float) -> float:
+    """
+    Validate that 'narrow_min_confidence' is between 0 and 1.
+    """
+    if not 0 <= value <= 1:
+        raise typer.BadParameter("narrow_min_confidence must be between 0 and 1")
+    return value
+
+def validate_dpi(ctx: typer.Context, param: typer.CallbackParam, value: Optional[int]) -> Optional[int]:
+    """
+    Validate that a resolution is positive.
+    """
+    if value is not None and value <= 0:
+        raise typer.BadParameter(f"{param.name} must be a positive integer")
+    return value
+
+def validate_color(ctx: typer.Context, param: typer.CallbackParam, value: str) -> str:
+    """
+    Validate that 'color' is a known render color.
+    """
+    if value not in RenderProfile.COLORS:
+        raise typer.BadParameter(f"color must be one of: {', '.join(RenderProfile.COLORS)}")
+    return value
+
+def validate_crop(ctx: typer.Context, param: typer.CallbackParam, value: Optional[float]) -> Optional[float]:
+    """
+    Validate that 'crop' is between 0 and 1.
+    """
+    if value is not None and not 0 < value <= 1:
+        raise typer.BadParameter("crop must be between 0 (excluded) and 1")
+    return value
+
+def validate_input_list(ctx: typer.Context, param: typer.CallbackParam, value: Optional[Path]) -> Optional[Path]:
+    """
+    Validate that 'input_list' is '-' or an existing file.
+    """
+    if value is not None and str(value) != '-' and not value.is_file():
+        raise typer.BadParameter("input_list must be '-' or an existing file")
+    return value
+
+def validate_shard(ctx: typer.Context, param: typer.CallbackParam, value: Optional[str]) -> Optional[Tuple[int, int]]:
+    """
+    Validate that 'shard' is formatted as i/N, with i between 1 and N.
+    """
+    if value is None:
+        return None
+    try:
+        index, count = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise typer.BadParameter("shard must be formatted as i/N (e.g. 1/4)")
+    if not 1 <= index <= count:
+        raise typer.BadParameter("shard index must be between 1 and the number of shards")
+    return index, count
+
+def validate_work_queue_backend(ctx: typer.Context, param: typer.CallbackParam, value: str) -> str:
+    """
+    Validate that 'work_queue_backend' is a known work queue backend.
+    """
+    if value not in WORK_QUEUES:
+        raise typer.BadParameter(f"work_queue_backend must be one of: {', '.join(WORK_QUEUES)}")
+    return value
+
+def validate_positive_int(ctx: typer.Context, param: typer.CallbackParam, value: Optional[int]) -> Optional[int]:
+    """
+    Validate that an integer option is positive, naming the option in the error.
+    """
+    if value is not None and value <= 0:
+        raise typer.BadParameter(f"{param.name} must be a positive integer")
+    return value
+
+def validate_metrics_format(ctx: typer.Context, param: typer.CallbackParam, value: str) -> str:
+    """
+    Validate that 'metrics_format' is a known metrics format.
+    """
+    if value not in RunMetrics.FORMATS:
+        raise typer.BadParameter(f"metrics_format must be one of: {', '.join(RunMetrics.FORMATS)}")
+    return value
+
+def validate_weighting(ctx: typer.Context, param: typer.CallbackParam, value: str) -> str:
+    """
+    Validate that 'weighting' is a known weighting of the pages.
+    """
+    if value not in CoeffAverages.WEIGHTINGS:
+        raise typer.BadParameter(f"weighting must be one of: {', '.join(CoeffAverages.WEIGHTINGS)}")
+    return value
+
+def validate_store(ctx: typer.Context, param: typer.CallbackParam, value: str) -> str:
+    """
+    Validate that 'store' is a known results store.
+    """
+    if value not in STORES:
+        raise typer.BadParameter(f"store must be one of: {', '.join(STORES)}")
+    return value
+
+def validate_threads(ctx: typer.Context, param: typer.CallbackParam, value: int) -> int:
+    """
+    Validate that 'threads' is positive.
+    """
+    if value <= 0:
+        raise typer.BadParameter("threads must be a positive integer")
+    return value
+
+def validate_benchmark_languages(ctx: typer.Context, param: typer.CallbackParam, value: List[str]) -> List[str]:
+    """
+    Validate that 'languages' are at least 2 languages of the benchmark corpus.
+    """
+    if len(value) < 2:
+        raise typer.BadParameter("You must specify at least 2 languages")
+    for lang in value:
+        if lang not in Corpus.LANGUAGES:
+            raise typer.BadParameter(f"language must be one of: {', '.join(Corpus.LANGUAGES)}")
+    return value
+
+def validate_benchmark_mode(ctx: typer.Context, param: typer.CallbackParam, value: str) -> str:
+    """
+    Validate that 'mode' is a known benchmark mode.
+    """
+    if value not in Benchmark.MODES:
+        raise typer.BadParameter(f"mode must be one of: {', '.join(Benchmark.MODES)}")
+    return value
+
+def validate_unsupported_options(mode: str, **options):
+    """
+    Validate that the options which can't be used in a mode aren't set.
+    """
+    for name, value in options.items():
+        if value is not None and value is not False:
+            raise typer.BadParameter(f"{name} can't be used with {mode}", param_hint=f"'--{name.replace('_', '-')}'")
+
 
 @app.command()
 def detect(
     languages: List[str] = typer.Option(..., '--language', help="An ISO3 language code.", callback=validate_languages), 
-    input_dir: Path = typer.Option(..., '--input-dir', help="Path to the input directory.", callback=validate_input_dir),
+    input_dir: Optional[Path] = typer.Option(None, '--input-dir', help="Path to the input directory.", callback=validate_input_dir),
     output_dir: Optional[Path] = typer.Option('out', help="Path to the output directory."),
     max_pages: Optional[int] = typer.Option(5, help="Maximum number of pages to process per PDF file.", callback=validate_max_pages),
     resume: Optional[bool] = typer.Option(False, help="Skip PDF files already analyzed."),
-    skip_images: Optional[bool] = typer.Option(False, help="Skip the extraction of PDF files as images."),
+    skip_images: Optional[bool] = typer.Option(False, help="Skip the extraction of PDF files as images and OCR the images kept by a previous run."),
     skip_ocr: Optional[bool] = typer.Option(False, help="Skip the OCR of images from PDF files."),
     parallel: Optional[int] = typer.Option(1, help="Number of paralell PDF to process in threads.", callback=validate_parallel),
-    relative_to: Optional[Path] = typer.Option(None, help="Path to the directory relative to which build the output dir path.", callback=validate_relative_to)):
+    relative_to: Optional[Path] = typer.Option(None, help="Path to the directory relative to which build the output dir path.", callback=validate_relative_to),
+    text_layer: Optional[bool] = typer.Option(True, help="Use the text layer of PDF files when available instead of OCR."),
+    min_text_chars: Optional[int] = typer.Option(100, help="Minimum number of characters in the text layer of a page to skip its OCR.", callback=validate_min_text_chars),
+    ocr_backend: Optional[str] = typer.Option('pytesseract', help="OCR backend: 'pytesseract' (one tesseract process per page) or 'tesserocr' (one persistent engine per worker).", callback=validate_ocr_backend),
+    keep_images: Optional[bool] = typer.Option(False, help="Save the pages rendered for OCR as images in the output directory."),
+    confidence_margin: Optional[float] = typer.Option(None, help="Stop processing a PDF file once the leading language is ahead of the runner-up by this margin (between 0 and 1).", callback=validate_confidence_margin),
+    pages_per_task: Optional[int] = typer.Option(None, help="Split PDF files in tasks of this number of pages to process their pages in parallel.", callback=validate_pages_per_task),
+    cache_file: Optional[Path] = typer.Option(None, help="Path to a SQLite database used to reuse the results of identical PDF files across runs."),
+    store: Optional[str] = typer.Option(DIRECTORY_STORE, help="Where to save results: 'dirs' (one directory per PDF file) or 'sqlite' (a single database in the output directory).", callback=validate_store),
+    script_detection: Optional[bool] = typer.Option(False, help="Detect the script of each page before its OCR to run Tesseract only with the languages written in this script."),
+    narrow_after: Optional[int] = typer.Option(None, help="OCR the next pages of a PDF file only with its leading languages after this number of pages.", callback=validate_narrow_after),
+    narrow_langs: Optional[int] = typer.Option(2, help="Number of leading languages kept to OCR the next pages with --narrow-after.", callback=validate_narrow_langs),
+    narrow_min_confidence: Optional[float] = typer.Option(0.5, help="OCR a page again with all the languages, and keep them for the next pages, if its leading language coefficient drops below this value (between 0 and 1).", callback=validate_narrow_min_confidence),
+    dpi: Optional[int] = typer.Option(None, help="Resolution of the pages rendered for OCR. Default is poppler's (150).", callback=validate_dpi),
+    color: Optional[str] = typer.Option(RenderProfile.COLOR, help="Colors of the pages rendered for OCR: 'color', 'gray' or 'mono'.", callback=validate_color),
+    crop: Optional[float] = typer.Option(None, help="Fraction of the page height kept around its middle for OCR (between 0 and 1).", callback=validate_crop),
+    adaptive_dpi: Optional[int] = typer.Option(None, help="Render pages again at this resolution when their OCR yields less than --min-text-chars characters.", callback=validate_dpi),
+    skip_blank_pages: Optional[bool] = typer.Option(False, help="Skip the OCR of blank pages and leave them out of the averages."),
+    skip_duplicate_pages: Optional[bool] = typer.Option(False, help="Skip the OCR of near-duplicates of pages already processed in a PDF file and leave them out of the averages."),
+    input_list: Optional[Path] = typer.Option(None, help="Path to a file listing the PDF files to process, one per line, or '-' to read them from the standard input.", callback=validate_input_list),
+    shard: Optional[str] = typer.Option(None, help="Only process the PDF files of the shard i/N (e.g. 1/4), assigned by the hash of their path.", callback=validate_shard),
+    work_queue: Optional[Path] = typer.Option(None, help="Path to a work queue filled by `pld coordinate` to claim the PDF files from, instead of --input-dir or --input-list."),
+    work_queue_backend: Optional[str] = typer.Option(SqliteWorkQueue.BACKEND_NAME, help="Backend of the work queue: 'sqlite' (a database file) or 'fs' (a directory).", callback=validate_work_queue_backend),
+    pipeline: Optional[bool] = typer.Option(False, help="Render, OCR and detect the language of pages in separate stages, each with its own pool of workers."),
+    render_workers: Optional[int] = typer.Option(1, help="Number of workers rendering pages with --pipeline.", callback=validate_positive_int),
+    ocr_workers: Optional[int] = typer.Option(None, help="Number of workers OCR'ing pages with --pipeline. Default is --parallel.", callback=validate_positive_int),
+    detect_workers: Optional[int] = typer.Option(1, help="Number of workers detecting the language of pages with --pipeline.", callback=validate_positive_int),
+    stage_queue_size: Optional[int] = typer.Option(8, help="Maximum number of pages waiting for each stage with --pipeline.", callback=validate_positive_int),
+    async_executor: Optional[bool] = typer.Option(False, help="Run pdftoppm, pdftotext and tesseract as asyncio subprocesses from a single process, one per CPU for each tool."),
+    metrics_file: Optional[Path] = typer.Option(None, help="Path to a file the run metrics (documents, pages and time spent in each stage) are exported to during the run."),
+    metrics_format: Optional[str] = typer.Option(RunMetrics.FORMAT_PROMETHEUS, help="Format of the metrics file: 'prometheus' (text format for the node exporter textfile collector) or 'json'.", callback=validate_metrics_format),
+    weighting: Optional[str] = typer.Option(CoeffAverages.WEIGHTING_NONE, help="How pages are weighted in the language averages of a PDF file: 'none' (equally) or 'chars' (by the number of characters recognised).", callback=validate_weighting),
+    page_files: Optional[bool] = typer.Option(True, help="Save the text and language information of each page in the output directory, as an audit trail. Without them, --resume starts unfinished PDF files over.")):
     """
     Process PDF files and detect the dominant language.
     """
+    if input_dir is None and input_list is None and work_queue is None:
+        raise typer.BadParameter("input_dir is required without input_list or work_queue", param_hint="'--input-dir'")
+    if input_dir is None and relative_to is None and (input_list is not None or work_queue is not None):
+        # Listed or claimed PDF files may be anywhere: their output directories need an explicit base
+        raise typer.BadParameter("relative_to is required with input_list or work_queue, without input_dir",
+                                 param_hint="'--relative-to'")
+    if pipeline:
+        # Pages are processed independently, without the state of the previous pages of the file
+        validate_unsupported_options('pipeline', confidence_margin=confidence_margin, narrow_after=narrow_after,
+                                     pages_per_task=pages_per_task, skip_images=skip_images, skip_ocr=skip_ocr,
+                                     async_executor=async_executor)
+    if async_executor:
+        # Tesseract is run as a command, without the OCR backends
+        validate_unsupported_options('async_executor', narrow_after=narrow_after, pages_per_task=pages_per_task,
+                                     skip_images=skip_images, skip_ocr=skip_ocr, script_detection=script_detection,
+                                     ocr_backend=ocr_backend == TesserocrBackend.name)
+    # Listed PDF files are relative to the current directory
+    input_dir = Path() if input_dir is None else input_dir
     detector = PdfLanguageDetector(languages, input_dir, output_dir, max_pages, resume, 
-                                   skip_images, skip_ocr, parallel, relative_to)
+                                   skip_images, skip_ocr, parallel, relative_to,
+                                   text_layer=text_layer, min_text_chars=min_text_chars,
+                                   ocr_backend=ocr_backend, keep_images=keep_images,
+                                   confidence_margin=confidence_margin, pages_per_task=pages_per_task,
+                                   cache_file=cache_file, store=store, script_detection=script_detection,
+                                   narrow_after=narrow_after, narrow_langs=narrow_langs,
+                                   narrow_min_confidence=narrow_min_confidence,
+                                   dpi=dpi, color=color, crop=crop, adaptive_dpi=adaptive_dpi,
+                                   skip_blank_pages=skip_blank_pages, skip_duplicate_pages=skip_duplicate_pages,
+                                   input_list=input_list, shard=shard,
+                                   work_queue=work_queue, work_queue_backend=work_queue_backend,
+                                   pipeline=pipeline, render_workers=render_workers, ocr_workers=ocr_workers,
+                                   detect_workers=detect_workers, stage_queue_size=stage_queue_size,
+                                   async_executor=async_executor, metrics_file=metrics_file,
+                                   metrics_format=metrics_format, weighting=weighting, page_files=page_files)
     detector.process_input_files()
 
+@app.command()
+def coordinate(
+    work_queue: Path = typer.Argument(help="Path to the work queue shared with the `pld detect --work-queue` nodes."),
+    input_dir: Optional[Path] = typer.Option(None, '--input-dir', help="Path to the input directory.", callback=validate_input_dir),
+    input_list: Optional[Path] = typer.Option(None, help="Path to a file listing the PDF files to add, one per line, or '-' to read them from the standard input.", callback=validate_input_list),
+    work_queue_backend: Optional[str] = typer.Option(SqliteWorkQueue.BACKEND_NAME, help="Backend of the work queue: 'sqlite' (a database file) or 'fs' (a directory).", callback=validate_work_queue_backend),
+    wait: Optional[bool] = typer.Option(True, help="Wait for the PDF files to be analysed and print their status.")):
+    """
+    Add PDF files to a work queue and report their status as they are analysed
+    """
+    if input_dir is None and input_list is None:
+        raise typer.BadParameter("input_dir is required without input_list", param_hint="'--input-dir'")
+    coordinator = Coordinator(WORK_QUEUES[work_queue_backend](work_queue))
+    coordinator.enqueue(InputFiles(Path() if input_dir is None else input_dir, input_list))
+    if wait:
+        coordinator.wait()
+
+@app.command()
+def serve(
+    languages: List[str] = typer.Option(..., '--language', help="An ISO3 language code.", callback=validate_languages),
+    host: Optional[str] = typer.Option('127.0.0.1', help="Host the server listens on."),
+    port: Optional[int] = typer.Option(8000, help="Port the server listens on."),
+    socket: Optional[Path] = typer.Option(None, help="Path to a Unix socket to listen on instead of --host and --port."),
+    workers: Optional[int] = typer.Option(1, help="Number of worker processes, each keeping the models loaded.", callback=validate_parallel),
+    queue_size: Optional[int] = typer.Option(16, help="Maximum number of requests waiting for a worker. Requests received when it's full get a 503 response.", callback=validate_positive_int),
+    batch_size: Optional[int] = typer.Option(1, help="Maximum number of waiting requests taken at once by a worker, and analysed one after the other.", callback=validate_positive_int),
+    request_timeout: Optional[int] = typer.Option(600, help="Seconds a request waits for its result before getting a 504 response.", callback=validate_positive_int),
+    max_pages: Optional[int] = typer.Option(5, help="Maximum number of pages to process per PDF file.", callback=validate_max_pages),
+    text_layer: Optional[bool] = typer.Option(True, help="Use the text layer of PDF files when available instead of OCR."),
+    min_text_chars: Optional[int] = typer.Option(100, help="Minimum number of characters in the text layer of a page to skip its OCR.", callback=validate_min_text_chars),
+    ocr_backend: Optional[str] = typer.Option('pytesseract', help="OCR backend: 'pytesseract' (one tesseract process per page) or 'tesserocr' (one persistent engine per worker).", callback=validate_ocr_backend),
+    confidence_margin: Optional[float] = typer.Option(None, help="Stop processing a PDF file once the leading language is ahead of the runner-up by this margin (between 0 and 1).", callback=validate_confidence_margin),
+    dpi: Optional[int] = typer.Option(None, help="Resolution of the pages rendered for OCR. Default is poppler's (150).", callback=validate_dpi),
+    weighting: Optional[str] = typer.Option(CoeffAverages.WEIGHTING_NONE, help="How pages are weighted in the language averages of a PDF file: 'none' (equally) or 'chars' (by the number of characters recognised).", callback=validate_weighting)):
+    """
+    Serve the detection over HTTP with a pool of warm workers
+    """
+    server = DetectionServer(languages, max_pages, workers, queue_size, batch_size, request_timeout, text_layer=text_layer,
+                             min_text_chars=min_text_chars, ocr_backend=ocr_backend,
+                             confidence_margin=confidence_margin, dpi=dpi, weighting=weighting)
+    server.serve(host, port, socket)
+
+@app.command()
+def benchmark(
+    result_file: Path = typer.Argument(help="Path to the JSON file where the results are written."),
+    corpus_dir: Optional[Path] = typer.Option('benchmark', help="Path to the directory of the generated corpus, reused if it was generated with the same settings."),
+    languages: List[str] = typer.Option(['eng', 'fra', 'deu', 'spa'], '--language', help="An ISO3 language code of the corpus.", callback=validate_benchmark_languages),
+    docs_per_kind: Optional[int] = typer.Option(4, help="Number of PDF files of each kind (text, image, blank and mixed).", callback=validate_positive_int),
+    pages: Optional[int] = typer.Option(3, help="Number of pages of each PDF file.", callback=validate_positive_int),
+    seed: Optional[int] = typer.Option(0, help="Seed of the random generator of the corpus."),
+    max_pages: Optional[int] = typer.Option(5, help="Maximum number of pages to process per PDF file.", callback=validate_max_pages),
+    parallel: Optional[int] = typer.Option(1, help="Number of worker processes of the end-to-end run.", callback=validate_parallel),
+    mode: Optional[str] = typer.Option(Benchmark.MODE_POOL, help="How the end-to-end run processes files: 'pool', 'pipeline' or 'async'.", callback=validate_benchmark_mode),
+    stages: Optional[bool] = typer.Option(True, help="Measure each stage (text layer, render, OCR, detect and aggregate) on its own.")):
+    """
+    Measure the throughput, memory and accuracy of the detection on a generated corpus
+    """
+    corpus = Corpus(corpus_dir, languages, docs_per_kind, pages, seed)
+    benchmark = Benchmark(corpus, max_pages, parallel, mode, stages)
+    results = benchmark.run()
+    result_file.write_text(json.dumps(results, indent=2), encoding="UTF-8")
+    benchmark.print_results(results)
+
 @app.command()
 def report(
     report_file: Path = typer.Argument(help="Path to report files."),
     output_dir: Optional[Path] = typer.Option('out', help="Path to the output directory."),
-    report_format: Optional[str] = typer.Option('json', help="Format of the report (only JSON and YAML are currently supported)")):
+    report_format: Optional[str] = typer.Option('json', help="Format of the report: json, jsonl, csv or yaml (json, jsonl and csv are written as reports are read)"),
+    store: Optional[str] = typer.Option(DIRECTORY_STORE, help="Where results were saved: 'dirs' (one directory per PDF file) or 'sqlite' (a single database in the output directory).", callback=validate_store),
+    threads: Optional[int] = typer.Option(4, help="Number of threads reading the files of output directories.", callback=validate_threads),
+    rescan: Optional[bool] = typer.Option(False, help="Walk the output directory instead of reading the manifest written by the detection.")):
     """
     Process generated files to output a report
     """
-    report = Report(report_file, output_dir, report_format)
+    report = Report(report_file, output_dir, report_format, store, threads, rescan)
     report.generate()
\ No newline at end of file
@@ -0,0 +1,106 @@
+import hashlib
+import os
+import sys
+
+from pathlib import Path
+from typing import Iterator, Optional, TextIO, Tuple
+
+class InputFiles:
+
+    def __init__(self, input_dir: Path, input_list: Optional[Path] = None, shard: Optional[Tuple[int, int]] = None,
+                 relative_to: Optional[Path] = None):
+        """
+        Initialize the InputFiles class, the PDF files to process read from an
+        input list or found in an input directory.
+
+        Args:
+            input_dir: Path to the input directory, walked if there is no input list.
+            input_list: Path to a file listing the PDF files to process, one per line, or '-'
+                to read them from the standard input.
+            shard: Only keep the PDF files of this shard, as an (index, count) tuple with
+                an index starting at 1. Files are assigned to shards by the hash of their path.
+            relative_to: Path to the directory the hashed paths are relative to. Default is input_dir.
+        """
+        self.input_dir = input_dir
+        self.input_list = input_list
+        self.shard = shard
+        self.relative_to = input_dir.resolve() if relative_to is None else relative_to.resolve()
+
+    def __iter__(self) -> Iterator[Path]:
+        input_files = self.walk(self.input_dir) if self.input_list is None else self.read_list()
+        for input_file in input_files:
+            if self.shard is None or self.is_in_shard(input_file):
+                yield input_file
+
+    def walk(self, directory: Path) -> Iterator[Path]:
+        """
+        Walk a directory with a single scandir call per directory. Symbolic links
+        to directories aren't followed, so a link cycle can't make the walk loop.
+
+        Args:
+            directory: Directory to walk.
+
+        Returns:
+            An iterator of paths to the PDF files in the directory and its sub-directories.
+        """
+        files, sub_dirs = [], []
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    sub_dirs.append(entry.name)
+                elif entry.is_file() and entry.name.endswith('.pdf'):
+                    files.append(entry.name)
+        for name in sorted(files):
+            yield directory / name
+        for name in sorted(sub_dirs):
+            yield from self.walk(directory / name)
+
+    def read_list(self) -> Iterator[Path]:
+        """
+        Read the paths of the input list, from the standard input if it is '-'.
+
+        Returns:
+            An iterator of paths to PDF files.
+        """
+        if str(self.input_list) == '-':
+            yield from self.read_lines(sys.stdin)
+        else:
+            with self.input_list.open(encoding="UTF-8") as source:
+                yield from self.read_lines(source)
+
+    @staticmethod
+    def read_lines(source: TextIO) -> Iterator[Path]:
+        """
+        Read one path per line, skipping empty lines.
+
+        Args:
+            source: Text stream to read.
+
+        Returns:
+            An iterator of paths.
+        """
+        for line in source:
+            line = line.rstrip('\r\n')
+            if line.strip():
+                yield Path(line)
+
+    def is_in_shard(self, input_file: Path) -> bool:
+        """
+        Check if a PDF file belongs to the shard. The path of the file relative to
+        relative_to is hashed, so every node sharing the same corpus splits it the
+        same way even if it's mounted at different places. The absolute path of a
+        file outside relative_to is hashed instead, so a single shard reports it.
+
+        Args:
+            input_file: Path to the input PDF file.
+
+        Returns:
+            True if the file belongs to the shard.
+        """
+        index, count = self.shard
+        path = input_file.resolve()
+        if path == self.relative_to or self.relative_to in path.parents:
+            path = path.relative_to(self.relative_to)
+        path = path.as_posix()
+        digest = hashlib.sha1(path.encode('UTF-8')).digest()
+        return int.from_bytes(digest[:8], 'big') % count == index - 1
@@ -0,0 +1,92 @@
+import os
+
+from pathlib import Path
+from typing import Set
+
+from src.manifest import Manifest
+
+class Journal(Manifest):
+    MANIFEST_FILE = 'journal.jsonl'
+
+    def __init__(self, journal_file: Path):
+        """
+        Initialize the Journal class, an append-only JSON Lines file recording the
+        pages and documents completed in an output directory, across runs. A run
+        killed halfway through a document is resumed from its unfinished pages.
+
+        Args:
+            journal_file: Path to the journal file.
+        """
+        super().__init__(journal_file)
+        self.documents = set()
+        self.pages = dict()
+
+    @staticmethod
+    def get_key(output_file_dir: Path) -> str:
+        """
+        Get the key identifying a document in the journal, without touching the file system.
+
+        Args:
+            output_file_dir: Directory of the analysis results of the document.
+
+        Returns:
+            The absolute path of the directory.
+        """
+        return os.path.abspath(output_file_dir)
+
+    def load(self):
+        """
+        Read the completed pages and documents of the journal in memory, once per run.
+        """
+        self.documents = set()
+        self.pages = dict()
+        if not self.exists():
+            return
+        for entry in self.read_lines():
+            if 'page' in entry:
+                self.pages.setdefault(entry['output_dir'], set()).add(entry['page'])
+            else:
+                self.documents.add(entry['output_dir'])
+
+    def add_page(self, output_file_dir: Path, page_name: str):
+        """
+        Record a page whose text and language information are saved.
+
+        Args:
+            output_file_dir: Directory of the analysis results of the document.
+            page_name: Name of the page.
+        """
+        self.append(dict(output_dir=self.get_key(output_file_dir), page=page_name))
+
+    def add_document(self, output_file_dir: Path):
+        """
+        Record a document whose pages are aggregated.
+
+        Args:
+            output_file_dir: Directory of the analysis results of the document.
+        """
+        self.append(dict(output_dir=self.get_key(output_file_dir), status='DONE'))
+
+    def is_done(self, output_file_dir: Path) -> bool:
+        """
+        Check if a document was completed according to the journal loaded.
+
+        Args:
+            output_file_dir: Directory of the analysis results of the document.
+
+        Returns:
+            True if the document was completed.
+        """
+        return self.get_key(output_file_dir) in self.documents
+
+    def get_pages(self, output_file_dir: Path) -> Set[str]:
+        """
+        Get the pages of a document completed according to the journal loaded.
+
+        Args:
+            output_file_dir: Directory of the analysis results of the document.
+
+        Returns:
+            The names of the completed pages.
+        """
+        return self.pages.get(self.get_key(output_file_dir), set())
@@ -0,0 +1,112 @@
+import fcntl
+import hashlib
+import json
+import os
+
+from pathlib import Path
+from typing import Iterator
+
+class Manifest:
+    MANIFEST_FILE = 'manifest.jsonl'
+
+    def __init__(self, manifest_file: Path):
+        """
+        Initialize the Manifest class, an append-only JSON Lines file listing
+        the documents analysed in an output directory.
+
+        Args:
+            manifest_file: Path to the manifest file.
+        """
+        self.manifest_file = manifest_file
+
+    @classmethod
+    def from_output_dir(cls, output_dir: Path) -> 'Manifest':
+        """
+        Get the manifest of an output directory.
+
+        Args:
+            output_dir: Path to the output directory.
+
+        Returns:
+            A Manifest instance.
+        """
+        return cls(Path(output_dir) / cls.MANIFEST_FILE)
+
+    def exists(self) -> bool:
+        """
+        Check if the manifest file exists.
+
+        Returns:
+            True if the manifest file exists.
+        """
+        return self.manifest_file.is_file()
+
+    def append(self, entry: dict):
+        """
+        Append an entry to the manifest. Each entry is written with a single
+        write while holding an exclusive lock, so entries from concurrent
+        workers are never interleaved.
+
+        Args:
+            entry: Entry to append, serializable in JSON.
+        """
+        line = (json.dumps(entry) + '\n').encode('UTF-8')
+        self.manifest_file.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.manifest_file, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+
+    def read(self, key: str = 'output_dir') -> Iterator[dict]:
+        """
+        Iterate over the entries of the manifest. When several entries have
+        the same key (a document analysed again), only the last one is kept.
+
+        Entries are streamed, but finding the last entry of each document needs
+        a digest of every key in memory (about 100 bytes per document, so
+        100 MB for a million documents), instead of the entries themselves.
+
+        Args:
+            key: Name of the entries attribute identifying a document.
+
+        Returns:
+            An iterator of entries, in the order they were appended.
+        """
+        # First pass: only keep the position of the last entry of each document
+        last_lines = dict()
+        for index, entry in enumerate(self.read_lines()):
+            last_lines[self.get_digest(entry[key])] = index
+        # Second pass: stream the entries
+        for index, entry in enumerate(self.read_lines()):
+            if last_lines[self.get_digest(entry[key])] == index:
+                yield entry
+
+    @staticmethod
+    def get_digest(value: str) -> bytes:
+        """
+        Get a short digest of the key of an entry, smaller in memory than the key.
+
+        Args:
+            value: Key of the entry.
+
+        Returns:
+            An 8-byte digest.
+        """
+        return hashlib.blake2b(str(value).encode('UTF-8'), digest_size=8).digest()
+
+    def read_lines(self) -> Iterator[dict]:
+        """
+        Iterate over all the entries of the manifest, skipping corrupted lines.
+
+        Returns:
+            An iterator of entries.
+        """
+        with self.manifest_file.open(encoding="UTF-8") as source:
+            for line in source:
+                try:
+                    yield json.loads(line)
+                # A line may be incomplete if a worker was killed while writing
+                except json.JSONDecodeError:
+                    continue
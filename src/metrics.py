@@ -0,0 +1,303 @@
+import json
+import math
+import os
+import time
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import List, Optional
+
+# Timings of the document analysed in the current process, or asyncio task
+_current_timings = ContextVar('current_timings', default=None)
+
+class StageTimings:
+    """
+    Time spent in each stage of the analysis of a document, and number of calls.
+    """
+    TEXT_LAYER = 'text_layer'
+    RENDER = 'render'
+    OCR = 'ocr'
+    DETECT = 'detect'
+    SAVE = 'save'
+    AGGREGATE = 'aggregate'
+    STAGES = (TEXT_LAYER, RENDER, OCR, DETECT, SAVE, AGGREGATE)
+
+    def __init__(self, timings: Optional[dict] = None):
+        """
+        Initialize the StageTimings class.
+
+        Args:
+            timings: Timings to start from, as returned by to_dict().
+        """
+        self.timings = dict()
+        self.add(timings)
+
+    def add(self, timings: Optional[dict]):
+        """
+        Add timings measured elsewhere, for instance by another worker.
+
+        Args:
+            timings: Timings as returned by to_dict().
+        """
+        for stage, timing in (timings or dict()).items():
+            self.add_time(stage, timing['seconds'], timing['calls'])
+
+    def add_time(self, stage: str, seconds: float, calls: int = 1):
+        """
+        Add time spent in a stage.
+
+        Args:
+            stage: Name of the stage (see STAGES).
+            seconds: Time spent in the stage.
+            calls: Number of calls the time was spent in.
+        """
+        timing = self.timings.setdefault(stage, dict(seconds=0.0, calls=0))
+        timing['seconds'] += seconds
+        timing['calls'] += calls
+
+    def to_dict(self) -> dict:
+        """
+        Get the timings, serializable in JSON.
+
+        Returns:
+            The seconds spent and number of calls of each stage.
+        """
+        return {stage: dict(seconds=round(timing['seconds'], 6), calls=timing['calls'])
+                for stage, timing in self.timings.items()}
+
+    @staticmethod
+    def merge(*timings: Optional[dict]) -> dict:
+        """
+        Merge timings of the same document.
+
+        Args:
+            *timings: Timings as returned by to_dict(), or None.
+
+        Returns:
+            The merged timings.
+        """
+        merged = StageTimings()
+        for stage_timings in timings:
+            merged.add(stage_timings)
+        return merged.to_dict()
+
+    @contextmanager
+    def activate(self):
+        """
+        Record the stages measured in the block, in the current process or asyncio task.
+        """
+        token = _current_timings.set(self)
+        try:
+            yield self
+        finally:
+            _current_timings.reset(token)
+
+    @staticmethod
+    @contextmanager
+    def measure(stage: Optional[str]):
+        """
+        Measure the time spent in the block as a stage of the active timings, if any.
+
+        Args:
+            stage: Name of the stage (see STAGES). Nothing is measured if None.
+        """
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            timings = _current_timings.get()
+            if stage is not None and timings is not None:
+                timings.add_time(stage, time.monotonic() - start)
+
+
+class TimingsSummary:
+    """
+    Distribution of the time spent in each stage per document over a run. Times are
+    counted in logarithmic buckets, so memory doesn't grow with the number of
+    documents: quantiles are the upper bound of their bucket (at most 19% above).
+    """
+    BUCKET_MIN = 0.001
+    BUCKET_FACTOR = 2 ** 0.25
+    BUCKETS = 100
+    QUANTILES = (0.5, 0.95)
+
+    def __init__(self):
+        self.stages = dict()
+
+    def add(self, timings: Optional[dict]):
+        """
+        Count the timings of a document.
+
+        Args:
+            timings: Timings as returned by StageTimings.to_dict().
+        """
+        for stage, timing in (timings or dict()).items():
+            summary = self.stages.setdefault(stage, dict(buckets=[0] * self.BUCKETS, documents=0, seconds=0.0,
+                                                         calls=0, max=0.0))
+            summary['buckets'][self.get_bucket(timing['seconds'])] += 1
+            summary['documents'] += 1
+            summary['seconds'] += timing['seconds']
+            summary['calls'] += timing['calls']
+            summary['max'] = max(summary['max'], timing['seconds'])
+
+    def get_bucket(self, seconds: float) -> int:
+        """
+        Get the bucket of a time.
+
+        Args:
+            seconds: Time spent in a stage.
+
+        Returns:
+            Index of the bucket.
+        """
+        if seconds <= self.BUCKET_MIN:
+            return 0
+        return min(math.ceil(math.log(seconds / self.BUCKET_MIN, self.BUCKET_FACTOR)), self.BUCKETS - 1)
+
+    def get_quantile(self, stage: str, quantile: float) -> float:
+        """
+        Get a quantile of the time spent in a stage per document.
+
+        Args:
+            stage: Name of the stage.
+            quantile: Quantile, between 0 and 1.
+
+        Returns:
+            The quantile, in seconds.
+        """
+        summary = self.stages[stage]
+        rank = max(math.ceil(quantile * summary['documents']), 1)
+        seen = 0
+        for bucket, count in enumerate(summary['buckets']):
+            seen += count
+            if seen >= rank:
+                return min(self.BUCKET_MIN * self.BUCKET_FACTOR ** bucket, summary['max'])
+        return summary['max']
+
+    def get_stages(self) -> List[str]:
+        """
+        Get the stages measured, in the order of the analysis.
+
+        Returns:
+            Names of the stages.
+        """
+        order = list(StageTimings.STAGES)
+        return sorted(self.stages, key=lambda stage: order.index(stage) if stage in order else len(order))
+
+    def to_dict(self) -> dict:
+        """
+        Get the summary, serializable in JSON.
+
+        Returns:
+            The quantiles, maximum and total of the time spent in each stage per document.
+        """
+        return {stage: dict(p50=self.get_quantile(stage, 0.5), p95=self.get_quantile(stage, 0.95),
+                            max=self.stages[stage]['max'], seconds=self.stages[stage]['seconds'],
+                            calls=self.stages[stage]['calls'], documents=self.stages[stage]['documents'])
+                for stage in self.get_stages()}
+
+    def get_lines(self) -> List[str]:
+        """
+        Describe the time spent in each stage per document.
+
+        Returns:
+            A line for each stage.
+        """
+        return [f"{stage}: p50 {summary['p50']:.3f}s, p95 {summary['p95']:.3f}s, max {summary['max']:.3f}s "
+                f"({summary['calls']} calls, {summary['seconds']:.1f}s in total)"
+                for stage, summary in self.to_dict().items()]
+
+
+class RunMetrics:
+    FORMAT_PROMETHEUS = 'prometheus'
+    FORMAT_JSON = 'json'
+    FORMATS = (FORMAT_PROMETHEUS, FORMAT_JSON)
+    # Minimum time between two exports during a run, in seconds
+    EXPORT_INTERVAL = 15
+
+    def __init__(self, metrics_file: Optional[Path] = None, metrics_format: str = FORMAT_PROMETHEUS):
+        """
+        Initialize the RunMetrics class, the statuses and stage timings of the documents
+        analysed during a run, optionally exported in a file read by a local scraper.
+
+        Args:
+            metrics_file: Path to the file the metrics are exported to. Not exported if None.
+            metrics_format: Format of the metrics file (see FORMATS).
+        """
+        self.metrics_file = metrics_file
+        self.metrics_format = metrics_format
+        self.timings = TimingsSummary()
+        self.statuses = dict()
+        self.pages = 0
+        self.start = time.time()
+        self.exported_at = time.monotonic()
+
+    def add(self, status: dict):
+        """
+        Count the final status of a document, and export the metrics if they
+        weren't exported recently.
+
+        Args:
+            status: The status of the document, with its timings and pages used, if any.
+        """
+        name = status['status'].strip()
+        self.statuses[name] = self.statuses.get(name, 0) + 1
+        self.pages += status.get('pages', 0)
+        self.timings.add(status.get('timings'))
+        if self.metrics_file is not None and time.monotonic() - self.exported_at >= self.EXPORT_INTERVAL:
+            self.export()
+
+    def to_dict(self) -> dict:
+        """
+        Get the metrics, serializable in JSON.
+
+        Returns:
+            The documents by status, pages used and summary of the stage timings.
+        """
+        return dict(start=self.start, updated=time.time(), documents=dict(self.statuses), pages=self.pages,
+                    stages=self.timings.to_dict())
+
+    def to_prometheus(self) -> str:
+        """
+        Get the metrics in the Prometheus text format.
+
+        Returns:
+            The metrics.
+        """
+        stages = self.timings.to_dict()
+        lines = ['# HELP pld_documents_total PDF files analysed, by status.',
+                 '# TYPE pld_documents_total counter']
+        lines += [f'pld_documents_total{{status="{name}"}} {count}' for name, count in sorted(self.statuses.items())]
+        lines += ['# HELP pld_pages_total Pages used to detect the language of PDF files.',
+                  '# TYPE pld_pages_total counter',
+                  f'pld_pages_total {self.pages}',
+                  '# HELP pld_stage_calls_total Calls of each stage.',
+                  '# TYPE pld_stage_calls_total counter']
+        lines += [f'pld_stage_calls_total{{stage="{stage}"}} {summary["calls"]}' for stage, summary in stages.items()]
+        lines += ['# HELP pld_stage_document_seconds Time spent in each stage per PDF file.',
+                  '# TYPE pld_stage_document_seconds summary']
+        for stage, summary in stages.items():
+            for quantile in TimingsSummary.QUANTILES:
+                value = self.timings.get_quantile(stage, quantile)
+                lines.append(f'pld_stage_document_seconds{{stage="{stage}",quantile="{quantile}"}} {value}')
+            lines.append(f'pld_stage_document_seconds_sum{{stage="{stage}"}} {summary["seconds"]}')
+            lines.append(f'pld_stage_document_seconds_count{{stage="{stage}"}} {summary["documents"]}')
+        lines += ['# HELP pld_run_start_time_seconds Start time of the run.',
+                  '# TYPE pld_run_start_time_seconds gauge',
+                  f'pld_run_start_time_seconds {self.start}']
+        return '\n'.join(lines) + '\n'
+
+    def export(self):
+        """
+        Write the metrics file. It's written to a temporary file first and renamed,
+        so a scraper never reads it half written.
+        """
+        if self.metrics_format == RunMetrics.FORMAT_JSON:
+            content = json.dumps(self.to_dict(), indent=2)
+        else:
+            content = self.to_prometheus()
+        temporary_file = self.metrics_file.with_name(f'.{self.metrics_file.name}.{os.getpid()}')
+        temporary_file.write_text(content, encoding="UTF-8")
+        os.replace(temporary_file, self.metrics_file)
+        self.exported_at = time.monotonic()
@@ -1,21 +1,650 @@
+import asyncio
+import io
 import json
 import os
 import pytesseract
+import sh
+import time
 
-from multiprocessing import Pool, JoinableQueue, Manager
+from contextlib import contextmanager
+from functools import partial
+from multiprocessing import Pool, Queue, Value
 from lingua import IsoCode639_3, LanguageDetectorBuilder
 from langcodes import Language, find as find_language
 from pathlib import Path
 from PIL import Image
 from rich import print
-from rich.progress import Progress, SpinnerColumn
-from sh import pdftoppm
-from typing import Optional, List
+from rich.progress import BarColumn, MofNCompleteColumn, Progress, SpinnerColumn, TimeElapsedColumn
+from queue import Empty
+from src.cache import ResultCache
+from src.inputs import InputFiles
+from src.journal import Journal
+from src.manifest import Manifest
+from src.metrics import RunMetrics, StageTimings
+from src.store import DIRECTORY_STORE, MemoryStore, SqliteStore
+from src.workqueue import WORK_QUEUES, SqliteWorkQueue, WorkQueue
+from sh import pdfinfo, pdftoppm, pdftotext, ErrorReturnCode
+from typing import Callable, Iterator, Optional, List, Set, Tuple, Union
+
+
+class OcrBackend:
+    """
+    Base class for the OCR engines used to extract text from images.
+    """
+    name = None
+
+    def image_to_string(self, image: Image.Image, lang: str) -> str:
+        """
+        Extract text from an image.
+
+        Args:
+            image: Image to extract text from.
+            lang: Tesseract languages joined with a '+'.
+
+        Returns:
+            Extracted text from the image.
+        """
+        raise NotImplementedError()
+
+    def detect_script(self, image: Image.Image) -> Optional[str]:
+        """
+        Detect the script of the text in an image with Tesseract OSD.
+
+        Args:
+            image: Image to detect the script of.
+
+        Returns:
+            Name of the script (e.g. 'Latin' or 'Cyrillic'), or None if it can't be detected.
+        """
+        raise NotImplementedError()
+
+
+class PytesseractBackend(OcrBackend):
+    """
+    Run the tesseract binary in a subprocess for every image. The language
+    models are loaded again for each image.
+    """
+    name = 'pytesseract'
+
+    def image_to_string(self, image: Image.Image, lang: str) -> str:
+        return pytesseract.image_to_string(image, lang=lang)
+
+    def detect_script(self, image: Image.Image) -> Optional[str]:
+        try:
+            return pytesseract.image_to_osd(image, output_type=pytesseract.Output.DICT)['script']
+        # Not enough text on the image, or no OSD model installed
+        except pytesseract.TesseractError:
+            return None
+
+
+class TesserocrBackend(OcrBackend):
+    """
+    Keep a Tesseract API handle in the current process, initialised once
+    for a set of languages and reused for every image.
+    """
+    name = 'tesserocr'
+
+    def __init__(self):
+        self.apis = dict()
+        self.osd_api = None
+
+    def __getstate__(self):
+        # API handles can't be shared between processes: each worker
+        # process initialises its own handles.
+        return dict(self.__dict__, apis=dict(), osd_api=None)
+
+    def get_api(self, lang: str):
+        """
+        Get the API handle initialised for the given languages, creating it
+        on first use.
+
+        Args:
+            lang: Tesseract languages joined with a '+'.
+
+        Returns:
+            A tesserocr.PyTessBaseAPI instance.
+        """
+        if lang not in self.apis:
+            from tesserocr import PyTessBaseAPI
+            self.apis[lang] = PyTessBaseAPI(lang=lang)
+        return self.apis[lang]
+
+    def image_to_string(self, image: Image.Image, lang: str) -> str:
+        api = self.get_api(lang)
+        api.SetImage(image)
+        return api.GetUTF8Text()
+
+    def detect_script(self, image: Image.Image) -> Optional[str]:
+        if self.osd_api is None:
+            from tesserocr import PyTessBaseAPI, PSM
+            self.osd_api = PyTessBaseAPI(psm=PSM.OSD_ONLY)
+        self.osd_api.SetImage(image)
+        osd = self.osd_api.DetectOrientationScript()
+        return None if osd is None else osd['script_name']
+
+    @staticmethod
+    def is_available() -> bool:
+        """
+        Check if the optional tesserocr package is installed.
+        """
+        try:
+            import tesserocr # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+
+OCR_BACKENDS = {backend.name: backend for backend in (PytesseractBackend, TesserocrBackend)}
+
+# Scripts detected by Tesseract OSD which aren't named after an ISO 15924 script
+OSD_SCRIPTS = {
+    'Fraktur': ('Latn',),
+    'Han': ('Hans', 'Hant', 'Jpan', 'Kore'),
+    'Hangul': ('Kore',),
+    'Korean': ('Kore',),
+    'Hiragana': ('Jpan',),
+    'Katakana': ('Jpan',),
+}
+
+
+class RenderProfile:
+    """
+    How the pages of PDF files are rendered for OCR: resolution, colors, and
+    region of the page kept.
+    """
+    COLOR = 'color'
+    GRAY = 'gray'
+    MONO = 'mono'
+    COLORS = (COLOR, GRAY, MONO)
+
+    def __init__(self, dpi: Optional[int] = None, color: str = COLOR, crop: Optional[float] = None):
+        """
+        Args:
+            dpi: Resolution of the rendered pages. Poppler's default (150) if None.
+            color: COLOR, GRAY or MONO (black and white).
+            crop: Fraction of the page height kept around its middle. The whole page if None.
+        """
+        self.dpi = dpi
+        self.color = color
+        self.crop = crop
+
+    def get_pdftoppm_args(self, dpi: Optional[int] = None, jpeg: bool = False) -> list:
+        """
+        Get the pdftoppm arguments rendering pages with this profile.
+
+        Args:
+            dpi: Resolution overriding the profile's.
+            jpeg: Whether pages are rendered as JPEG images.
+
+        Returns:
+            A list of arguments.
+        """
+        args = []
+        dpi = self.dpi if dpi is None else dpi
+        if dpi is not None:
+            args += ['-r', dpi]
+        # JPEG images can't be monochrome, their closest option is grayscale
+        if self.color == self.GRAY or (self.color == self.MONO and jpeg):
+            args.append('-gray')
+        elif self.color == self.MONO:
+            args.append('-mono')
+        return args
+
+    def crop_image(self, image: Image.Image) -> Image.Image:
+        """
+        Keep the central band of a rendered page.
+
+        Args:
+            image: The rendered page.
+
+        Returns:
+            The cropped page, or the page itself if crop isn't set.
+        """
+        if self.crop is None:
+            return image
+        width, height = image.size
+        top = round(height * (1 - self.crop) / 2)
+        return image.crop((0, top, width, height - top))
+
+
+class CoeffAverages:
+    """
+    Running average of the language coefficients of a document's pages, kept as
+    weighted sums so the averages of pages analysed by different workers can be merged.
+    """
+    WEIGHTING_NONE = 'none'
+    WEIGHTING_CHARS = 'chars'
+    WEIGHTINGS = (WEIGHTING_NONE, WEIGHTING_CHARS)
+
+    def __init__(self, langs: List[str], weighting: str = WEIGHTING_NONE):
+        """
+        Args:
+            langs: Languages to average, as keys of the language files.
+            weighting: How pages are weighted (see WEIGHTINGS): equally, or by the
+                number of characters recognised in their text.
+        """
+        self.sums = dict.fromkeys(langs, 0)
+        self.weight = 0
+        self.count = 0
+        self.skipped = dict()
+        self.weighting = weighting
+
+    def add(self, coeffs: dict):
+        """
+        Add the language coefficients of a page to the averages. Pages skipped
+        before their OCR are only counted.
+
+        Args:
+            coeffs: Coefficient of each language for the page, with the number of
+                characters of its text (chars) if known.
+        """
+        if 'skipped' in coeffs:
+            self.skipped[coeffs['skipped']] = self.skipped.get(coeffs['skipped'], 0) + 1
+            return
+        weight = self.get_weight(coeffs)
+        for lang in self.sums:
+            self.sums[lang] += coeffs[lang] * weight
+        self.weight += weight
+        self.count += 1
+
+    def get_weight(self, coeffs: dict) -> int:
+        """
+        Get the weight of a page in the averages.
+
+        Args:
+            coeffs: Coefficient of each language for the page.
+
+        Returns:
+            1, or the number of characters of the page with the WEIGHTING_CHARS weighting.
+            Pages saved before their characters were counted weigh 1.
+        """
+        if self.weighting == CoeffAverages.WEIGHTING_CHARS:
+            return coeffs.get('chars', 1)
+        return 1
+
+    def merge(self, averages: Optional[dict]):
+        """
+        Add the averages of other pages of the document, for instance analysed by another worker.
+
+        Args:
+            averages: Averages as returned by to_dict(), or None.
+        """
+        if averages is None:
+            return
+        for lang in self.sums:
+            self.sums[lang] += averages['sums'][lang]
+        self.weight += averages['weight']
+        self.count += averages['count']
+        for reason, count in averages['skipped'].items():
+            self.skipped[reason] = self.skipped.get(reason, 0) + count
+
+    def to_dict(self) -> dict:
+        """
+        Get the averages, serializable in JSON.
+
+        Returns:
+            The weighted sum of each language coefficient, the total weight, and the
+            number of pages used and skipped.
+        """
+        return dict(sums=dict(self.sums), weight=self.weight, count=self.count, skipped=dict(self.skipped))
+
+    @property
+    def avgs(self) -> dict:
+        """
+        The average coefficient of each language, 0 if no page has any weight.
+        """
+        return {lang: total / self.weight if self.weight else 0 for lang, total in self.sums.items()}
+
+    @property
+    def lang(self) -> str:
+        """
+        The language with the highest average coefficient.
+        """
+        avgs = self.avgs
+        return max(avgs, key=avgs.get)
+
+    @property
+    def margin(self) -> float:
+        """
+        The difference between the two highest average coefficients.
+        """
+        first, second, *_ = sorted(self.avgs.values(), reverse=True) + [0]
+        return first - second
+
+
+class PageFilter:
+    """
+    Find the pages of a document which don't need OCR: blank pages, and
+    near-duplicates of pages already processed (e.g. repeated letterheads).
+    """
+    BLANK = 'blank'
+    DUPLICATE = 'duplicate'
+    # Size (in pixels) of the longest side of pages downscaled to measure their ink
+    THUMBNAIL_SIZE = 256
+    # Gray level under which a pixel is ink
+    INK_LEVEL = 128
+    # Pages with a lower ratio of ink pixels are blank
+    BLANK_INK_RATIO = 0.002
+    # Side of the grid compared by the perceptual hash of pages
+    HASH_SIZE = 16
+    # Pages whose hashes differ by this number of bits or less are duplicates
+    DUPLICATE_DISTANCE = 10
+
+    def __init__(self, skip_blank_pages: bool = True, skip_duplicate_pages: bool = True):
+        """
+        Args:
+            skip_blank_pages: Find blank pages.
+            skip_duplicate_pages: Find near-duplicate pages.
+        """
+        self.skip_blank_pages = skip_blank_pages
+        self.skip_duplicate_pages = skip_duplicate_pages
+        # Name of the first page with each hash
+        self.hashes = dict()
+
+    def get_ink_ratio(self, image: Image.Image) -> float:
+        """
+        Get the ratio of dark pixels in a page, from its histogram.
+
+        Args:
+            image: The page rendered as an image.
+
+        Returns:
+            A ratio between 0 and 1.
+        """
+        thumbnail = image.convert('L')
+        thumbnail.thumbnail((self.THUMBNAIL_SIZE, self.THUMBNAIL_SIZE))
+        histogram = thumbnail.histogram()
+        return sum(histogram[:self.INK_LEVEL]) / sum(histogram)
+
+    def get_hash(self, image: Image.Image) -> int:
+        """
+        Get the difference hash of a page: one bit per cell of a downscaled
+        grid, set when the cell is brighter than its right neighbour.
+
+        Args:
+            image: The page rendered as an image.
+
+        Returns:
+            The hash as an integer of HASH_SIZE * HASH_SIZE bits.
+        """
+        grid = image.convert('L').resize((self.HASH_SIZE + 1, self.HASH_SIZE))
+        pixels = grid.tobytes()
+        page_hash = 0
+        for row in range(self.HASH_SIZE):
+            for column in range(self.HASH_SIZE):
+                index = row * (self.HASH_SIZE + 1) + column
+                page_hash = page_hash << 1 | (pixels[index] > pixels[index + 1])
+        return page_hash
+
+    def check(self, image: Image.Image, page_name: str) -> Optional[dict]:
+        """
+        Check if a page can be skipped.
+
+        Args:
+            image: The page rendered as an image.
+            page_name: Name of the page.
+
+        Returns:
+            Why the page is skipped (with the page it duplicates, if any), or None
+            if the page needs OCR.
+        """
+        if self.skip_blank_pages and self.get_ink_ratio(image) < self.BLANK_INK_RATIO:
+            return dict(skipped=self.BLANK)
+        if self.skip_duplicate_pages:
+            page_hash = self.get_hash(image)
+            for seen_hash, seen_page_name in self.hashes.items():
+                if bin(page_hash ^ seen_hash).count('1') <= self.DUPLICATE_DISTANCE:
+                    return dict(skipped=self.DUPLICATE, duplicate_of=seen_page_name)
+            self.hashes[page_hash] = page_name
+        return None
+
+
+class LanguageNarrowing:
+    """
+    Languages used to OCR the pages of a document, narrowed to the leading
+    languages of its running averages after a number of pages, and widened
+    back to all the languages once a page's confidence drops.
+    """
+
+    def __init__(self, langs: List[str], after_pages: int, top_langs: int, min_confidence: float):
+        """
+        Args:
+            langs: All the languages, as keys of the language files.
+            after_pages: Number of pages processed before narrowing the languages.
+            top_langs: Number of leading languages kept once narrowed.
+            min_confidence: Minimum coefficient of the leading kept language on a page
+                to keep the languages narrowed.
+        """
+        self.langs = langs
+        self.after_pages = after_pages
+        self.top_langs = top_langs
+        self.min_confidence = min_confidence
+        self.widened = False
+
+    def get_langs(self, coeff_avgs: CoeffAverages) -> List[str]:
+        """
+        Get the languages to OCR the next page with.
+
+        Args:
+            coeff_avgs: Running averages of the pages already processed.
+
+        Returns:
+            The leading languages once narrowed, all the languages otherwise.
+        """
+        if self.widened or coeff_avgs.count < self.after_pages:
+            return self.langs
+        leading = sorted(coeff_avgs.avgs, key=coeff_avgs.avgs.get, reverse=True)[:self.top_langs]
+        return [lang for lang in self.langs if lang in leading]
+
+    def is_narrowed(self, langs: List[str]) -> bool:
+        """
+        Check if some languages were left out.
+        """
+        return len(langs) < len(self.langs)
+
+    def is_confident(self, coeffs: dict, langs: List[str]) -> bool:
+        """
+        Check if the text of a page OCR'd with narrowed languages is still written in one of them.
+
+        Args:
+            coeffs: Coefficient of each language for the page.
+            langs: Languages the page was OCR'd with.
+
+        Returns:
+            True if the leading language among langs reaches min_confidence.
+        """
+        return max(coeffs[lang] for lang in langs) >= self.min_confidence
+
+
+class Throughput:
+    """
+    Number of documents and pages analysed per second since the start of a run.
+    """
+
+    def __init__(self):
+        self.start = time.monotonic()
+        self.docs = 0
+        self.pages = 0
+
+    def add(self, pages: int):
+        """
+        Count an analysed document.
+
+        Args:
+            pages: Number of pages used to detect its language.
+        """
+        self.docs += 1
+        self.pages += pages
+
+    def __str__(self):
+        elapsed = max(time.monotonic() - self.start, 1e-6)
+        return f'{self.docs / elapsed:.2f} docs/s, {self.pages / elapsed:.2f} pages/s'
+
+
+class PipelineStage:
+    """
+    A stage of the pipeline: a pool of workers reading their tasks from a bounded
+    queue, so a stage blocks the previous one instead of piling up pages in memory.
+    """
+
+    def __init__(self, name: str, workers: int, queue_size: int):
+        self.name = name
+        self.workers = workers
+        self.queue = Queue(queue_size)
+        # Shared between the workers of the stage
+        self.busy_time = Value('d', 0.0)
+        self.tasks = Value('i', 0)
+
+    def get(self) -> tuple:
+        """
+        Wait for the next task of the stage, and count it.
+
+        Returns:
+            The task.
+        """
+        task = self.queue.get()
+        with self.tasks.get_lock():
+            self.tasks.value += 1
+        return task
+
+    @contextmanager
+    def measure(self):
+        """
+        Count the time spent in the block as busy time of the stage. The time spent
+        waiting for a task, or for room in the queue of the next stage, isn't counted.
+        """
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            with self.busy_time.get_lock():
+                self.busy_time.value += time.monotonic() - start
+
+    def get_utilisation(self, elapsed: float) -> float:
+        """
+        Get the fraction of the time the workers of the stage were busy.
+
+        Args:
+            elapsed: Duration of the run, in seconds.
+
+        Returns:
+            The utilisation of the stage, between 0 and 1.
+        """
+        return min(self.busy_time.value / max(self.workers * elapsed, 1e-6), 1.0)
+
+
+class Pipeline:
+    """
+    Stages of the pipelined analysis: pages are rendered, OCR'd, then their language
+    is detected and the pages of each document aggregated, by separate pools of workers.
+    """
+
+    def __init__(self, render_workers: int, ocr_workers: int, detect_workers: int, queue_size: int):
+        self.start = time.monotonic()
+        self.render = PipelineStage('render', render_workers, queue_size)
+        self.ocr = PipelineStage('ocr', ocr_workers, queue_size)
+        self.detect = PipelineStage('detect', detect_workers, queue_size)
+        # The statuses sent back to the main process are never blocked
+        self.results = Queue()
+
+    @property
+    def stages(self) -> List[PipelineStage]:
+        return [self.render, self.ocr, self.detect]
+
+    def get_report(self) -> List[str]:
+        """
+        Describe the utilisation of each stage since the start of the run. A stage
+        busy most of the time is the bottleneck, and needs more workers.
+
+        Returns:
+            A line for each stage.
+        """
+        elapsed = time.monotonic() - self.start
+        return [f"{stage.name}: {stage.workers} workers, {stage.tasks.value} tasks, "
+                f"{stage.get_utilisation(elapsed):.0%} busy" for stage in self.stages]
+
+
+class AsyncExecutor:
+    """
+    Run command-line tools as asyncio subprocesses from a single Python process.
+    The number of processes running each tool at once is capped by a semaphore.
+    """
+
+    def __init__(self, processes: Optional[int] = None):
+        """
+        Initialize the AsyncExecutor class.
+
+        Args:
+            processes: Maximum number of processes running each tool at once. Default
+                is the number of CPUs.
+        """
+        self.processes = os.cpu_count() if processes is None else processes
+        self.semaphores = dict()
+
+    def get_semaphore(self, program: str) -> asyncio.Semaphore:
+        """
+        Get the semaphore capping the processes running a tool, creating it on first use.
+
+        Args:
+            program: Name of the tool.
+
+        Returns:
+            An asyncio.Semaphore instance.
+        """
+        if program not in self.semaphores:
+            self.semaphores[program] = asyncio.Semaphore(self.processes)
+        return self.semaphores[program]
+
+    async def run(self, program: str, *args, stdin: Optional[bytes] = None, env: Optional[dict] = None,
+                  stage: Optional[str] = None) -> bytes:
+        """
+        Run a tool and wait for its output.
+
+        Args:
+            program: Name or path of the tool.
+            *args: Arguments of the tool.
+            stdin: Data written on the standard input of the tool, if any.
+            env: Variables added to the environment of the tool.
+            stage: Stage the time spent running the tool is measured in (see StageTimings), if any.
+
+        Returns:
+            The standard output of the tool.
+
+        Raises:
+            ErrorReturnCode: If the tool exits with an error, as raised by sh.
+        """
+        args = [str(arg) for arg in args]
+        # Waiting for the semaphore isn't time spent in the stage
+        async with self.get_semaphore(program):
+            with StageTimings.measure(stage):
+                process = await asyncio.create_subprocess_exec(
+                    program, *args, stdin=asyncio.subprocess.DEVNULL if stdin is None else asyncio.subprocess.PIPE,
+                    stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+                    env=None if env is None else dict(os.environ, **env))
+                stdout, stderr = await process.communicate(stdin)
+        if process.returncode != 0:
+            code = process.returncode
+            name = f'ErrorReturnCode_{code}' if code > 0 else f'SignalException_{-code}'
+            raise getattr(sh, name)(' '.join([program, *args]), stdout, stderr)
+        return stdout
+
 
 class PdfLanguageDetector:
     STATUS_SKIPPED = 'SKIPPED'
     STATUS_DONE = 'DONE'
     STATUS_FAILED = 'FAILED '
+    STATUS_CACHED = 'CACHED'
+    # A file with too many pages for a single task, split by the worker in page tasks
+    STATUS_SPLIT = 'SPLIT'
+    SOURCE_TEXT_LAYER = 'text'
+    SOURCE_OCR = 'ocr'
+    TASK_FILE = 'file'
+    TASK_PAGES = 'pages'
+    TASK_AGGREGATE = 'aggregate'
+    # Tasks sent ahead to each worker, so they don't wait for their next task
+    TASKS_IN_FLIGHT_PER_WORKER = 2
+    # Size (in pixels) of the longest side of pages downscaled for the script detection
+    SCRIPT_DETECTION_SIZE = 1024
     
     def __init__(self, 
                 languages: List[str], 
@@ -26,270 +655,1955 @@ class PdfLanguageDetector:
                 skip_images:  Optional[bool] = False,
                 skip_ocr:  Optional[bool] = False,
                 parallel: Optional[int] = 1,
-                relative_to: Optional[Path] = None):
+                relative_to: Optional[Path] = None,
+                text_layer: Optional[bool] = True,
+                min_text_chars: Optional[int] = 100,
+                ocr_backend: Optional[str] = PytesseractBackend.name,
+                keep_images: Optional[bool] = False,
+                confidence_margin: Optional[float] = None,
+                pages_per_task: Optional[int] = None,
+                cache_file: Optional[Path] = None,
+                store: Optional[str] = DIRECTORY_STORE,
+                script_detection: Optional[bool] = False,
+                narrow_after: Optional[int] = None,
+                narrow_langs: Optional[int] = 2,
+                narrow_min_confidence: Optional[float] = 0.5,
+                dpi: Optional[int] = None,
+                color: Optional[str] = RenderProfile.COLOR,
+                crop: Optional[float] = None,
+                adaptive_dpi: Optional[int] = None,
+                skip_blank_pages: Optional[bool] = False,
+                skip_duplicate_pages: Optional[bool] = False,
+                input_list: Optional[Path] = None,
+                shard: Optional[Tuple[int, int]] = None,
+                work_queue: Optional[Path] = None,
+                work_queue_backend: Optional[str] = SqliteWorkQueue.BACKEND_NAME,
+                pipeline: Optional[bool] = False,
+                render_workers: Optional[int] = 1,
+                ocr_workers: Optional[int] = None,
+                detect_workers: Optional[int] = 1,
+                stage_queue_size: Optional[int] = 8,
+                async_executor: Optional[bool] = False,
+                metrics_file: Optional[Path] = None,
+                metrics_format: Optional[str] = RunMetrics.FORMAT_PROMETHEUS,
+                weighting: Optional[str] = CoeffAverages.WEIGHTING_NONE,
+                page_files: Optional[bool] = True):
+        """
+        Initialize the PdfLanguageDetector class.
+
+        Args:
+            languages: List of ISO3 language codes.
+            input_dir: Path to the input directory.
+            output_dir: Path to the output directory.
+            max_pages: Maximum number of pages to process per PDF file.
+            resume: Skip PDF files already analyzed.
+            skip_images: Skip the extraction of PDF files as images.
+            skip_ocr: Skip the OCR of images from PDF files.
+            parallel: Number of threads to run in parallel.
+            relative_to: Path to the directory relative to which build the output dir path.
+            text_layer: Use the embedded text layer of PDF files before falling back to OCR.
+            min_text_chars: Minimum number of characters in the text layer of a page to skip its OCR.
+            ocr_backend: Name of the OCR backend (see OCR_BACKENDS).
+            keep_images: Save the pages rendered for OCR in the images directory.
+            confidence_margin: Stop processing the pages of a PDF file once the average coefficient
+                of the leading language is ahead of the runner-up by this margin.
+            pages_per_task: Split PDF files in tasks of this number of pages, processed in parallel.
+            cache_file: Path to a SQLite database used to reuse the results of identical PDF files.
+            store: Where results are saved: DIRECTORY_STORE for the output directory layout,
+                SqliteStore.STORE_NAME for a single database in the output directory, or
+                MemoryStore.STORE_NAME to keep them in memory without writing to the output
+                directory (neither manifest nor journal).
+            script_detection: Detect the script of each page before its OCR, to run Tesseract
+                only with the languages written in this script.
+            narrow_after: OCR the next pages of a PDF file only with its leading languages
+                after this number of pages.
+            narrow_langs: Number of leading languages kept to OCR the next pages.
+            narrow_min_confidence: OCR a page again with all the languages, and keep them
+                for the next pages, if its leading language coefficient drops below this value.
+            dpi: Resolution of the pages rendered for OCR. Poppler's default (150) if None.
+            color: Colors of the pages rendered for OCR (see RenderProfile.COLORS).
+            crop: Fraction of the page height kept around its middle for OCR.
+            adaptive_dpi: Render pages again at this resolution when their OCR at dpi
+                yields less than min_text_chars characters.
+            skip_blank_pages: Skip the OCR of blank pages, and leave them out of the averages.
+            skip_duplicate_pages: Skip the OCR of near-duplicates of pages already processed
+                in a PDF file, and leave them out of the averages.
+            input_list: Path to a file listing the PDF files to process, one per line, or '-'
+                to read them from the standard input. The input directory is walked if None.
+            shard: Only process the PDF files of this shard, as an (index, count) tuple with
+                an index starting at 1. Files are assigned to shards by the hash of their path.
+            work_queue: Path to a work queue shared with other nodes to claim the PDF files
+                from, instead of the input list or directory.
+            work_queue_backend: Backend of the work queue (see WORK_QUEUES).
+            pipeline: Render, OCR and detect the language of pages in separate stages, each
+                with its own pool of workers, instead of analysing each PDF file in a single task.
+            render_workers: Number of workers rendering pages in the pipeline.
+            ocr_workers: Number of workers OCR'ing pages in the pipeline. Default is parallel.
+            detect_workers: Number of workers detecting the language of pages, and aggregating
+                the pages of each PDF file, in the pipeline.
+            stage_queue_size: Maximum number of pages waiting for each stage of the pipeline.
+            async_executor: Run pdftoppm, pdftotext and tesseract as asyncio subprocesses
+                from the main process, with at most one process per CPU for each tool,
+                instead of starting parallel worker processes.
+            metrics_file: Path to a file the run metrics (documents, pages and stage timings)
+                are exported to during the run, read by a local scraper. Not exported if None.
+            metrics_format: Format of the metrics file (see RunMetrics.FORMATS).
+            weighting: How the pages of a PDF file are weighted in its language averages
+                (see CoeffAverages.WEIGHTINGS).
+            page_files: Save the text and language information of each page in the texts
+                and langs directories, as an audit trail. The pages are averaged in memory
+                either way. Without them, a resumed run starts unfinished PDF files over.
+        """
+        self.languages = [Language.get(language) for language in languages]
+        self.lang_detector = LanguageDetectorBuilder.from_iso_codes_639_3(*self.lingua_langs).build()
+        self.input_dir = input_dir
+        self.output_dir = output_dir
+        self.max_pages = max_pages
+        self.resume = resume
+        self.skip_images = skip_images
+        self.skip_ocr = skip_ocr
+        self.parallel = parallel
+        self.relative_to = input_dir.resolve() if relative_to is None else relative_to.resolve()
+        self.text_layer = text_layer
+        self.min_text_chars = min_text_chars
+        self.ocr_backend = OCR_BACKENDS[ocr_backend]()
+        self.keep_images = keep_images
+        self.confidence_margin = confidence_margin
+        self.pages_per_task = pages_per_task
+        self.cache = None if cache_file is None else ResultCache(cache_file)
+        self.store = None
+        if store == SqliteStore.STORE_NAME:
+            self.store = SqliteStore.from_output_dir(output_dir)
+        elif store == MemoryStore.STORE_NAME:
+            self.store = MemoryStore()
+        self.manifest = Manifest.from_output_dir(output_dir)
+        self.journal = None if store == MemoryStore.STORE_NAME else Journal.from_output_dir(output_dir)
+        self.script_detection = script_detection
+        self.narrow_after = narrow_after
+        self.narrow_langs = narrow_langs
+        self.narrow_min_confidence = narrow_min_confidence
+        self.render_profile = RenderProfile(dpi, color, crop)
+        self.adaptive_dpi = adaptive_dpi
+        self.skip_blank_pages = skip_blank_pages
+        self.skip_duplicate_pages = skip_duplicate_pages
+        self.input_list = input_list
+        self.shard = shard
+        self.work_queue = None if work_queue is None else WORK_QUEUES[work_queue_backend](work_queue)
+        self.pipeline = pipeline
+        self.render_workers = render_workers
+        self.ocr_workers = parallel if ocr_workers is None else ocr_workers
+        self.detect_workers = detect_workers
+        self.stage_queue_size = stage_queue_size
+        self.async_executor = async_executor
+        self.metrics_file = metrics_file
+        self.metrics_format = metrics_format
+        self.run_metrics = None
+        self.weighting = weighting
+        self.page_files = page_files
+
+    def create_output_directories(self, *dirs: Path):
+        """
+        Create output directories if they don't exist.
+
+        Args:
+            *dirs: Variable number of directory paths to create.
+        """
+        for dir_path in dirs:
+            os.makedirs(dir_path.resolve(), exist_ok=True)
+    
+    def extract_meta(self, input_file: Path):
+        output_dir = self.get_output_dir(input_file)
+        meta_file = output_dir / 'meta.json'
+        meta = dict(input_file=str(input_file.resolve()), output_dir=str(output_dir.resolve()))
+        if self.store is not None:
+            # Commit at once: a transaction left open blocks the writes of every other worker
+            self.store.save_meta(output_dir, meta)
+            return self.store.commit()
+        with meta_file.open("w") as f:
+            f.write(json.dumps(meta, indent=2))
+
+    def update_meta(self, output_file_dir: Path, **values):
+        """
+        Add values to the metadata file of an output directory.
+
+        Args:
+            output_file_dir: Directory of the analysis results.
+            **values: Values to add to the metadata.
+        """
+        if self.store is not None:
+            return self.store.update_meta(output_file_dir, values)
+        meta_file = output_file_dir / 'meta.json'
+        with meta_file.open(encoding="UTF-8") as source:
+            meta = json.load(source)
+        meta.update(values)
+        with meta_file.open("w") as f:
+            f.write(json.dumps(meta, indent=2))
+
+    def extract_images(self, input_file: Path, images_dir: Path, pages: Optional[List[int]] = None):
+        """
+        Extract images from a PDF file using pdftoppm.
+
+        Args:
+            input_file: Path to the input PDF file.
+            images_dir: Directory to save the extracted images.
+            pages: Pages (starting at 1) to extract. All pages up to max_pages if None.
+        """
+        render_args = self.render_profile.get_pdftoppm_args(jpeg=True)
+        with StageTimings.measure(StageTimings.RENDER):
+            if pages is None:
+                pdftoppm('-l', self.max_pages, *render_args, '-jpeg', input_file.resolve(), (images_dir / 'page').resolve())
+            else:
+                for page in pages:
+                    image_file = images_dir / self.get_page_name(page)
+                    pdftoppm('-f', page, '-l', page, *render_args, '-jpeg', '-singlefile', input_file.resolve(), image_file.resolve())
+
+    def render_page(self, input_file: Path, page: int, dpi: Optional[int] = None) -> Image.Image:
+        """
+        Render a page of a PDF file in memory using pdftoppm.
+
+        Args:
+            input_file: Path to the input PDF file.
+            page: Page (starting at 1) to render.
+            dpi: Resolution overriding the render profile's.
+
+        Returns:
+            The rendered page.
+        """
+        render_args = self.render_profile.get_pdftoppm_args(dpi)
+        # Without an output root, pdftoppm writes a raw PPM (PGM or PBM) image on stdout
+        with StageTimings.measure(StageTimings.RENDER):
+            output = pdftoppm('-f', page, '-l', page, *render_args, input_file.resolve(), _return_cmd=True)
+        return Image.open(io.BytesIO(output.stdout))
+
+    def count_pages(self, input_file: Path) -> int:
+        """
+        Count the pages of a PDF file using pdfinfo.
+
+        Args:
+            input_file: Path to the input PDF file.
+
+        Returns:
+            The number of pages.
+        """
+        return self.read_page_count(str(pdfinfo(input_file.resolve())))
+
+    def read_page_count(self, info: str) -> int:
+        """
+        Read the number of pages in the output of pdfinfo.
+
+        Args:
+            info: Output of pdfinfo.
+
+        Returns:
+            The number of pages.
+        """
+        for line in info.splitlines():
+            key, _, value = line.partition(':')
+            if key == 'Pages':
+                return int(value)
+        return 0
+
+    def get_pages(self, input_file: Path) -> List[int]:
+        """
+        Get the pages to process in a PDF file.
+
+        Args:
+            input_file: Path to the input PDF file.
+
+        Returns:
+            The pages (starting at 1), up to max_pages.
+        """
+        return list(range(1, min(self.count_pages(input_file), self.max_pages) + 1))
+
+    def extract_text_layer(self, input_file: Path, first_page: int = 1, last_page: Optional[int] = None) -> List[str]:
+        """
+        Extract the embedded text layer of a PDF file using pdftotext.
+
+        Args:
+            input_file: Path to the input PDF file.
+            first_page: First page (starting at 1) to extract.
+            last_page: Last page to extract. Default is max_pages.
+
+        Returns:
+            The text of each page from first_page to last_page.
+        """
+        with StageTimings.measure(StageTimings.TEXT_LAYER):
+            output = pdftotext(*self.get_text_layer_args(input_file, first_page, last_page))
+        # Every page (even an empty one) is terminated by a form feed
+        return str(output).split('\f')[:-1]
+
+    def get_text_layer_args(self, input_file: Path, first_page: int = 1, last_page: Optional[int] = None) -> list:
+        """
+        Get the pdftotext arguments writing the text layer of a range of pages on stdout.
+
+        Args:
+            input_file: Path to the input PDF file.
+            first_page: First page (starting at 1) to extract.
+            last_page: Last page to extract. Default is max_pages.
+
+        Returns:
+            The pdftotext arguments.
+        """
+        last_page = self.max_pages if last_page is None else last_page
+        range_args = ['-l', last_page] if first_page == 1 else ['-f', first_page, '-l', last_page]
+        return [*range_args, '-enc', 'UTF-8', input_file.resolve(), '-']
+
+    def has_enough_text(self, text: str) -> bool:
+        """
+        Check if a text is long enough to detect its language without OCR.
+
+        Args:
+            text: Text extracted from a page.
+
+        Returns:
+            True if the text has at least min_text_chars non-whitespace characters.
+        """
+        return self.count_chars(text) >= self.min_text_chars
+
+    def count_chars(self, text: str) -> int:
+        """
+        Count the characters recognised in the text of a page, whitespaces excluded.
+
+        Args:
+            text: Text of the page.
+
+        Returns:
+            The number of characters.
+        """
+        return len(''.join(text.split()))
+
+    def extract_text(self, image: Union[Path, Image.Image], langs: Optional[List[str]] = None) -> str:
+        """
+        Extract text from an image using Tesseract OCR.
+
+        Args:
+            image: Path to the input image file, or an image rendered in memory.
+            langs: Tesseract languages to use. All the languages if None.
+
+        Returns:
+            Extracted text from the image.
+        """
+        if isinstance(image, Path):
+            image = Image.open(image)
+        with StageTimings.measure(StageTimings.OCR):
+            lang = '+'.join(self.get_page_tesseract_langs(image, langs))
+            image_text = self.ocr_backend.image_to_string(image, lang)
+        return image_text
+
+    def detect_language(self, text: str) -> List[list]:
+        """
+        Compute the confidence of each language in a text with Lingua.
+
+        Args:
+            text: Text to detect the language of.
+
+        Returns:
+            Language detection result.
+        """
+        with StageTimings.measure(StageTimings.DETECT):
+            return self.lang_detector.compute_language_confidence_values(text)
+
+    def get_page_tesseract_langs(self, image: Image.Image, langs: Optional[List[str]] = None) -> List[str]:
+        """
+        Get the Tesseract languages to OCR a page with. With the script detection,
+        only the languages written in the script of the page are kept. Lingua still
+        scores the text with all the languages.
+
+        Args:
+            image: The page rendered as an image.
+            langs: Tesseract languages to choose from. All the languages if None.
+
+        Returns:
+            Languages as ISO 639-2/B strings.
+        """
+        langs = self.tesseract_langs if langs is None else langs
+        langs_scripts = dict(zip(self.tesseract_langs, self.languages_scripts))
+        # Nothing to narrow if all the languages are written in the same script
+        if not self.script_detection or len({langs_scripts[lang] for lang in langs}) < 2:
+            return langs
+        thumbnail = image.copy()
+        thumbnail.thumbnail((self.SCRIPT_DETECTION_SIZE, self.SCRIPT_DETECTION_SIZE))
+        script = self.ocr_backend.detect_script(thumbnail)
+        if script is None:
+            return langs
+        scripts = OSD_SCRIPTS.get(script, ())
+        script_langs = [lang for lang in langs
+                        if langs_scripts[lang] in scripts or Language.make(script=langs_scripts[lang]).script_name() == script]
+        # Keep all the languages if none is written in the detected script
+        return script_langs or langs
+
+    def save_text(self, image_text: str, text_file: Path):
+        """
+        Save extracted text to a text file, replacing the text left by an interrupted run.
+
+        Args:
+            image_text: Text to be saved.
+            text_file: Path to the output text file.
+        """
+        with text_file.open("w") as f:
+            f.write(image_text)
+
+    def save_language(self, detected_lang: List[list], lang_file: Path, source: Optional[str] = None,
+                      narrowing: Optional[dict] = None, chars: Optional[int] = None) -> dict:
+        """
+        Save detected language information to a JSON file.
+
+        Args:
+            detected_lang: Language detection result.
+            lang_file: Path to the output JSON file.
+            source: How the text was extracted (SOURCE_TEXT_LAYER or SOURCE_OCR).
+            narrowing: Languages the page was OCR'd with, and if they were widened back.
+            chars: Number of characters recognised in the text.
+
+        Returns:
+            The coefficient of each language, with the number of characters if given.
+        """
+        coeffs = self.get_coeffs(detected_lang)
+        if chars is not None:
+            coeffs['chars'] = chars
+        data = dict(coeffs)
+        if source is not None:
+            data['source'] = source
+        if narrowing is not None:
+            data['narrowing'] = narrowing
+        with lang_file.open("w") as f:
+            f.write(json.dumps(data, indent=2))
+        return coeffs
+
+    def get_coeffs(self, detected_lang: List[list]) -> dict:
+        """
+        Get the coefficient of each language from a language detection result.
+
+        Args:
+            detected_lang: Language detection result.
+
+        Returns:
+            The coefficient of each language, by uppercase ISO 639-3 code.
+        """
+        langs = [language.name for language, _ in detected_lang]
+        langs = [find_language(name).to_alpha3().upper() for name in langs]
+        coeffs = [value for _, value in detected_lang]
+        return dict(zip(langs, coeffs))
+
+    def process_images(self, images_dir: Path, texts_dir: Path, langs_dir: Path,
+                       coeff_avgs: Optional[CoeffAverages] = None, pages: Optional[List[int]] = None,
+                       done_pages: Optional[Set[str]] = None):
+        """
+        Process the extracted images, extract text, and save text and language information.
+
+        Args:
+            images_dir: Directory containing the extracted images.
+            texts_dir: Directory to save the extracted text.
+            langs_dir: Directory to save the language information.
+            coeff_avgs: Running averages of the pages already processed.
+            pages: Pages (starting at 1) to OCR, for instance those without enough text in
+                their text layer. All the images if None.
+            done_pages: Names of the pages completed by a previous run, not OCR'd again.
+        """
+        coeff_avgs = self.create_coeff_avgs() if coeff_avgs is None else coeff_avgs
+        done_pages = set() if done_pages is None else done_pages
+        narrowing = self.create_language_narrowing()
+        page_filter = self.create_page_filter()
+        for image_file in self.get_images_files(images_dir):
+            if self.has_converged(coeff_avgs):
+                break
+            # Images extracted by pdftoppm for a whole file have zero-padded numbers
+            page = self.get_page_number(image_file.stem)
+            page_name = self.get_page_name(page)
+            if (pages is not None and page not in pages) or page_name in done_pages:
+                continue
+            image = Image.open(image_file)
+            coeffs = self.process_image(image, page_name, texts_dir, langs_dir, coeff_avgs, narrowing,
+                                        page_filter=page_filter)
+            coeff_avgs.add(coeffs)
+
+    def process_pages(self, input_file: Path, pages: List[int], images_dir: Path, texts_dir: Path, langs_dir: Path,
+                      coeff_avgs: Optional[CoeffAverages] = None):
+        """
+        Render pages in memory, extract their text, and save text and language information.
+
+        Args:
+            input_file: Path to the input PDF file.
+            pages: Pages (starting at 1) to process.
+            images_dir: Directory to save the rendered pages if keep_images is set.
+            texts_dir: Directory to save the extracted text.
+            langs_dir: Directory to save the language information.
+            coeff_avgs: Running averages of the pages already processed.
+        """
+        coeff_avgs = self.create_coeff_avgs() if coeff_avgs is None else coeff_avgs
+        narrowing = self.create_language_narrowing()
+        page_filter = self.create_page_filter()
+        for page in pages:
+            if self.has_converged(coeff_avgs):
+                break
+            page_name = self.get_page_name(page)
+            image = self.render_page(input_file, page)
+            if self.keep_images:
+                image.save((images_dir / page_name).with_suffix('.jpg'))
+            render_high_dpi = None
+            if self.adaptive_dpi is not None:
+                render_high_dpi = partial(self.render_page, input_file, page, self.adaptive_dpi)
+            coeffs = self.process_image(image, page_name, texts_dir, langs_dir, coeff_avgs, narrowing, render_high_dpi,
+                                        page_filter)
+            coeff_avgs.add(coeffs)
+
+    def process_image(self, image: Image.Image, page_name: str, texts_dir: Path, langs_dir: Path,
+                      coeff_avgs: CoeffAverages, narrowing: Optional[LanguageNarrowing] = None,
+                      render_high_dpi: Optional[Callable[[], Image.Image]] = None,
+                      page_filter: Optional[PageFilter] = None) -> dict:
+        """
+        OCR a page, and save text and language information. With a language narrowing,
+        the page is OCR'd only with the leading languages of the previous pages, and
+        again with all the languages if its confidence drops. With a page filter,
+        blank and duplicate pages are skipped.
+
+        Args:
+            image: The page rendered as an image.
+            page_name: Name of the page, used to name the output files.
+            texts_dir: Directory to save the extracted text.
+            langs_dir: Directory to save the language information.
+            coeff_avgs: Running averages of the pages already processed.
+            narrowing: Languages narrowing of the document, if enabled.
+            render_high_dpi: Function rendering the page again at adaptive_dpi, if enabled.
+            page_filter: Filter of blank and duplicate pages of the document, if enabled.
+
+        Returns:
+            The coefficient of each language for the page, or why it was skipped.
+        """
+        skipped = None if page_filter is None else page_filter.check(image, page_name)
+        if skipped is not None:
+            return self.save_skipped_page(page_name, langs_dir, skipped)
+        if narrowing is None:
+            image_text = self.ocr_image(image, None, render_high_dpi)
+            return self.process_text(image_text, page_name, texts_dir, langs_dir, PdfLanguageDetector.SOURCE_OCR)
+        langs = narrowing.get_langs(coeff_avgs)
+        tesseract_langs = dict(zip(self.coeff_langs, self.tesseract_langs))
+        image_text = self.ocr_image(image, [tesseract_langs[lang] for lang in langs], render_high_dpi)
+        detected_lang = self.detect_language(image_text)
+        if narrowing.is_narrowed(langs) and not narrowing.is_confident(self.get_coeffs(detected_lang), langs):
+            # The page may be written in a language left out: keep all the languages from now on
+            narrowing.widened = True
+            langs = narrowing.langs
+            image_text = self.ocr_image(image, None, render_high_dpi)
+            detected_lang = None
+        return self.process_text(image_text, page_name, texts_dir, langs_dir, PdfLanguageDetector.SOURCE_OCR,
+                                 detected_lang, dict(ocr_langs=langs, widened=narrowing.widened))
+
+    def ocr_image(self, image: Image.Image, langs: Optional[List[str]] = None,
+                  render_high_dpi: Optional[Callable[[], Image.Image]] = None) -> str:
+        """
+        Extract the text of a page rendered with the render profile, rendering it
+        again at a higher resolution if its text is too short.
+
+        Args:
+            image: The page rendered as an image.
+            langs: Tesseract languages to use. All the languages if None.
+            render_high_dpi: Function rendering the page again at adaptive_dpi, if enabled.
+
+        Returns:
+            Extracted text from the page.
+        """
+        image_text = self.extract_text(self.render_profile.crop_image(image), langs)
+        # Characters may be too small to be recognized at a low resolution
+        if render_high_dpi is not None and not self.has_enough_text(image_text):
+            image_text = self.extract_text(self.render_profile.crop_image(render_high_dpi()), langs)
+        return image_text
+
+    def save_skipped_page(self, page_name: str, langs_dir: Path, skipped: dict) -> dict:
+        """
+        Save why a page was skipped in its language information, without text.
+
+        Args:
+            page_name: Name of the page, used to name the output files.
+            langs_dir: Directory to save the language information.
+            skipped: Why the page was skipped.
+
+        Returns:
+            Why the page was skipped.
+        """
+        if self.store is not None:
+            self.store.save_page(langs_dir.parent, page_name, '', skipped)
+            self.store.commit()
+        elif not self.page_files:
+            return skipped
+        else:
+            lang_file = (langs_dir / page_name).with_suffix('.json')
+            lang_file.write_text(json.dumps(skipped, indent=2), encoding="UTF-8")
+        if self.journal is not None:
+            self.journal.add_page(langs_dir.parent, page_name)
+        return skipped
+
+    def create_coeff_avgs(self) -> CoeffAverages:
+        """
+        Create the running averages of the pages of a document.
+
+        Returns:
+            A CoeffAverages instance with the weighting of the detector.
+        """
+        return CoeffAverages(self.coeff_langs, self.weighting)
+
+    def create_page_filter(self) -> Optional[PageFilter]:
+        """
+        Create the filter of blank and duplicate pages of a document.
+
+        Returns:
+            A PageFilter instance, or None if no pages are skipped.
+        """
+        if not self.skip_blank_pages and not self.skip_duplicate_pages:
+            return None
+        return PageFilter(self.skip_blank_pages, self.skip_duplicate_pages)
+
+    def create_language_narrowing(self) -> Optional[LanguageNarrowing]:
+        """
+        Create the languages narrowing of a document.
+
+        Returns:
+            A LanguageNarrowing instance, or None if narrow_after isn't set.
+        """
+        if self.narrow_after is None:
+            return None
+        return LanguageNarrowing(self.coeff_langs, self.narrow_after, self.narrow_langs, self.narrow_min_confidence)
+
+    def process_text_layer(self, input_file: Path, texts_dir: Path, langs_dir: Path,
+                           coeff_avgs: Optional[CoeffAverages] = None,
+                           pages: Optional[List[int]] = None,
+                           done_pages: Optional[Set[str]] = None) -> Optional[List[int]]:
+        """
+        Process the embedded text layer of a PDF file, and save text and language
+        information for every page with enough text.
+
+        Args:
+            input_file: Path to the input PDF file.
+            texts_dir: Directory to save the extracted text.
+            langs_dir: Directory to save the language information.
+            coeff_avgs: Running averages of the pages already processed.
+            pages: Contiguous pages (starting at 1) to process. All pages up to max_pages if None.
+            done_pages: Names of the pages completed by a previous run, neither processed nor OCR'd.
+
+        Returns:
+            The pages (starting at 1) which still need OCR, or None if the text layer
+            couldn't be read and every page needs OCR.
+        """
+        first_page, last_page = (1, None) if pages is None else (pages[0], pages[-1])
+        try:
+            pages_texts = self.extract_text_layer(input_file, first_page, last_page)
+        except ErrorReturnCode:
+            return None
+        return self.process_pages_texts(pages_texts, first_page, texts_dir, langs_dir, coeff_avgs, done_pages)
+
+    def process_pages_texts(self, pages_texts: List[str], first_page: int, texts_dir: Path, langs_dir: Path,
+                            coeff_avgs: Optional[CoeffAverages] = None,
+                            done_pages: Optional[Set[str]] = None) -> List[int]:
+        """
+        Save text and language information for every page of a text layer with enough text.
+
+        Args:
+            pages_texts: Text of each page of the text layer.
+            first_page: Page (starting at 1) of the first text.
+            texts_dir: Directory to save the extracted text.
+            langs_dir: Directory to save the language information.
+            coeff_avgs: Running averages of the pages already processed.
+            done_pages: Names of the pages completed by a previous run, neither processed nor OCR'd.
+
+        Returns:
+            The pages (starting at 1) which still need OCR.
+        """
+        coeff_avgs = self.create_coeff_avgs() if coeff_avgs is None else coeff_avgs
+        done_pages = set() if done_pages is None else done_pages
+        ocr_pages = []
+        for page, page_text in enumerate(pages_texts, start=first_page):
+            # The language is already known, the remaining pages don't need OCR
+            if self.has_converged(coeff_avgs):
+                return []
+            page_name = self.get_page_name(page)
+            if page_name in done_pages:
+                continue
+            if self.has_enough_text(page_text):
+                coeffs = self.process_text(page_text, page_name, texts_dir, langs_dir, PdfLanguageDetector.SOURCE_TEXT_LAYER)
+                coeff_avgs.add(coeffs)
+            else:
+                ocr_pages.append(page)
+        return ocr_pages
+
+    def process_text(self, text: str, page_name: str, texts_dir: Path, langs_dir: Path, source: str,
+                     detected_lang: Optional[List[list]] = None, narrowing: Optional[dict] = None):
+        """
+        Detect the language of a page's text, and save text and language information.
+
+        Args:
+            text: Text of the page.
+            page_name: Name of the page, used to name the output files.
+            texts_dir: Directory to save the extracted text.
+            langs_dir: Directory to save the language information.
+            source: How the text was extracted (SOURCE_TEXT_LAYER or SOURCE_OCR).
+            detected_lang: Language detection result of the text, if already computed.
+            narrowing: Languages the page was OCR'd with, and if they were widened back.
+
+        Returns:
+            The coefficient of each language for the page, and its number of characters (chars).
+        """
+        if detected_lang is None:
+            detected_lang = self.detect_language(text)
+        chars = self.count_chars(text)
+        with StageTimings.measure(StageTimings.SAVE):
+            if self.store is not None:
+                coeffs = dict(self.get_coeffs(detected_lang), chars=chars)
+                langs = dict(coeffs, source=source)
+                if narrowing is not None:
+                    langs['narrowing'] = narrowing
+                # The pages directories are only used to identify the document
+                self.store.save_page(langs_dir.parent, page_name, text, langs)
+                self.store.commit()
+            elif not self.page_files:
+                return dict(self.get_coeffs(detected_lang), chars=chars)
+            else:
+                text_file = (texts_dir / page_name).with_suffix('.txt')
+                lang_file = (langs_dir / page_name).with_suffix('.json')
+                self.save_text(text, text_file)
+                coeffs = self.save_language(detected_lang, lang_file, source, narrowing, chars)
+            # Journaled once the page is saved, so a resumed run can reuse it
+            if self.journal is not None:
+                self.journal.add_page(langs_dir.parent, page_name)
+        return coeffs
+
+    def has_converged(self, coeff_avgs: CoeffAverages) -> bool:
+        """
+        Check if the leading language is far enough ahead to stop processing pages.
+
+        Args:
+            coeff_avgs: Running averages of the pages already processed.
+
+        Returns:
+            True if confidence_margin is set and reached by the running averages.
+        """
+        if self.confidence_margin is None or coeff_avgs.count == 0:
+            return False
+        return coeff_avgs.margin >= self.confidence_margin
+
+    def calculate_coeff_avgs(self, langs_dir: Path) -> dict:
+        """
+        Calculate the average coefficient for each language.
+
+        Args:
+            langs_dir: Directory containing the language information files.
+
+        Returns:
+            A dictionary with the average coefficient for each language.
+        """
+        return self.read_coeff_avgs(langs_dir).avgs
+
+    def read_coeff_avgs(self, langs_dir: Path) -> CoeffAverages:
+        """
+        Read the language information files and average their coefficients.
+
+        Args:
+            langs_dir: Directory containing the language information files.
+
+        Returns:
+            The averages of the language coefficients.
+        """
+        coeff_avgs = self.create_coeff_avgs()
+        for lang_file in self.get_lang_files(langs_dir):
+            with lang_file.open(encoding="UTF-8") as source:
+                coeff_avgs.add(json.load(source))
+        return coeff_avgs
+        
+    def get_lang_files(self, langs_dir: Path) -> list:
+        """
+        Get a list of language files in the specified directory, for the first max_pages pages.
+
+        Args:
+            langs_dir: Path to the directory containing language files.
+
+        Returns:
+            A list of language files, in the order of the pages.
+
+        """
+        lang_files = sorted(langs_dir.glob('*.json'), key=lambda lang_file: self.get_page_number(lang_file.stem))
+        return lang_files[:self.max_pages]
+
+    def get_images_files(self, images_dir: Path) -> list:
+        """
+        Get a list of image files in the specified directory.
+
+        Args:
+            images_dir: Path to the directory containing image files.
+
+        Returns:
+            A list of image files.
+
+        """
+        image_files = sorted(images_dir.glob('*.jpg'), key=lambda image_file: self.get_page_number(image_file.stem))
+        return image_files[:self.max_pages]
+
+    def analyse_file(self, input_file: Path, output_file_dir: Path) -> str:
+        """
+        Analyze a PDF file, extract images, process them, and calculate language averages.
+
+        Args:
+            input_file: Path to the input PDF file.
+            output_file_dir: Directory to save the analysis results.
+
+        Returns:
+            The language with the highest average coefficient.
+        """
+        self.create_page_directories(output_file_dir)
+        self.extract_meta(input_file)
+        coeff_avgs = self.analyse_pages(input_file, output_file_dir)
+        return self.aggregate_pages(output_file_dir, coeff_avgs)
+
+    def create_page_directories(self, output_file_dir: Path):
+        """
+        Create the directories where the pages of a PDF file are saved.
+
+        Args:
+            output_file_dir: Directory to save the analysis results.
+        """
+        if self.store is None:
+            self.create_output_directories(output_file_dir / 'texts', output_file_dir / 'langs')
+        if self.keep_images:
+            self.create_output_directories(output_file_dir / 'images')
+
+    def analyse_pages(self, input_file: Path, output_file_dir: Path,
+                      pages: Optional[List[int]] = None) -> Optional[CoeffAverages]:
+        """
+        Extract the text of the pages of a PDF file, and save text and language information.
+
+        Args:
+            input_file: Path to the input PDF file.
+            output_file_dir: Directory to save the analysis results.
+            pages: Contiguous pages (starting at 1) to analyse. All pages up to max_pages if None.
+
+        Returns:
+            The averages of the pages analysed, or reused from a previous run, or None
+            if the pages aren't analysed (skip_ocr).
+        """
+        images_dir = output_file_dir / 'images'
+        texts_dir = output_file_dir / 'texts'
+        langs_dir = output_file_dir / 'langs'
+        # Running averages used to stop early once the language is known
+        coeff_avgs = self.create_coeff_avgs()
+        done_pages = self.get_done_pages(output_file_dir, coeff_avgs, pages)
+        # Pages with an embedded text layer don't need to be extracted as images
+        ocr_pages = pages
+        if self.text_layer and not self.skip_ocr:
+            ocr_pages = self.process_text_layer(input_file, texts_dir, langs_dir, coeff_avgs, pages, done_pages)
+            ocr_pages = pages if ocr_pages is None else ocr_pages
+        if self.skip_images:
+            # Reuse the images kept by a previous run
+            if not self.skip_ocr:
+                self.process_images(images_dir, texts_dir, langs_dir, coeff_avgs, ocr_pages, done_pages)
+        elif self.skip_ocr:
+            if self.keep_images:
+                self.extract_images(input_file, images_dir, ocr_pages)
+        else:
+            if ocr_pages is None:
+                ocr_pages = self.get_pages(input_file)
+            ocr_pages = [page for page in ocr_pages if self.get_page_name(page) not in done_pages]
+            self.process_pages(input_file, ocr_pages, images_dir, texts_dir, langs_dir, coeff_avgs)
+        if self.store is not None:
+            self.store.commit()
+        return None if self.skip_ocr else coeff_avgs
+
+    def get_done_pages(self, output_file_dir: Path, coeff_avgs: CoeffAverages,
+                       pages: Optional[List[int]] = None) -> Set[str]:
+        """
+        Get the pages of a PDF file completed by a previous run according to the journal,
+        and add them to the running averages. Only pages whose results were saved are kept.
+
+        Args:
+            output_file_dir: Directory of the analysis results.
+            coeff_avgs: Running averages of the pages already processed.
+            pages: Contiguous pages (starting at 1) to analyse. All pages if None.
+
+        Returns:
+            The names of the pages to reuse.
+        """
+        if not self.resume or self.journal is None:
+            return set()
+        journaled_pages = self.journal.get_pages(output_file_dir)
+        if pages is not None:
+            journaled_pages = journaled_pages & {self.get_page_name(page) for page in pages}
+        if not journaled_pages:
+            return set()
+        done_pages = set()
+        for page in self.read_pages(output_file_dir):
+            if page['name'] in journaled_pages:
+                coeff_avgs.add(page['langs'])
+                done_pages.add(page['name'])
+        return done_pages
+
+    def aggregate_pages(self, output_file_dir: Path, coeff_avgs: Optional[CoeffAverages] = None) -> str:
+        """
+        Save the language averages of the pages analysed for a PDF file.
+
+        Args:
+            output_file_dir: Directory to save the analysis results.
+            coeff_avgs: Averages of the pages, computed in memory as they were analysed.
+                Read back from the saved pages if None.
+
+        Returns:
+            The language with the highest average coefficient.
+        """
+        with StageTimings.measure(StageTimings.AGGREGATE):
+            if coeff_avgs is None:
+                coeff_avgs = self.read_saved_coeff_avgs(output_file_dir)
+            self.update_meta(output_file_dir, pages_used=coeff_avgs.count, pages_skipped=coeff_avgs.skipped)
+            self.save_coeff_avgs(output_file_dir, coeff_avgs.avgs)
+        return coeff_avgs.lang
+
+    def read_saved_coeff_avgs(self, output_file_dir: Path) -> CoeffAverages:
+        """
+        Average the language information saved for the first max_pages pages of a PDF file.
+
+        Args:
+            output_file_dir: Directory of the analysis results.
+
+        Returns:
+            The averages of the language coefficients.
+        """
+        if self.store is None:
+            return self.read_coeff_avgs(output_file_dir / 'langs')
+        coeff_avgs = self.create_coeff_avgs()
+        pages = sorted(self.store.get_pages(output_file_dir), key=lambda page: self.get_page_number(page['name']))
+        for page in pages[:self.max_pages]:
+            coeff_avgs.add(page['langs'])
+        return coeff_avgs
+
+    def save_coeff_avgs(self, output_file_dir: Path, coeff_avgs: dict):
+        """
+        Save the language averages of a PDF file.
+
+        Args:
+            output_file_dir: Directory of the analysis results.
+            coeff_avgs: Average coefficient of each language.
+        """
+        if self.store is not None:
+            self.store.save_avgs(output_file_dir, coeff_avgs)
+            return self.store.commit()
+        coeff_avgs_file = output_file_dir.resolve() / 'avgs.json'
+        with coeff_avgs_file.open("w") as f:
+            f.write(json.dumps(coeff_avgs, indent=2))
+
+    def read_pages(self, output_file_dir: Path) -> List[dict]:
+        """
+        Read the text and language information saved for the pages of a PDF file.
+
+        Args:
+            output_file_dir: Directory of the analysis results.
+
+        Returns:
+            A list of dictionaries with the name, text and language information of each page.
+        """
+        if self.store is not None:
+            return self.store.get_pages(output_file_dir)
+        pages = []
+        for lang_file in sorted((output_file_dir / 'langs').glob('*.json')):
+            text_file = (output_file_dir / 'texts' / lang_file.stem).with_suffix('.txt')
+            text = text_file.read_text(encoding="UTF-8") if text_file.exists() else ''
+            langs = json.loads(lang_file.read_text(encoding="UTF-8"))
+            pages.append(dict(name=lang_file.stem, text=text, langs=langs))
+        return pages
+
+    def save_page(self, output_file_dir: Path, page: dict):
+        """
+        Save the text and language information of a page read with read_pages.
+
+        Args:
+            output_file_dir: Directory of the analysis results.
+            page: Dictionary with the name, text and language information of the page.
+        """
+        if self.store is not None:
+            return self.store.save_page(output_file_dir, page['name'], page['text'], page['langs'])
+        text_file = (output_file_dir / 'texts' / page['name']).with_suffix('.txt')
+        lang_file = (output_file_dir / 'langs' / page['name']).with_suffix('.json')
+        text_file.write_text(page['text'], encoding="UTF-8")
+        lang_file.write_text(json.dumps(page['langs'], indent=2), encoding="UTF-8")
+
+    def read_coeff_avgs_file(self, output_file_dir: Path) -> dict:
+        """
+        Read the saved language averages of a PDF file.
+
+        Args:
+            output_file_dir: Directory of the analysis results.
+
+        Returns:
+            The average coefficient of each language.
+        """
+        if self.store is not None:
+            return self.store.get_avgs(output_file_dir)
+        with (output_file_dir / 'avgs.json').open(encoding="UTF-8") as source:
+            return json.load(source)
+
+    def read_meta(self, output_file_dir: Path) -> dict:
+        """
+        Read the saved metadata of a PDF file.
+
+        Args:
+            output_file_dir: Directory of the analysis results.
+
+        Returns:
+            The metadata.
+        """
+        if self.store is not None:
+            return self.store.get_meta(output_file_dir)
+        with (output_file_dir / 'meta.json').open(encoding="UTF-8") as source:
+            return json.load(source)
+
+    def worker(self, tasks_queue: Queue, results_queue: Queue):
+        while True:
+            task = tasks_queue.get()
+            results_queue.put((task, self.run_task(*task)))
+
+    def run_task(self, kind: str, input_file: Path, output_file_dir: Path, pages: Optional[List[int]],
+                 timings: Optional[dict] = None, averages: Optional[dict] = None,
+                 cache_key: Optional[str] = None) -> dict:
+        """
+        Run a task in a worker process.
+
+        Args:
+            kind: TASK_FILE, TASK_PAGES or TASK_AGGREGATE.
+            input_file: Path to the input PDF file.
+            output_file_dir: Directory to save the analysis results.
+            pages: Contiguous pages (starting at 1) to analyse for TASK_PAGES.
+            timings: Stage timings of the previous tasks of the file, for TASK_AGGREGATE.
+            averages: Merged averages of the pages of the previous tasks (see CoeffAverages.to_dict),
+                for TASK_AGGREGATE.
+            cache_key: Key of the PDF file in the results cache, computed by its TASK_FILE task,
+                for TASK_AGGREGATE.
+
+        Returns:
+            The status of the task, with the stage timings of the file so far, and the
+            averages of its pages for TASK_PAGES. A TASK_FILE task only returns the page
+            tasks of the file if it has more pages than pages_per_task (see STATUS_SPLIT).
+        """
+        stage_timings = StageTimings(timings)
+        try:
+            with stage_timings.activate():
+                if kind == PdfLanguageDetector.TASK_PAGES:
+                    status = self.analyse_page_task(input_file, output_file_dir, pages)
+                    return dict(status, timings=stage_timings.to_dict())
+                if kind == PdfLanguageDetector.TASK_AGGREGATE:
+                    status = self.aggregate_file_task(input_file, output_file_dir, averages, cache_key)
+                else:
+                    status = self.analyse_file_status(input_file, output_file_dir, split=True)
+            if status['status'] == PdfLanguageDetector.STATUS_SPLIT:
+                return dict(status, timings=stage_timings.to_dict())
+            return self.save_timings(input_file, output_file_dir, status, stage_timings)
+        except Exception:
+            return dict(status=PdfLanguageDetector.STATUS_FAILED)
+
+    def save_timings(self, input_file: Path, output_file_dir: Path, status: dict, stage_timings: StageTimings) -> dict:
+        """
+        Save the stage timings of an analysed PDF file in its metadata, and its status in the manifest.
+
+        Args:
+            input_file: Path to the input PDF file.
+            output_file_dir: Directory of the analysis results.
+            status: The final status of the file, with the detected language if any.
+            stage_timings: Time spent in each stage of the analysis of the file.
+
+        Returns:
+            The status of the file, with its stage timings.
+        """
+        timings = stage_timings.to_dict()
+        if status['status'] == PdfLanguageDetector.STATUS_DONE:
+            self.update_meta(output_file_dir, timings=timings)
+            if self.store is not None:
+                self.store.commit()
+        return dict(self.save_status(input_file, output_file_dir, status), timings=timings)
+
+    def save_status(self, input_file: Path, output_file_dir: Path, status: dict) -> dict:
+        """
+        Append the status of an analysed PDF file to the manifest, with the number of pages used.
+
+        Args:
+            input_file: Path to the input PDF file.
+            output_file_dir: Directory of the analysis results.
+            status: The status of the task, with the detected language if any.
+
+        Returns:
+            The status of the task.
+        """
+        if status['status'] in (PdfLanguageDetector.STATUS_DONE, PdfLanguageDetector.STATUS_CACHED):
+            self.manifest.append(dict(input_file=str(input_file.resolve()),
+                                      output_dir=str(output_file_dir.resolve()),
+                                      lang=status['lang']))
+            self.journal.add_document(output_file_dir)
+            status = dict(status, pages=self.read_meta(output_file_dir).get('pages_used', 0))
+        elif status['status'] == PdfLanguageDetector.STATUS_SKIPPED and not self.journal.is_done(output_file_dir):
+            # Found analysed in the output directory, maybe before the manifest existed: the
+            # next runs won't have to check it, and the report built from the manifest won't miss it
+            coeff_avgs = self.read_coeff_avgs_file(output_file_dir)
+            self.manifest.append(dict(input_file=str(input_file.resolve()),
+                                      output_dir=str(output_file_dir.resolve()),
+                                      lang=max(coeff_avgs, key=coeff_avgs.get)))
+            self.journal.add_document(output_file_dir)
+        return status
+
+    def analyse_file_status(self, input_file: Path, output_file_dir: Path, split: bool = False) -> dict:
+        """
+        Analyse a PDF file unless it was already analysed or its result is cached.
+
+        Args:
+            input_file: Path to the input PDF file.
+            output_file_dir: Directory to save the analysis results.
+            split: Return the page tasks of the file instead of analysing it, if it has
+                more pages than pages_per_task.
+
+        Returns:
+            The status of the task, with the detected language if any, or with the
+            page tasks and the cache key of a split file.
         """
-        Initialize the PdfLanguageDetector class.
+        if self.resume and self.is_already_analyzed(output_file_dir):
+            return dict(status=PdfLanguageDetector.STATUS_SKIPPED)
+        cache_key = None if self.cache is None else self.get_cache_key(input_file)
+        if cache_key is not None:
+            lang = self.restore_cached_result(cache_key, input_file, output_file_dir)
+            if lang is not None:
+                return dict(status=PdfLanguageDetector.STATUS_CACHED, lang=lang)
+        if split:
+            page_tasks = self.get_page_tasks(input_file)
+            if len(page_tasks) > 1:
+                return dict(status=PdfLanguageDetector.STATUS_SPLIT, page_tasks=page_tasks, cache_key=cache_key)
+        lang = self.analyse_file(input_file, output_file_dir)
+        if cache_key is not None:
+            self.save_cached_result(cache_key, output_file_dir)
+        return dict(status=PdfLanguageDetector.STATUS_DONE, lang=lang)
+
+    def get_cache_key(self, input_file: Path) -> str:
+        """
+        Get the key of a PDF file in the results cache.
 
         Args:
-            languages: List of ISO3 language codes.
-            input_dir: Path to the input directory.
-            output_dir: Path to the output directory.
-            max_pages: Maximum number of pages to process per PDF file.
-            resume: Skip PDF files already analyzed.
-            skip_images: Skip the extraction of PDF files as images.
-            skip_ocr: Skip the OCR of images from PDF files.
-            parallel: Number of threads to run in parallel.
-            relative_to: Path to the directory relative to which build the output dir path.
+            input_file: Path to the input PDF file.
+
+        Returns:
+            The cache key.
         """
-        self.languages = [Language.get(language) for language in languages]
-        self.lang_detector = LanguageDetectorBuilder.from_iso_codes_639_3(*self.lingua_langs).build()
-        self.input_dir = input_dir
-        self.output_dir = output_dir
-        self.max_pages = max_pages
-        self.resume = resume
-        self.skip_images = skip_images
-        self.skip_ocr = skip_ocr
-        self.parallel = parallel
-        self.relative_to = input_dir.resolve() if relative_to is None else relative_to.resolve()
+        return self.cache.get_key(input_file, self.coeff_langs, self.max_pages, self.get_cache_settings())
 
-    def create_output_directories(self, *dirs: Path):
+    def get_cache_settings(self) -> dict:
         """
-        Create output directories if they don't exist.
+        Get the settings changing the result of the analysis of a PDF file, so a
+        result is only reused by a run with the same settings.
+
+        Returns:
+            The value of each setting.
+        """
+        return dict(text_layer=self.text_layer, min_text_chars=self.min_text_chars,
+                    ocr_backend=self.ocr_backend.name, confidence_margin=self.confidence_margin,
+                    script_detection=self.script_detection, narrow_after=self.narrow_after,
+                    narrow_langs=self.narrow_langs, narrow_min_confidence=self.narrow_min_confidence,
+                    dpi=self.render_profile.dpi, color=self.render_profile.color, crop=self.render_profile.crop,
+                    adaptive_dpi=self.adaptive_dpi, skip_blank_pages=self.skip_blank_pages,
+                    skip_duplicate_pages=self.skip_duplicate_pages, weighting=self.weighting)
+
+    def save_cached_result(self, cache_key: str, output_file_dir: Path):
+        """
+        Save the analysis results of a PDF file in the results cache.
 
         Args:
-            *dirs: Variable number of directory paths to create.
+            cache_key: Key of the PDF file in the results cache.
+            output_file_dir: Directory of the analysis results.
         """
-        for dir_path in dirs:
-            os.makedirs(dir_path.resolve(), exist_ok=True)
-    
-    def extract_meta(self, input_file: Path):
-        output_dir = self.get_output_dir(input_file)
-        meta_file = output_dir / 'meta.json'
-        meta = dict(input_file=str(input_file.resolve()), output_dir=str(output_dir.resolve()))
-        with meta_file.open("w") as f:
-            f.write(json.dumps(meta, indent=2))
+        pages = self.read_pages(output_file_dir)
+        coeff_avgs = self.read_coeff_avgs_file(output_file_dir)
+        meta = self.read_meta(output_file_dir)
+        self.cache.set(cache_key, dict(pages=pages, avgs=coeff_avgs, pages_used=meta.get('pages_used'),
+                                       pages_skipped=meta.get('pages_skipped', dict())))
 
-    def extract_images(self, input_file: Path, images_dir: Path):
+    def restore_cached_result(self, cache_key: str, input_file: Path, output_file_dir: Path) -> Optional[str]:
         """
-        Extract images from a PDF file using pdftoppm.
+        Write the cached analysis results of an identical PDF file in the output directory.
 
         Args:
+            cache_key: Key of the PDF file in the results cache.
             input_file: Path to the input PDF file.
-            images_dir: Directory to save the extracted images.
+            output_file_dir: Directory to save the analysis results.
+
+        Returns:
+            The language with the highest average coefficient, or None if nothing is cached.
         """
-        pdftoppm('-l', self.max_pages, '-jpeg', input_file.resolve(), (images_dir / 'page').resolve())
+        result = self.cache.get(cache_key)
+        if result is None:
+            return None
+        self.create_page_directories(output_file_dir)
+        for page in result['pages']:
+            self.save_page(output_file_dir, page)
+        self.extract_meta(input_file)
+        self.update_meta(output_file_dir, pages_used=result['pages_used'],
+                         pages_skipped=result.get('pages_skipped', dict()), cache_hit=True)
+        self.save_coeff_avgs(output_file_dir, result['avgs'])
+        return max(result['avgs'], key=result['avgs'].get)
 
-    def extract_text(self, image_file: Path) -> str:
+    def analyse_page_task(self, input_file: Path, output_file_dir: Path, pages: List[int]) -> dict:
         """
-        Extract text from an image using Tesseract OCR.
+        Analyse a range of pages of a PDF file. The pages of the whole file
+        are aggregated by a last task, once all its page tasks are done.
 
         Args:
-            image_file: Path to the input image file.
+            input_file: Path to the input PDF file.
+            output_file_dir: Directory to save the analysis results.
+            pages: Contiguous pages (starting at 1) to analyse.
 
         Returns:
-            Extracted text from the image.
+            The status of the task, with the averages of its pages (see CoeffAverages.to_dict).
         """
-        lang = '+'.join(self.tesseract_langs)
-        image_text = pytesseract.image_to_string(Image.open(image_file), lang=lang)
-        return image_text
+        self.create_page_directories(output_file_dir)
+        coeff_avgs = self.analyse_pages(input_file, output_file_dir, pages)
+        return dict(status=PdfLanguageDetector.STATUS_DONE, averages=coeff_avgs.to_dict())
 
-    def save_text(self, image_text: str, text_file: Path):
+    def aggregate_file_task(self, input_file: Path, output_file_dir: Path, averages: Optional[dict] = None,
+                            cache_key: Optional[str] = None) -> dict:
         """
-        Save extracted text to a text file.
+        Aggregate the pages of a PDF file analysed in several page tasks.
 
         Args:
-            image_text: Text to be saved.
-            text_file: Path to the output text file.
+            input_file: Path to the input PDF file.
+            output_file_dir: Directory of the analysis results.
+            averages: Merged averages of the pages of the page tasks (see CoeffAverages.to_dict).
+                Read back from the saved pages if None.
+            cache_key: Key of the PDF file in the results cache, computed again if None.
+
+        Returns:
+            The status of the task, with the detected language.
         """
-        with text_file.open("a") as f:
-            f.write(image_text)
+        self.extract_meta(input_file)
+        coeff_avgs = None
+        if averages is not None:
+            coeff_avgs = self.create_coeff_avgs()
+            coeff_avgs.merge(averages)
+        lang = self.aggregate_pages(output_file_dir, coeff_avgs)
+        if self.cache is not None:
+            self.save_cached_result(cache_key or self.get_cache_key(input_file), output_file_dir)
+        return dict(status=PdfLanguageDetector.STATUS_DONE, lang=lang)
 
-    def save_language(self, detected_lang: List[list], lang_file: Path):
+    def get_page_tasks(self, input_file: Path) -> List[Optional[List[int]]]:
         """
-        Save detected language information to a JSON file.
+        Split the pages of a PDF file in ranges of pages_per_task pages. Called by
+        the worker analysing the file, once it isn't skipped or cached.
 
         Args:
-            detected_lang: Language detection result.
-            lang_file: Path to the output JSON file.
+            input_file: Path to the input PDF file.
+
+        Returns:
+            The pages of each task, or [None] if the file is processed in a single task.
         """
-        langs = [language.name for language, _ in detected_lang]
-        langs = [find_language(name).to_alpha3().upper() for name in langs]
-        coeffs = [value for _, value in detected_lang]
-        data = dict(zip(langs, coeffs))
-        with lang_file.open("w") as f:
-            f.write(json.dumps(data, indent=2))
+        if self.pages_per_task is None or self.max_pages <= self.pages_per_task:
+            return [None]
+        # Files without OCR are handled as a whole
+        if self.skip_images or self.skip_ocr:
+            return [None]
+        try:
+            pages = self.get_pages(input_file)
+        except ErrorReturnCode:
+            return [None]
+        tasks = [pages[i:i + self.pages_per_task] for i in range(0, len(pages), self.pages_per_task)]
+        return tasks if len(tasks) > 1 else [None]
 
-    def process_images(self, images_dir: Path, texts_dir: Path, langs_dir: Path):
+    def process_input_files(self):
         """
-        Process the extracted images, extract text, and save text and language information.
+        Process all the PDF files in the input directory.
+        """
+        # Loaded before starting the workers, which inherit it
+        if self.resume and self.journal is not None:
+            self.journal.load()
+        if self.pipeline:
+            return self.process_input_files_in_pipeline()
+        if self.async_executor:
+            return self.process_input_files_async()
+        self.run_metrics = RunMetrics(self.metrics_file, self.metrics_format)
+        # Tasks are sent to the workers, which send back the status of each task
+        tasks_queue = Queue()
+        results_queue = Queue()
+        # Start a pool of worker processes
+        with Pool(self.parallel, self.worker, (tasks_queue, results_queue)):
+            throughput = Throughput()
+            # Create progress bar
+            with Progress(SpinnerColumn(), "[progress.description]{task.description}", BarColumn(),
+                          MofNCompleteColumn(), TimeElapsedColumn(), "{task.fields[throughput]}",
+                          transient=True) as progress:
+                progress_task = progress.add_task('Analysing PDF files', total=None, throughput=throughput)
+                # Page tasks remaining for each file split in several tasks
+                tasks_pending = dict()
+                tasks_in_flight = 0
+                max_tasks_in_flight = self.parallel * PdfLanguageDetector.TASKS_IN_FLIGHT_PER_WORKER
+                count = 0
+                while True:
+                    for input_file in self.get_input_files():
+                        count += 1
+                        progress.update(progress_task, total=count)
+                        status = self.check_input_file(input_file)
+                        if status is not None:
+                            self.complete_file(input_file, status, progress, progress_task, throughput)
+                            continue
+                        # Only send tasks when a worker is about to be free
+                        while tasks_in_flight >= max_tasks_in_flight:
+                            result = self.get_result(results_queue)
+                            tasks_in_flight += self.process_result(result, tasks_queue, tasks_pending, progress,
+                                                                   progress_task, throughput) - 1
+                        # Skipped, cached and split files are found by the workers, which read the PDF file
+                        tasks_queue.put((PdfLanguageDetector.TASK_FILE, input_file, self.get_output_dir(input_file), None))
+                        tasks_in_flight += 1
+                    while tasks_in_flight > 0:
+                        result = self.get_result(results_queue)
+                        tasks_in_flight += self.process_result(result, tasks_queue, tasks_pending, progress,
+                                                               progress_task, throughput) - 1
+                    # Files claimed by other nodes may be claimed again if their lease expires
+                    if self.work_queue is None or self.work_queue.is_finished():
+                        break
+                    time.sleep(WorkQueue.POLL_INTERVAL)
+            self.finish_run(throughput)
+
+    def process_input_files_in_pipeline(self):
+        """
+        Process all the PDF files in the input directory with a pool of workers for
+        each stage of the pipeline, and report the utilisation of the stages.
+        """
+        pipeline = Pipeline(self.render_workers, self.ocr_workers, self.detect_workers, self.stage_queue_size)
+        self.run_metrics = RunMetrics(self.metrics_file, self.metrics_format)
+        with Pool(pipeline.render.workers, self.render_worker, (pipeline,)), \
+            Pool(pipeline.ocr.workers, self.ocr_worker, (pipeline,)), \
+            Pool(pipeline.detect.workers, self.detect_worker, (pipeline,)):
+            throughput = Throughput()
+            with Progress(SpinnerColumn(), "[progress.description]{task.description}", BarColumn(),
+                          MofNCompleteColumn(), TimeElapsedColumn(), "{task.fields[throughput]}",
+                          transient=True) as progress:
+                progress_task = progress.add_task('Analysing PDF files', total=None, throughput=throughput)
+                # Pages remaining in the pipeline for each file
+                files_pending = dict()
+                workers = sum(stage.workers for stage in pipeline.stages)
+                max_files_in_flight = workers * PdfLanguageDetector.TASKS_IN_FLIGHT_PER_WORKER
+                count = 0
+                while True:
+                    for input_file in self.get_input_files():
+                        count += 1
+                        progress.update(progress_task, total=count)
+                        status = self.check_input_file(input_file)
+                        if status is not None:
+                            self.complete_file(input_file, status, progress, progress_task, throughput)
+                            continue
+                        while len(files_pending) >= max_files_in_flight:
+                            self.process_stage_result(self.get_result(pipeline.results), pipeline, files_pending,
+                                                      progress, progress_task, throughput)
+                        files_pending[input_file] = dict(remaining=0, rendered=False, failed=False, timings=None,
+                                                         averages=self.create_coeff_avgs())
+                        pipeline.render.queue.put((PdfLanguageDetector.TASK_FILE, input_file,
+                                                   self.get_output_dir(input_file), None))
+                    while len(files_pending) > 0:
+                        self.process_stage_result(self.get_result(pipeline.results), pipeline, files_pending,
+                                                  progress, progress_task, throughput)
+                    # Files claimed by other nodes may be claimed again if their lease expires
+                    if self.work_queue is None or self.work_queue.is_finished():
+                        break
+                    time.sleep(WorkQueue.POLL_INTERVAL)
+            self.finish_run(throughput)
+            for line in pipeline.get_report():
+                print(f"Stage {line}")
+
+    def render_worker(self, pipeline: Pipeline):
+        while True:
+            task = pipeline.render.get()
+            pipeline.results.put((task, self.run_render_task(pipeline, *task)))
+
+    def ocr_worker(self, pipeline: Pipeline):
+        while True:
+            task = pipeline.ocr.get()
+            self.run_ocr_task(pipeline, *task)
+
+    def detect_worker(self, pipeline: Pipeline):
+        while True:
+            task = pipeline.detect.get()
+            run = self.run_task if task[0] == PdfLanguageDetector.TASK_AGGREGATE else self.run_detect_task
+            with pipeline.detect.measure():
+                status = run(*task)
+            pipeline.results.put((task[:4], status))
+
+    def run_render_task(self, pipeline: Pipeline, kind: str, input_file: Path, output_file_dir: Path,
+                        pages: Optional[List[int]]) -> dict:
+        """
+        Send the pages of a PDF file to the next stages of the pipeline: pages with
+        a text layer to the language detection, and rendered pages to the OCR.
 
         Args:
-            images_dir: Directory containing the extracted images.
-            texts_dir: Directory to save the extracted text.
-            langs_dir: Directory to save the language information.
+            pipeline: Stages of the pipeline.
+            kind: TASK_FILE.
+            input_file: Path to the input PDF file.
+            output_file_dir: Directory to save the analysis results.
+            pages: Unused, the pages are found by the task.
+
+        Returns:
+            The final status of the file if it was skipped or cached, or the status of the
+            task with the number of pages sent to the next stages (pages_queued), the stage
+            timings of the task, and the averages of the pages skipped or reused.
         """
-        for image_file in sorted(self.get_images_files(images_dir)):
-            image_text = self.extract_text(image_file)
-            detected_lang = self.lang_detector.compute_language_confidence_values(image_text)
-            text_file = (texts_dir / image_file.stem).with_suffix('.txt')
-            lang_file = (langs_dir / image_file.stem).with_suffix('.json')
-            self.save_text(image_text, text_file)
-            self.save_language(detected_lang, lang_file)
+        pages_queued = 0
+        stage_timings = StageTimings()
+        coeff_avgs = self.create_coeff_avgs()
+        try:
+            with pipeline.render.measure():
+                status = self.get_known_status(input_file, output_file_dir)
+            if status is not None:
+                return self.save_status(input_file, output_file_dir, status)
+            page_tasks = self.render_file(input_file, output_file_dir, pipeline, coeff_avgs)
+            while True:
+                # Waiting for room in the queue of the next stage isn't busy time
+                with pipeline.render.measure(), stage_timings.activate():
+                    page_task = next(page_tasks, None)
+                if page_task is None:
+                    break
+                stage, task = page_task
+                stage.queue.put(task)
+                pages_queued += 1
+            return dict(status=PdfLanguageDetector.STATUS_DONE, pages_queued=pages_queued,
+                        timings=stage_timings.to_dict(), averages=coeff_avgs.to_dict())
+        except Exception:
+            return dict(status=PdfLanguageDetector.STATUS_FAILED, pages_queued=pages_queued)
 
-    def calculate_coeff_avgs(self, langs_dir: Path) -> dict:
+    def get_known_status(self, input_file: Path, output_file_dir: Path) -> Optional[dict]:
         """
-        Calculate the average coefficient for each language.
+        Get the status of a PDF file already analysed, or restore its cached result.
 
         Args:
-            langs_dir: Directory containing the language information files.
+            input_file: Path to the input PDF file.
+            output_file_dir: Directory to save the analysis results.
 
         Returns:
-            A dictionary with the average coefficient for each language.
+            The status of the file, or None if it must be analysed.
         """
-        coeff_avgs = dict.fromkeys([lang.to_alpha3().upper() for lang in self.languages], 0)
-        for index, lang_file in enumerate(self.get_lang_files(langs_dir)):
-            with lang_file.open(encoding="UTF-8") as source:
-                coeffs = json.load(source)
-                for lang in coeff_avgs:
-                    coeff_avgs[lang] = (coeff_avgs[lang] * index + coeffs[lang]) / (index + 1)
-        return coeff_avgs
-        
-    def get_lang_files(self, langs_dir: Path) -> list:
+        if self.resume and self.is_already_analyzed(output_file_dir):
+            return dict(status=PdfLanguageDetector.STATUS_SKIPPED)
+        if self.cache is not None:
+            lang = self.restore_cached_result(self.get_cache_key(input_file), input_file, output_file_dir)
+            if lang is not None:
+                return dict(status=PdfLanguageDetector.STATUS_CACHED, lang=lang)
+        return None
+
+    def render_file(self, input_file: Path, output_file_dir: Path, pipeline: Pipeline,
+                    coeff_avgs: Optional[CoeffAverages] = None) -> Iterator[tuple]:
         """
-        Get a list of language files in the specified directory.
+        Read the text layer of a PDF file, and render the pages without enough text.
+        Blank and duplicate pages are skipped before they reach the OCR.
 
         Args:
-            langs_dir: Path to the directory containing language files.
+            input_file: Path to the input PDF file.
+            output_file_dir: Directory to save the analysis results.
+            pipeline: Stages of the pipeline.
+            coeff_avgs: Averages the pages skipped, or reused from a previous run, are added to.
 
         Returns:
-            A list of language files.
+            An iterator of (stage, task) tuples, the tasks to send to each stage.
+        """
+        self.create_page_directories(output_file_dir)
+        coeff_avgs = self.create_coeff_avgs() if coeff_avgs is None else coeff_avgs
+        done_pages = self.get_done_pages(output_file_dir, coeff_avgs)
+        pages_texts = []
+        if self.text_layer:
+            try:
+                pages_texts = self.extract_text_layer(input_file)
+            except ErrorReturnCode:
+                pages_texts = []
+        ocr_pages = []
+        for page, page_text in enumerate(pages_texts, start=1):
+            if self.get_page_name(page) in done_pages:
+                continue
+            if self.has_enough_text(page_text):
+                yield pipeline.detect, (PdfLanguageDetector.TASK_PAGES, input_file, output_file_dir, [page], None,
+                                        page_text, PdfLanguageDetector.SOURCE_TEXT_LAYER)
+            else:
+                ocr_pages.append(page)
+        if not pages_texts:
+            ocr_pages = [page for page in self.get_pages(input_file) if self.get_page_name(page) not in done_pages]
+        page_filter = self.create_page_filter()
+        for page in ocr_pages:
+            page_name = self.get_page_name(page)
+            image = self.render_page(input_file, page)
+            if self.keep_images:
+                image.save((output_file_dir / 'images' / page_name).with_suffix('.jpg'))
+            skipped = None if page_filter is None else page_filter.check(image, page_name)
+            if skipped is not None:
+                coeff_avgs.add(self.save_skipped_page(page_name, output_file_dir / 'langs', skipped))
+                continue
+            yield pipeline.ocr, (PdfLanguageDetector.TASK_PAGES, input_file, output_file_dir, [page], None, image)
+        if self.store is not None:
+            self.store.commit()
 
+    def run_ocr_task(self, pipeline: Pipeline, kind: str, input_file: Path, output_file_dir: Path, pages: List[int],
+                     timings: Optional[dict], image: Image.Image):
         """
-        return list(langs_dir.glob('*.json'))[:self.max_pages]
+        OCR a rendered page, and send its text to the language detection with the
+        timings of the OCR. A failure is sent back to the main process directly.
 
-    def get_images_files(self, images_dir: Path) -> list:
+        Args:
+            pipeline: Stages of the pipeline.
+            kind: TASK_PAGES.
+            input_file: Path to the input PDF file.
+            output_file_dir: Directory to save the analysis results.
+            pages: The rendered page (starting at 1).
+            timings: Stage timings of the page so far.
+            image: The page rendered as an image.
         """
-        Get a list of image files in the specified directory.
+        stage_timings = StageTimings(timings)
+        try:
+            with pipeline.ocr.measure(), stage_timings.activate():
+                render_high_dpi = None
+                if self.adaptive_dpi is not None:
+                    render_high_dpi = partial(self.render_page, input_file, pages[0], self.adaptive_dpi)
+                image_text = self.ocr_image(image, None, render_high_dpi)
+        except Exception:
+            task = (kind, input_file, output_file_dir, pages)
+            return pipeline.results.put((task, dict(status=PdfLanguageDetector.STATUS_FAILED)))
+        pipeline.detect.queue.put((kind, input_file, output_file_dir, pages, stage_timings.to_dict(), image_text,
+                                   PdfLanguageDetector.SOURCE_OCR))
+
+    def run_detect_task(self, kind: str, input_file: Path, output_file_dir: Path, pages: List[int],
+                        timings: Optional[dict] = None, text: Optional[str] = None,
+                        source: Optional[str] = None) -> dict:
+        """
+        Detect the language of a page and save it.
 
         Args:
-            images_dir: Path to the directory containing image files.
+            kind: TASK_PAGES.
+            input_file: Path to the input PDF file.
+            output_file_dir: Directory to save the analysis results.
+            pages: The page (starting at 1) of the text.
+            timings: Stage timings of the page so far.
+            text: Text of the page.
+            source: How the text was extracted (SOURCE_TEXT_LAYER or SOURCE_OCR).
 
         Returns:
-            A list of image files.
+            The status of the task, with its stage timings and the averages of the page.
+        """
+        stage_timings = StageTimings(timings)
+        coeff_avgs = self.create_coeff_avgs()
+        try:
+            with stage_timings.activate():
+                coeff_avgs.add(self.process_text(text, self.get_page_name(pages[0]), output_file_dir / 'texts',
+                                                 output_file_dir / 'langs', source))
+                if self.store is not None:
+                    with StageTimings.measure(StageTimings.SAVE):
+                        self.store.commit()
+            return dict(status=PdfLanguageDetector.STATUS_DONE, timings=stage_timings.to_dict(),
+                        averages=coeff_avgs.to_dict())
+        except Exception:
+            return dict(status=PdfLanguageDetector.STATUS_FAILED)
 
+    def process_stage_result(self, result: tuple, pipeline: Pipeline, files_pending: dict, progress, progress_task,
+                             throughput: Throughput):
         """
-        return sorted(images_dir.glob('*.jpg'))[:self.max_pages]
+        Process the status of a task sent back by a stage of the pipeline. The pages
+        of a file are aggregated once it was rendered and all its pages are detected,
+        in whichever order their statuses are received.
 
-    def analyse_file(self, input_file: Path, output_file_dir: Path) -> str:
+        Args:
+            result: The task and its status.
+            pipeline: Stages of the pipeline.
+            files_pending: Dictionary for the pages remaining in the pipeline for each file.
+            progress: Progress bar for displaying the progress of the run.
+            progress_task: Progress bar task counting the analysed files.
+            throughput: Throughput of the run.
         """
-        Analyze a PDF file, extract images, process them, and calculate language averages.
+        (kind, input_file, output_file_dir, _), status = result
+        pending = files_pending[input_file]
+        # Files skipped or cached don't go through the next stages
+        if kind == PdfLanguageDetector.TASK_AGGREGATE or (kind == PdfLanguageDetector.TASK_FILE and 'pages_queued' not in status):
+            del files_pending[input_file]
+            return self.complete_file(input_file, status, progress, progress_task, throughput)
+        if kind == PdfLanguageDetector.TASK_FILE:
+            pending['rendered'] = True
+            pending['remaining'] += status['pages_queued']
+        else:
+            pending['remaining'] -= 1
+        pending['failed'] = pending['failed'] or status['status'] == PdfLanguageDetector.STATUS_FAILED
+        pending['timings'] = StageTimings.merge(pending['timings'], status.get('timings'))
+        pending['averages'].merge(status.get('averages'))
+        if not pending['rendered'] or pending['remaining'] > 0:
+            return
+        if pending['failed']:
+            del files_pending[input_file]
+            return self.complete_file(input_file, dict(status=PdfLanguageDetector.STATUS_FAILED), progress,
+                                      progress_task, throughput)
+        pipeline.detect.queue.put((PdfLanguageDetector.TASK_AGGREGATE, input_file, output_file_dir, None,
+                                   pending['timings'], pending['averages'].to_dict()))
+
+    def process_input_files_async(self):
+        """
+        Process all the PDF files in the input directory from the main process,
+        running the command-line tools as asyncio subprocesses.
+        """
+        self.run_metrics = RunMetrics(self.metrics_file, self.metrics_format)
+        throughput = Throughput()
+        with Progress(SpinnerColumn(), "[progress.description]{task.description}", BarColumn(),
+                      MofNCompleteColumn(), TimeElapsedColumn(), "{task.fields[throughput]}",
+                      transient=True) as progress:
+            progress_task = progress.add_task('Analysing PDF files', total=None, throughput=throughput)
+            asyncio.run(self.analyse_input_files_async(AsyncExecutor(), progress, progress_task, throughput))
+        self.finish_run(throughput)
+
+    async def analyse_input_files_async(self, executor: AsyncExecutor, progress, progress_task,
+                                        throughput: Throughput):
+        """
+        Analyse the PDF files concurrently, with enough files in flight to keep
+        every process allowed by the executor busy.
+
+        Args:
+            executor: Executor running the command-line tools.
+            progress: Progress bar for displaying the progress of the run.
+            progress_task: Progress bar task counting the analysed files.
+            throughput: Throughput of the run.
+        """
+        max_files_in_flight = executor.processes * PdfLanguageDetector.TASKS_IN_FLIGHT_PER_WORKER
+        files_in_flight = set()
+        count = 0
+        while True:
+            for input_file in self.get_input_files():
+                count += 1
+                progress.update(progress_task, total=count)
+                status = self.check_input_file(input_file)
+                if status is not None:
+                    self.complete_file(input_file, status, progress, progress_task, throughput)
+                    continue
+                while len(files_in_flight) >= max_files_in_flight:
+                    files_in_flight = await self.wait_files_async(files_in_flight, progress, progress_task, throughput)
+                files_in_flight.add(asyncio.create_task(self.analyse_file_async(executor, input_file)))
+            while len(files_in_flight) > 0:
+                files_in_flight = await self.wait_files_async(files_in_flight, progress, progress_task, throughput)
+            # Files claimed by other nodes may be claimed again if their lease expires
+            if self.work_queue is None or self.work_queue.is_finished():
+                break
+            await asyncio.sleep(WorkQueue.POLL_INTERVAL)
+
+    async def wait_files_async(self, files_in_flight: set, progress, progress_task, throughput: Throughput) -> set:
+        """
+        Wait for PDF files to be analysed and report their status, renewing the lease
+        of the files claimed from the work queue in the meantime.
+
+        Args:
+            files_in_flight: Tasks analysing the PDF files.
+            progress: Progress bar for displaying the progress of the run.
+            progress_task: Progress bar task counting the analysed files.
+            throughput: Throughput of the run.
+
+        Returns:
+            The tasks still analysing PDF files.
+        """
+        timeout = None
+        if self.work_queue is not None:
+            self.work_queue.renew_claims()
+            timeout = self.work_queue.lease_duration / 3
+        done, files_in_flight = await asyncio.wait(files_in_flight, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            input_file, status = task.result()
+            self.complete_file(input_file, status, progress, progress_task, throughput)
+        return files_in_flight
+
+    async def analyse_file_async(self, executor: AsyncExecutor, input_file: Path) -> Tuple[Path, dict]:
+        """
+        Analyse a PDF file unless it was already analysed or its result is cached.
+
+        Args:
+            executor: Executor running the command-line tools.
+            input_file: Path to the input PDF file.
+
+        Returns:
+            The input file and its status.
+        """
+        output_file_dir = self.get_output_dir(input_file)
+        # Each asyncio task runs in a copy of the context, so files analysed concurrently have their own timings
+        stage_timings = StageTimings()
+        try:
+            with stage_timings.activate():
+                status = self.get_known_status(input_file, output_file_dir)
+                if status is None:
+                    self.create_page_directories(output_file_dir)
+                    self.extract_meta(input_file)
+                    coeff_avgs = await self.analyse_pages_async(executor, input_file, output_file_dir)
+                    status = dict(status=PdfLanguageDetector.STATUS_DONE,
+                                  lang=self.aggregate_pages(output_file_dir, coeff_avgs))
+                    if self.cache is not None:
+                        self.save_cached_result(self.get_cache_key(input_file), output_file_dir)
+            return input_file, self.save_timings(input_file, output_file_dir, status, stage_timings)
+        except Exception:
+            return input_file, dict(status=PdfLanguageDetector.STATUS_FAILED)
+
+    async def analyse_pages_async(self, executor: AsyncExecutor, input_file: Path,
+                                  output_file_dir: Path) -> CoeffAverages:
+        """
+        Extract the text of the pages of a PDF file, and save text and language information.
+        Without a confidence margin or duplicate pages to skip, the pages don't depend on
+        each other and are rendered and OCR'd concurrently.
 
         Args:
+            executor: Executor running the command-line tools.
             input_file: Path to the input PDF file.
             output_file_dir: Directory to save the analysis results.
 
         Returns:
-            The language with the highest average coefficient.
+            The averages of the pages analysed, or reused from a previous run.
         """
-        images_dir = output_file_dir / 'images'
         texts_dir = output_file_dir / 'texts'
         langs_dir = output_file_dir / 'langs'
-        self.create_output_directories(images_dir, texts_dir, langs_dir)
-        self.extract_meta(input_file)
-        if not self.skip_images:
-            self.extract_images(input_file, images_dir)
-        if not self.skip_ocr:
-            self.process_images(images_dir, texts_dir, langs_dir)
-        coeff_avgs = self.calculate_coeff_avgs(langs_dir)
-        coeff_avgs_file = output_file_dir.resolve() / 'avgs.json'
-        with coeff_avgs_file.open("w") as f:
-            f.write(json.dumps(coeff_avgs, indent=2))
-        return max(coeff_avgs, key=coeff_avgs.get)
+        coeff_avgs = self.create_coeff_avgs()
+        done_pages = self.get_done_pages(output_file_dir, coeff_avgs)
+        ocr_pages = None
+        if self.text_layer:
+            try:
+                output = await executor.run('pdftotext', *self.get_text_layer_args(input_file),
+                                            stage=StageTimings.TEXT_LAYER)
+                pages_texts = output.decode('UTF-8', errors='replace').split('\f')[:-1]
+                ocr_pages = self.process_pages_texts(pages_texts, 1, texts_dir, langs_dir, coeff_avgs, done_pages)
+            except ErrorReturnCode:
+                ocr_pages = None
+        if ocr_pages is None:
+            info = await executor.run('pdfinfo', input_file.resolve())
+            ocr_pages = list(range(1, min(self.read_page_count(info.decode('UTF-8', errors='replace')), self.max_pages) + 1))
+            ocr_pages = [page for page in ocr_pages if self.get_page_name(page) not in done_pages]
+        page_filter = self.create_page_filter()
+        if self.confidence_margin is None and not self.skip_duplicate_pages:
+            pages_coeffs = await asyncio.gather(*(self.analyse_page_async(executor, input_file, page, output_file_dir,
+                                                                          page_filter) for page in ocr_pages))
+            for coeffs in pages_coeffs:
+                coeff_avgs.add(coeffs)
+        else:
+            for page in ocr_pages:
+                if self.has_converged(coeff_avgs):
+                    break
+                coeffs = await self.analyse_page_async(executor, input_file, page, output_file_dir, page_filter)
+                coeff_avgs.add(coeffs)
+        if self.store is not None:
+            self.store.commit()
+        return coeff_avgs
+
+    async def analyse_page_async(self, executor: AsyncExecutor, input_file: Path, page: int, output_file_dir: Path,
+                                 page_filter: Optional[PageFilter] = None) -> dict:
+        """
+        Render and OCR a page, and save its text and language information.
+
+        Args:
+            executor: Executor running the command-line tools.
+            input_file: Path to the input PDF file.
+            page: Page (starting at 1) to analyse.
+            output_file_dir: Directory to save the analysis results.
+            page_filter: Filter of blank and duplicate pages of the document, if enabled.
+
+        Returns:
+            The coefficient of each language for the page, or why it was skipped.
+        """
+        page_name = self.get_page_name(page)
+        image = await self.render_page_async(executor, input_file, page)
+        if self.keep_images:
+            image.save((output_file_dir / 'images' / page_name).with_suffix('.jpg'))
+        skipped = None if page_filter is None else page_filter.check(image, page_name)
+        if skipped is not None:
+            return self.save_skipped_page(page_name, output_file_dir / 'langs', skipped)
+        image_text = await self.extract_text_async(executor, image)
+        # Characters may be too small to be recognized at a low resolution
+        if self.adaptive_dpi is not None and not self.has_enough_text(image_text):
+            image = await self.render_page_async(executor, input_file, page, self.adaptive_dpi)
+            image_text = await self.extract_text_async(executor, image)
+        return self.process_text(image_text, page_name, output_file_dir / 'texts', output_file_dir / 'langs',
+                                 PdfLanguageDetector.SOURCE_OCR)
+
+    async def render_page_async(self, executor: AsyncExecutor, input_file: Path, page: int,
+                                dpi: Optional[int] = None) -> Image.Image:
+        """
+        Render a page of a PDF file in memory with a pdftoppm subprocess.
+
+        Args:
+            executor: Executor running the command-line tools.
+            input_file: Path to the input PDF file.
+            page: Page (starting at 1) to render.
+            dpi: Resolution overriding the render profile's.
+
+        Returns:
+            The rendered page.
+        """
+        render_args = self.render_profile.get_pdftoppm_args(dpi)
+        output = await executor.run('pdftoppm', '-f', page, '-l', page, *render_args, input_file.resolve(),
+                                    stage=StageTimings.RENDER)
+        return Image.open(io.BytesIO(output))
+
+    async def extract_text_async(self, executor: AsyncExecutor, image: Image.Image) -> str:
+        """
+        Extract the text of a page with a tesseract subprocess reading it on stdin.
+
+        Args:
+            executor: Executor running the command-line tools.
+            image: The page rendered as an image.
+
+        Returns:
+            Extracted text from the page.
+        """
+        buffer = io.BytesIO()
+        self.render_profile.crop_image(image).save(buffer, format='PPM')
+        lang = '+'.join(self.tesseract_langs)
+        # The processes are already capped to the number of CPUs: one thread each
+        output = await executor.run(pytesseract.pytesseract.tesseract_cmd, 'stdin', 'stdout', '-l', lang,
+                                    stdin=buffer.getvalue(), env=dict(OMP_THREAD_LIMIT='1'), stage=StageTimings.OCR)
+        return output.decode('UTF-8', errors='replace')
 
-    def worker(self, queue: JoinableQueue):
+    def get_input_files(self) -> Iterator[Path]:
+        """
+        Get the PDF files to process: claimed from the work queue if any, or read
+        from the input list or the input directory (only those of the shard if set).
+
+        Returns:
+            An iterator of paths to PDF files.
+        """
+        if self.work_queue is not None:
+            yield from self.claim_input_files()
+        else:
+            yield from InputFiles(self.input_dir, self.input_list, self.shard, self.relative_to)
+
+    def claim_input_files(self) -> Iterator[Path]:
+        """
+        Claim PDF files from the work queue until none is left to claim.
+
+        Returns:
+            An iterator of paths to PDF files.
+        """
+        while True:
+            input_file = self.work_queue.claim()
+            if input_file is None:
+                return
+            yield input_file
+
+    def get_result(self, results_queue: Queue) -> tuple:
+        """
+        Wait for the status of a task sent back by a worker, renewing the lease
+        of the files claimed from the work queue in the meantime.
+
+        Args:
+            results_queue: Queue of the statuses sent back by the workers.
+
+        Returns:
+            The task and its status.
+        """
+        if self.work_queue is None:
+            return results_queue.get()
         while True:
-            input_file, output_file_dir, tasks_statuses = queue.get()
+            self.work_queue.renew_claims()
             try:
-                if self.resume and self.is_already_analyzed(output_file_dir):
-                    tasks_statuses[input_file] = dict(status=PdfLanguageDetector.STATUS_SKIPPED)
-                else:
-                    lang = self.analyse_file(input_file, output_file_dir)
-                    tasks_statuses[input_file] = dict(status=PdfLanguageDetector.STATUS_DONE, lang=lang)
-            except Exception:
-                tasks_statuses[input_file] = dict(status=PdfLanguageDetector.STATUS_FAILED)
-            finally:
-                queue.task_done()
+                return results_queue.get(timeout=self.work_queue.lease_duration / 3)
+            except Empty:
+                continue
 
-    def process_input_files(self):
+    def process_result(self, result: tuple, tasks_queue: Queue, tasks_pending: dict, progress, progress_task,
+                       throughput: Throughput) -> int:
         """
-        Process all the PDF files in the input directory.
+        Process the status of a task sent back by a worker.
+
+        Args:
+            result: The task and its status.
+            tasks_queue: Queue of the tasks sent to the workers.
+            tasks_pending: Dictionary for the page tasks remaining for each file.
+            progress: Progress bar for displaying the progress of the run.
+            progress_task: Progress bar task counting the analysed files.
+            throughput: Throughput of the run.
+
+        Returns:
+            The number of new tasks sent to the workers.
         """
-        # Create a queue that each worker will join
-        queue = JoinableQueue(self.parallel)
-        # Start a pool of worker processes
-        with Pool(self.parallel, self.worker, (queue,)):
-            # Create progress bar
-            with Progress(SpinnerColumn(), "[progress.description]{task.description}", transient=True) as progress:
-                # Shared dictionary for task statuses
-                tasks_statuses = Manager().dict()
-                # Dictionary for tracking tasks' progress
-                tasks_progresses = dict()
-                for input_file in self.input_dir.glob('**/*.pdf'):
-                    # Add task to the progress bar
-                    if len(tasks_progresses) < self.parallel:
-                        tasks_progresses[input_file] = progress.add_task(input_file.resolve(), total=None)
-                    self.process_file(input_file, queue, progress, tasks_statuses, tasks_progresses)
-                self.print_tasks_statuses(tasks_statuses)
-            queue.join()
+        (kind, input_file, output_file_dir, *_), status = result
+        if status['status'] == PdfLanguageDetector.STATUS_SPLIT:
+            tasks_pending[input_file] = dict(remaining=len(status['page_tasks']), failed=False,
+                                             timings=status.get('timings'), averages=self.create_coeff_avgs(),
+                                             cache_key=status.get('cache_key'))
+            for pages in status['page_tasks']:
+                tasks_queue.put((PdfLanguageDetector.TASK_PAGES, input_file, output_file_dir, pages))
+            return len(status['page_tasks'])
+        if kind == PdfLanguageDetector.TASK_PAGES:
+            pending = tasks_pending[input_file]
+            pending['remaining'] -= 1
+            pending['failed'] = pending['failed'] or status['status'] == PdfLanguageDetector.STATUS_FAILED
+            pending['timings'] = StageTimings.merge(pending['timings'], status.get('timings'))
+            pending['averages'].merge(status.get('averages'))
+            if pending['remaining'] > 0:
+                return 0
+            del tasks_pending[input_file]
+            if not pending['failed']:
+                tasks_queue.put((PdfLanguageDetector.TASK_AGGREGATE, input_file, output_file_dir, None,
+                                 pending['timings'], pending['averages'].to_dict(), pending['cache_key']))
+                return 1
+            status = dict(status=PdfLanguageDetector.STATUS_FAILED)
+        self.complete_file(input_file, status, progress, progress_task, throughput)
+        return 0
 
-    def process_file(self, input_file, queue, progress, tasks_statuses, tasks_progresses):
+    def complete_file(self, input_file: Path, status: dict, progress, progress_task, throughput: Throughput):
         """
-        Process a single PDF file.
+        Report the final status of a PDF file.
 
         Args:
             input_file: Path to the input PDF file.
-            queue: JoinableQueue for worker processes.
-            progress: Progress bar for displaying task progress.
-            tasks_statuses: Shared dictionary for task statuses.
-            tasks_progresses: Dictionary for tracking tasks' progress.
+            status: The status of the file, with the detected language if any.
+            progress: Progress bar for displaying the progress of the run.
+            progress_task: Progress bar task counting the analysed files.
+            throughput: Throughput of the run.
         """
-        output_file_dir = self.get_output_dir(input_file)
-        queue.put((input_file, output_file_dir, tasks_statuses))
-        self.update_progress(progress, tasks_statuses, tasks_progresses)
+        if self.work_queue is not None:
+            self.work_queue.complete(input_file, status)
+        if self.run_metrics is not None:
+            self.run_metrics.add(status)
+        throughput.add(status.get('pages', 0))
+        progress.update(progress_task, advance=1)
+        self.print_task_status(input_file, status)
 
-    def update_progress(self, progress, tasks_statuses, tasks_progresses):
+    def finish_run(self, throughput: Throughput):
         """
-        Update the progress bar and print task statuses.
+        Print the throughput of the run and the time spent in each stage per PDF file,
+        and export the run metrics if a metrics file is set.
 
         Args:
-            progress: Progress bar for displaying task progress.
-            tasks_statuses: Shared dictionary for task statuses.
-            tasks_progresses: Dictionary for tracking tasks' progress.
+            throughput: Throughput of the run.
         """
-        for key in tasks_statuses.copy():
-            if key in tasks_progresses:
-                task = tasks_progresses.pop(key)
-                progress.remove_task(task)
-        self.print_tasks_statuses(tasks_statuses)
+        print(f"{throughput.docs} PDF files and {throughput.pages} pages analysed ({throughput})")
+        lines = self.run_metrics.timings.get_lines()
+        if lines:
+            print("Stage timings per PDF file:")
+            for line in lines:
+                print(f"  {line}")
+        if self.metrics_file is not None:
+            self.run_metrics.export()
 
-    def print_tasks_statuses(self, tasks_statuses):
+    def print_task_status(self, input_file: Path, task: dict):
         """
-        Print the statuses of completed tasks.
+        Print the status of an analysed PDF file.
 
         Args:
-            tasks_statuses: Shared dictionary for task statuses.
+            input_file: Path to the input PDF file.
+            task: The status of the file.
         """
-        for key in tasks_statuses.copy():
-            task = tasks_statuses.pop(key)
-            if task['status'] ==  PdfLanguageDetector.STATUS_DONE:
-                print(f"✓ {key.resolve()} [green]{task['lang']}[/green]")
-            elif task['status'] == PdfLanguageDetector.STATUS_SKIPPED:
-                print(f"→ {key.resolve()} [blue]SKIPPED[/blue]")
-            elif task['status'] == PdfLanguageDetector.STATUS_FAILED:
-                print(f"✕ {key.resolve()} [red]FAILED[/red]")
-            else:
-                print(f"? {key.resolve()} [orange]UNKNOWN[/orange]")
-                
+        if task['status'] ==  PdfLanguageDetector.STATUS_DONE:
+            print(f"✓ {input_file.resolve()} [green]{task['lang']}[/green]")
+        elif task['status'] == PdfLanguageDetector.STATUS_CACHED:
+            print(f"✓ {input_file.resolve()} [green]{task['lang']}[/green] [blue](CACHE HIT)[/blue]")
+        elif task['status'] == PdfLanguageDetector.STATUS_SKIPPED:
+            print(f"→ {input_file.resolve()} [blue]SKIPPED[/blue]")
+        elif task['status'] == PdfLanguageDetector.STATUS_FAILED:
+            print(f"✕ {input_file.resolve()} [red]FAILED[/red]")
+        else:
+            print(f"? {input_file.resolve()} [orange]UNKNOWN[/orange]")
+
+    def check_input_file(self, input_file: Path) -> Optional[dict]:
+        """
+        Check that the output directory of a PDF file can be built: the file must be
+        under relative_to. Files listed or claimed from elsewhere fail on their own,
+        without stopping the run.
+
+        Args:
+            input_file: Path to the input PDF file.
+
+        Returns:
+            A FAILED status with the error, or None if the file can be analysed.
+        """
+        try:
+            self.get_output_dir(input_file)
+        except ValueError:
+            return dict(status=PdfLanguageDetector.STATUS_FAILED,
+                        error=f"{input_file.resolve()} isn't under {self.relative_to}")
+        return None
+
     def get_output_dir(self, input_file: Path) -> Path:
         """
         Get the output directory path for a given input file.
@@ -305,9 +2619,51 @@ class PdfLanguageDetector:
         output_file_dir = self.output_dir / output_file_dir
         return output_file_dir
     
+    def get_page_name(self, page: int) -> str:
+        """
+        Get the name of a page, used to name its image, text and language files.
+
+        Args:
+            page: Page number (starting at 1).
+
+        Returns:
+            The name of the page.
+        """
+        return f'page-{page}'
+
+    def get_page_number(self, page_name: str) -> int:
+        """
+        Get the number of a page from its name, or from the name of an image
+        extracted by pdftoppm (zero-padded).
+
+        Args:
+            page_name: Name of the page.
+
+        Returns:
+            Page number (starting at 1), or 0 if the name has no number.
+        """
+        number = page_name.rsplit('-', 1)[-1]
+        return int(number) if number.isdigit() else 0
+
     def is_already_analyzed(self, output_file_dir: Path) -> bool:
+        # Documents completed according to the journal are skipped without checking their results
+        if self.journal is not None and self.journal.is_done(output_file_dir):
+            return True
+        if self.store is not None:
+            return self.store.get_avgs(output_file_dir) is not None
         return (output_file_dir / 'avgs.json').exists()
 
+    @property
+    def coeff_langs(self):
+        """
+        Get the list of languages used as keys of the language files
+        and coefficient averages.
+
+        Returns:
+            Languages as uppercase ISO 639-3 strings
+        """
+        return [lang.to_alpha3().upper() for lang in self.languages]
+
     @property
     def tesseract_langs(self):
         """
@@ -319,6 +2675,16 @@ class PdfLanguageDetector:
         """
         return [lang.to_alpha3(variant="T") for lang in self.languages]
 
+    @property
+    def languages_scripts(self):
+        """
+        Get the script each language is most likely written in.
+
+        Returns:
+            Scripts as ISO 15924 strings
+        """
+        return [lang.maximize().script for lang in self.languages]
+
     @property
     def lingua_langs(self):
         """
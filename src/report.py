@@ -1,13 +1,32 @@
+import csv
 import json
+import os
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 from spytula.builder import SpytulaBuilder
+from src.manifest import Manifest
+from src.store import DIRECTORY_STORE, SqliteStore
 from langcodes import Language
 from pathlib import Path
 from rich.progress import Progress, SpinnerColumn
 from typing import Optional, List
 
 class Report:
-    def __init__(self, report_file: Path, output_dir: Optional[Path] = 'out', report_format: Optional[str] = 'json'):
+    # Formats written record by record, without holding the whole report in memory
+    STREAM_FORMATS = ('json', 'jsonl', 'csv')
+    # Keys of each record, formatted in camel case in the report
+    RECORD_KEYS = ('lang', 'input_file', 'output_dir', 'lang_name')
+    # Files and directories of a valid output directory
+    OUTPUT_DIR_FILES = {'avgs.json', 'meta.json'}
+    OUTPUT_DIR_SUB_DIRS = {'langs', 'texts'}
+    # Directories with the pages of a PDF file, never containing other output directories
+    PAGES_DIRS = {'images', 'langs', 'texts'}
+
+    def __init__(self, report_file: Path, output_dir: Optional[Path] = 'out', report_format: Optional[str] = 'json',
+                 store: Optional[str] = DIRECTORY_STORE, threads: Optional[int] = 4,
+                 rescan: Optional[bool] = False):
         """
         Initialize the PdfLanguageDetector class.
 
@@ -15,10 +34,17 @@ class Report:
             report_file: Path to the report file.
             output_dir: Path to the output directory.
             report_format: Format of the report after reading information in the output dir.
+            store: Where results were saved by the detection (DIRECTORY_STORE or SqliteStore.STORE_NAME).
+            threads: Number of threads reading the files of output directories.
+            rescan: Walk the output directory even if it has a manifest.
         """
         self.report_file = report_file
         self.output_dir = output_dir
         self.report_format = report_format.lower()
+        self.store = SqliteStore.from_output_dir(output_dir) if store == SqliteStore.STORE_NAME else None
+        self.threads = threads
+        self.rescan = rescan
+        self.manifest = Manifest.from_output_dir(output_dir)
 
     def fetch_reports(self):
         """
@@ -34,18 +60,50 @@ class Report:
         # Initialize a progress bar.
         with Progress(SpinnerColumn(), "[progress.description]{task.description}", transient=True) as progress:
             task = progress.add_task('Fetching reports...', total=None)            
-            # Loop through each directory in the output directory path.
-            for output_dir in self.get_reports_dirs():
-                # Check if the current directory is a valid output directory.
-                if self.is_valid_output_dir(output_dir):
-                    # If the directory is valid, get the report and append it to the list.
-                    report = self.get_output_dir_report(output_dir)
-                    output_dir_reports.append(report)
-                    count_reports = len(output_dir_reports)
-                    # Update the progress bar.
-                    progress.update(task, advance=1, description=f'Fetching reports... ({count_reports} done)')
+            # Loop through the report of each analysed document.
+            for report in self.get_reports():
+                output_dir_reports.append(report)
+                count_reports = len(output_dir_reports)
+                # Update the progress bar.
+                progress.update(task, advance=1, description=f'Fetching reports... ({count_reports} done)')
         return output_dir_reports
 
+    def get_reports(self):
+        """
+        Iterate over the report of each analysed document, from the results
+        store if any, from the manifest written during the detection, or
+        from all valid output directories.
+
+        :return: Iterator of reports
+        """
+        if self.store is not None:
+            for meta, coeff_avgs in self.store.get_documents():
+                lang = max(coeff_avgs, key=coeff_avgs.get)
+                yield dict(lang=lang, **meta)
+            return
+        if not self.rescan and self.manifest.exists():
+            yield from self.manifest.read()
+            return
+        # Read the files of each valid output directory in a pool of threads.
+        yield from self.map_output_dir_reports(self.get_reports_dirs())
+
+    def map_output_dir_reports(self, output_dirs):
+        """
+        Get the report of output directories using a pool of threads, keeping
+        the order of the directories and a bounded number of pending reports.
+
+        :param output_dirs: Iterator of valid output directories
+        :return: Iterator of reports
+        """
+        with ThreadPoolExecutor(self.threads) as executor:
+            futures = deque()
+            for output_dir in output_dirs:
+                futures.append(executor.submit(self.get_output_dir_report, output_dir))
+                if len(futures) >= self.threads * 4:
+                    yield futures.popleft().result()
+            while futures:
+                yield futures.popleft().result()
+
     def write_report(self, output_dir_reports):
         """
         Write the report data to the report file.
@@ -74,11 +132,96 @@ class Report:
 
         :return: None
         """
+        # Formats which can be streamed are written as reports are fetched
+        if self.report_format in Report.STREAM_FORMATS:
+            return self.stream_report()
         # Fetch the reports from all valid output directories.
         output_dir_reports = self.fetch_reports()
         # Write the fetched reports into the file.
         self.write_report(output_dir_reports)
 
+    def stream_report(self):
+        """
+        Write each report to the report file as soon as it is fetched, so memory
+        doesn't grow with the number of reports.
+
+        :return: None
+        """
+        count_reports = 0
+        with self.report_file.open("w", encoding="UTF-8", newline='') as report_file:
+            with Progress(SpinnerColumn(), "[progress.description]{task.description}", transient=True) as progress:
+                task = progress.add_task('Writing reports...', total=None)
+                for record in self.stream_records(self.get_reports()):
+                    self.write_record(report_file, record, count_reports)
+                    count_reports += 1
+                    progress.update(task, advance=1, description=f'Writing reports... ({count_reports} done)')
+            self.write_record_end(report_file, count_reports)
+        print(f"✓ {count_reports} report{'s'[:count_reports^1]} written to {self.report_file}")
+
+    def stream_records(self, reports):
+        """
+        Convert reports to the records written in the report file.
+
+        :param reports: Iterator of reports
+        :return: Iterator of records, with keys in camel case
+        """
+        for report in reports:
+            lang_name = Language.get(report['lang']).display_name().upper()
+            report = dict(report, lang_name=lang_name)
+            yield {self.camelize(key): report.get(key) for key in Report.RECORD_KEYS}
+
+    def write_record(self, report_file, record: dict, index: int):
+        """
+        Write a record to the report file in the report format.
+
+        :param report_file: Report file opened for writing
+        :param record: Record to write
+        :param index: Position of the record in the report
+        :return: None
+        """
+        if self.report_format == 'json':
+            # Same indentation as a JSON array dumped at once
+            lines = json.dumps(record, indent=2).splitlines()
+            report_file.write('[\n' if index == 0 else ',\n')
+            report_file.write('\n'.join('  ' + line for line in lines))
+        elif self.report_format == 'jsonl':
+            report_file.write(json.dumps(record) + '\n')
+        elif self.report_format == 'csv':
+            writer = csv.DictWriter(report_file, fieldnames=list(record))
+            if index == 0:
+                writer.writeheader()
+            writer.writerow(record)
+        else:
+            raise NotImplementedError('This format is not supported yet.')
+
+    def write_record_end(self, report_file, count_records: int):
+        """
+        Close the report file content after the last record.
+
+        :param report_file: Report file opened for writing
+        :param count_records: Number of records written
+        :return: None
+        """
+        if self.report_format == 'json':
+            report_file.write('\n]' if count_records else '[]')
+        elif self.report_format == 'csv' and not count_records:
+            fieldnames = [self.camelize(key) for key in Report.RECORD_KEYS]
+            csv.DictWriter(report_file, fieldnames=fieldnames).writeheader()
+
+    @staticmethod
+    def camelize(key: str) -> str:
+        """
+        Format a snake case key in camel case, as it's the standard in Javascript.
+
+        Args:
+            key: Key in snake case.
+
+        Returns:
+            The key in camel case.
+        """
+        first, *others = key.split('_')
+        return first + ''.join(other.capitalize() for other in others)
+
 
     def get_output_dir_report(self, output_dir) -> dict:
         """
@@ -97,12 +240,40 @@ class Report:
     
     def get_reports_dirs(self):
         """
-        Returns a list of all reports dirs in the output_dir.
+        Returns all valid reports dirs in the output_dir, sorted by path.
 
         Returns:
-            A list of all reports dirs in the output_dir.
+            An iterator of all valid reports dirs in the output_dir.
         """
-        return self.output_dir.glob('*/**/')
+        return self.walk_reports_dirs(Path(self.output_dir), is_root=True)
+
+    def walk_reports_dirs(self, directory: Path, is_root: bool = False):
+        """
+        Walk a directory with a single scandir call per directory. Valid output
+        directories are recognised from the directory entries, and their pages
+        directories are not walked. Symbolic links to directories aren't followed,
+        so a link cycle can't make the walk loop.
+
+        Args:
+            directory: Directory to walk.
+            is_root: True if the directory is the output_dir itself.
+
+        Returns:
+            An iterator of all valid reports dirs in the directory.
+        """
+        files, sub_dirs = set(), []
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    sub_dirs.append(entry.name)
+                elif entry.is_file():
+                    files.add(entry.name)
+        is_output_dir = not is_root and Report.OUTPUT_DIR_FILES <= files and Report.OUTPUT_DIR_SUB_DIRS <= set(sub_dirs)
+        if is_output_dir:
+            yield directory
+        for name in sorted(sub_dirs):
+            if not (is_output_dir and name in Report.PAGES_DIRS):
+                yield from self.walk_reports_dirs(directory / name)
         
     def get_coeff_avgs(self, output_dir: Path) -> dict:
         """
@@ -130,10 +301,11 @@ class Report:
             A dictionary with the metadata.
         """
         meta_file = output_dir / 'meta.json'
-        if not meta_file.exists():
+        try:
+            with meta_file.open(encoding="UTF-8") as source:
+                return json.load(source)
+        except FileNotFoundError:
             return dict()
-        with meta_file.open(encoding="UTF-8") as source:
-            return json.load(source)
         
     def get_output(self, output_dirs: List[dict]):
         """
@@ -174,17 +346,4 @@ class Report:
             report_builder.attribute('lang_name', lang_name)
         return builder
 
-    def is_valid_output_dir(self, output_dir) -> bool:
-        """
-        Checks if an output directory is valid.
-
-        Args:
-            output_dir: Output directory to check.
-
-        Returns:
-            True if the output directory is valid, False otherwise.
-        """
-        sub_dirs = [output_dir / 'images', output_dir / 'langs', output_dir / 'texts']
-        sub_files = [output_dir / 'avgs.json', output_dir / 'meta.json']
-        return all(d.is_dir() for d in sub_dirs) and all(d.is_file() for d in sub_files)
         
\ No newline at end of file
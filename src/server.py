@@ -0,0 +1,267 @@
+import itertools
+import json
+import os
+import queue
+import socketserver
+import threading
+
+from concurrent.futures import Future, TimeoutError
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing import Pool, Queue
+from pathlib import Path
+from typing import Iterator, List, Optional
+from urllib.parse import urlsplit
+
+from src.api import Document, InMemoryDetector
+from src.pld import PdfLanguageDetector
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def server_bind(self):
+        # A socket left by a previous server would prevent binding
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+        socketserver.UnixStreamServer.server_bind(self)
+
+
+class DetectionRequestHandler(BaseHTTPRequestHandler):
+    """
+    Handle the requests of the detection server:
+
+    - POST /detect with the content of a PDF file, or a JSON object with its path
+      ({"path": "..."}), returns the result of its analysis (see InMemoryDetector.detect),
+      or a 504 error if it takes longer than the request timeout of the server;
+    - GET /health returns the number of workers and of requests pending.
+    """
+    # Larger uploads are rejected before being read
+    MAX_UPLOAD_SIZE = 100 * 1024 * 1024
+
+    def do_GET(self):
+        if urlsplit(self.path).path != '/health':
+            return self.send_json(404, dict(error='Not found'))
+        self.send_json(200, self.server.detection_server.get_health())
+
+    def do_POST(self):
+        if urlsplit(self.path).path != '/detect':
+            return self.send_json(404, dict(error='Not found'))
+        length = int(self.headers.get('Content-Length', 0))
+        if length == 0:
+            return self.send_json(400, dict(error='The request has no PDF file'))
+        if length > self.MAX_UPLOAD_SIZE:
+            return self.send_json(413, dict(error=f'PDF files are limited to {self.MAX_UPLOAD_SIZE} bytes'))
+        body = self.rfile.read(length)
+        document = body
+        if self.headers.get_content_type() == 'application/json':
+            try:
+                document = Path(json.loads(body)['path'])
+            except (ValueError, KeyError, TypeError):
+                return self.send_json(400, dict(error='The JSON object must have the path of a PDF file'))
+        try:
+            future = self.server.detection_server.submit(document)
+        except queue.Full:
+            return self.send_json(503, dict(error='Too many requests pending, retry later'),
+                                  {'Retry-After': str(DetectionServer.RETRY_AFTER)})
+        try:
+            result = future.result(self.server.detection_server.request_timeout)
+        except TimeoutError:
+            # The worker may have died: its result would never come
+            self.server.detection_server.forget(future)
+            return self.send_json(504, dict(error='The PDF file was not analysed in time'))
+        self.send_json(200 if result['status'] == PdfLanguageDetector.STATUS_DONE else 422, result)
+
+    def send_json(self, code: int, content: dict, headers: Optional[dict] = None):
+        """
+        Send a JSON response.
+
+        Args:
+            code: HTTP status code.
+            content: Content of the response, serializable in JSON.
+            headers: Additional headers of the response.
+        """
+        body = json.dumps(content).encode('UTF-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or dict()).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self) -> str:
+        # Clients of a Unix socket have no address
+        return self.client_address[0] if self.client_address else 'unix'
+
+
+class DetectionServer:
+    # Seconds clients are asked to wait when too many requests are pending
+    RETRY_AFTER = 1
+
+    def __init__(self, languages: List[str], max_pages: int = 5, workers: int = 1, queue_size: int = 16,
+                 batch_size: int = 1, request_timeout: float = 600, **options):
+        """
+        Initialize the DetectionServer class, a long-running server analysing the PDF
+        files of its requests with a pool of workers, each keeping the Lingua model
+        and the OCR engine loaded between requests.
+
+        Args:
+            languages: List of ISO3 language codes.
+            max_pages: Maximum number of pages to process per PDF file.
+            workers: Number of worker processes.
+            queue_size: Maximum number of requests waiting for a worker. Requests
+                received when the queue is full are rejected.
+            batch_size: Maximum number of waiting requests taken at once by a worker, which
+                analyses them one after the other.
+            request_timeout: Seconds a request waits for its result before getting an error.
+            **options: Options of PdfLanguageDetector (see InMemoryDetector.OPTIONS).
+
+        Raises:
+            ValueError: If an option isn't one of InMemoryDetector.OPTIONS.
+        """
+        for name in options:
+            if name not in InMemoryDetector.OPTIONS:
+                raise ValueError(f"{name} can't be used in memory, options are: {', '.join(InMemoryDetector.OPTIONS)}")
+        self.languages = languages
+        self.max_pages = max_pages
+        self.workers = workers
+        self.batch_size = batch_size
+        self.request_timeout = request_timeout
+        self.options = options
+        self.tasks_queue = Queue(queue_size)
+        self.results_queue = Queue()
+        self.futures = dict()
+        self.lock = threading.Lock()
+        self.counter = itertools.count(1)
+
+    def worker(self):
+        detector = InMemoryDetector(self.languages, self.max_pages, **self.options)
+        while True:
+            tasks = [self.tasks_queue.get()]
+            # Take the requests already waiting, up to batch_size, without waiting for more.
+            # They are analysed one after the other, by the same detector
+            while len(tasks) < self.batch_size:
+                try:
+                    tasks.append(self.tasks_queue.get_nowait())
+                except queue.Empty:
+                    break
+            results = detector.detect_batch(document for _, document in tasks)
+            for (request_id, _), result in zip(tasks, results):
+                self.results_queue.put((request_id, result))
+
+    def submit(self, document: Document) -> Future:
+        """
+        Send a PDF file to the workers.
+
+        Args:
+            document: Path or content of the PDF file.
+
+        Returns:
+            A future of the result of the analysis.
+
+        Raises:
+            queue.Full: If queue_size requests are already waiting for a worker.
+        """
+        request_id = next(self.counter)
+        future = Future()
+        with self.lock:
+            self.futures[request_id] = future
+        try:
+            self.tasks_queue.put_nowait((request_id, document))
+        except queue.Full:
+            with self.lock:
+                del self.futures[request_id]
+            raise
+        return future
+
+    def forget(self, future: Future):
+        """
+        Stop waiting for the result of a request, given up by its client.
+
+        Args:
+            future: The future of the request, returned by submit.
+        """
+        with self.lock:
+            for request_id, pending in list(self.futures.items()):
+                if pending is future:
+                    del self.futures[request_id]
+
+    def dispatch_results(self):
+        """
+        Set the results sent back by the workers to the futures of their requests,
+        until a None request id is received.
+        """
+        while True:
+            request_id, result = self.results_queue.get()
+            if request_id is None:
+                return
+            with self.lock:
+                future = self.futures.pop(request_id, None)
+            # Requests which timed out were forgotten
+            if future is not None:
+                future.set_result(result)
+
+    def get_health(self) -> dict:
+        """
+        Get the state of the server.
+
+        Returns:
+            The number of workers, and of requests waiting for a worker or being analysed.
+        """
+        with self.lock:
+            pending = len(self.futures)
+        return dict(status='ok', workers=self.workers, pending=pending)
+
+    @contextmanager
+    def start(self) -> Iterator['DetectionServer']:
+        """
+        Start the workers, and the thread dispatching their results.
+
+        Returns:
+            A context manager stopping them on exit.
+        """
+        with Pool(self.workers, self.worker):
+            dispatcher = threading.Thread(target=self.dispatch_results, daemon=True)
+            dispatcher.start()
+            try:
+                yield self
+            finally:
+                self.results_queue.put((None, None))
+                dispatcher.join()
+
+    def create_http_server(self, host: str = '127.0.0.1', port: int = 8000,
+                           socket_path: Optional[Path] = None) -> socketserver.BaseServer:
+        """
+        Create the HTTP server receiving the requests, on a TCP port or a Unix socket.
+
+        Args:
+            host: Host the server listens on.
+            port: Port the server listens on.
+            socket_path: Path to a Unix socket to listen on instead of the host and port.
+
+        Returns:
+            The HTTP server, one thread per request.
+        """
+        if socket_path is None:
+            http_server = ThreadingHTTPServer((host, port), DetectionRequestHandler)
+        else:
+            http_server = UnixHTTPServer(str(socket_path), DetectionRequestHandler)
+        http_server.detection_server = self
+        return http_server
+
+    def serve(self, host: str = '127.0.0.1', port: int = 8000, socket_path: Optional[Path] = None):
+        """
+        Serve requests until interrupted.
+
+        Args:
+            host: Host the server listens on.
+            port: Port the server listens on.
+            socket_path: Path to a Unix socket to listen on instead of the host and port.
+        """
+        with self.start(), self.create_http_server(host, port, socket_path) as http_server:
+            address = socket_path if socket_path is not None else f'http://{host}:{http_server.server_address[1]}'
+            print(f"Serving on {address} with {self.workers} workers")
+            try:
+                http_server.serve_forever()
+            except KeyboardInterrupt:
+                pass
@@ -0,0 +1,261 @@
+import json
+import sqlite3
+
+from pathlib import Path
+from typing import Iterator, Optional, List
+
+# Default store: one directory per document in the output directory
+DIRECTORY_STORE = 'dirs'
+
+def get_page_order(page_name: str) -> tuple:
+    """
+    Get the sort key of a page, by number rather than by name, so page-2 comes before page-10.
+
+    Args:
+        page_name: Name of the page, such as page-2.
+
+    Returns:
+        The page number (0 if the name has no number) and the name of the page.
+    """
+    number = page_name.rsplit('-', 1)[-1]
+    return int(number) if number.isdigit() else 0, page_name
+
+class SqliteStore:
+    STORE_NAME = 'sqlite'
+    STORE_FILE = 'results.sqlite'
+
+    def __init__(self, store_file: Path):
+        """
+        Initialize the SqliteStore class, a single database with the results of
+        every document and page, used instead of the output directory layout.
+
+        Args:
+            store_file: Path to the SQLite database file.
+        """
+        self.store_file = store_file
+        self._connection = None
+
+    def __getstate__(self):
+        # SQLite connections can't be shared between processes: each
+        # worker process opens its own connection.
+        return dict(self.__dict__, _connection=None)
+
+    @classmethod
+    def from_output_dir(cls, output_dir: Path) -> 'SqliteStore':
+        """
+        Get the store saved in an output directory.
+
+        Args:
+            output_dir: Path to the output directory.
+
+        Returns:
+            A SqliteStore instance.
+        """
+        return cls(Path(output_dir) / cls.STORE_FILE)
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """
+        Get the connection to the database, creating it on first use.
+
+        Returns:
+            A sqlite3.Connection instance.
+        """
+        if self._connection is None:
+            self.store_file.parent.mkdir(parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(str(self.store_file), timeout=60)
+            # Let readers and writers from several processes work concurrently
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute('PRAGMA synchronous=NORMAL')
+            self._connection.execute('CREATE TABLE IF NOT EXISTS documents ('
+                                     'output_dir TEXT PRIMARY KEY, meta TEXT NOT NULL, avgs TEXT)')
+            self._connection.execute('CREATE TABLE IF NOT EXISTS pages ('
+                                     'output_dir TEXT NOT NULL, page TEXT NOT NULL, text TEXT NOT NULL, langs TEXT NOT NULL, '
+                                     'PRIMARY KEY (output_dir, page))')
+            self._connection.commit()
+        return self._connection
+
+    def get_key(self, output_file_dir: Path) -> str:
+        """
+        Get the key of a document, its output directory as if it was written on disk.
+
+        Args:
+            output_file_dir: Directory of the analysis results.
+
+        Returns:
+            The key of the document.
+        """
+        return str(Path(output_file_dir).resolve())
+
+    def save_meta(self, output_file_dir: Path, meta: dict):
+        """
+        Save the metadata of a document. Writes are committed with commit().
+
+        Args:
+            output_file_dir: Directory of the analysis results.
+            meta: Metadata of the document.
+        """
+        self.connection.execute('INSERT INTO documents (output_dir, meta) VALUES (?, ?) '
+                                'ON CONFLICT (output_dir) DO UPDATE SET meta = excluded.meta',
+                                (self.get_key(output_file_dir), json.dumps(meta)))
+
+    def get_meta(self, output_file_dir: Path) -> dict:
+        """
+        Get the metadata of a document.
+
+        Args:
+            output_file_dir: Directory of the analysis results.
+
+        Returns:
+            The metadata, empty if the document is unknown.
+        """
+        row = self.connection.execute('SELECT meta FROM documents WHERE output_dir = ?',
+                                      (self.get_key(output_file_dir),)).fetchone()
+        return dict() if row is None else json.loads(row[0])
+
+    def update_meta(self, output_file_dir: Path, values: dict):
+        """
+        Add values to the metadata of a document.
+
+        Args:
+            output_file_dir: Directory of the analysis results.
+            values: Values to add to the metadata.
+        """
+        meta = self.get_meta(output_file_dir)
+        meta.update(values)
+        self.save_meta(output_file_dir, meta)
+
+    def save_page(self, output_file_dir: Path, page_name: str, text: str, langs: dict):
+        """
+        Save the text and language information of a page.
+
+        Args:
+            output_file_dir: Directory of the analysis results.
+            page_name: Name of the page.
+            text: Text of the page.
+            langs: Language information of the page.
+        """
+        self.connection.execute('INSERT OR REPLACE INTO pages (output_dir, page, text, langs) VALUES (?, ?, ?, ?)',
+                                (self.get_key(output_file_dir), page_name, text, json.dumps(langs)))
+
+    def get_pages(self, output_file_dir: Path) -> List[dict]:
+        """
+        Get the pages saved for a document.
+
+        Args:
+            output_file_dir: Directory of the analysis results.
+
+        Returns:
+            A list of dictionaries with the name, text and language information of each page,
+            in the order of the pages.
+        """
+        rows = self.connection.execute('SELECT page, text, langs FROM pages WHERE output_dir = ?',
+                                       (self.get_key(output_file_dir),))
+        pages = [dict(name=page, text=text, langs=json.loads(langs)) for page, text, langs in rows]
+        return sorted(pages, key=lambda page: get_page_order(page['name']))
+
+    def save_avgs(self, output_file_dir: Path, avgs: dict):
+        """
+        Save the language averages of a document.
+
+        Args:
+            output_file_dir: Directory of the analysis results.
+            avgs: Average coefficient of each language.
+        """
+        self.connection.execute('UPDATE documents SET avgs = ? WHERE output_dir = ?',
+                                (json.dumps(avgs), self.get_key(output_file_dir)))
+
+    def get_avgs(self, output_file_dir: Path) -> Optional[dict]:
+        """
+        Get the language averages of a document.
+
+        Args:
+            output_file_dir: Directory of the analysis results.
+
+        Returns:
+            The average coefficient of each language, or None if not computed yet.
+        """
+        row = self.connection.execute('SELECT avgs FROM documents WHERE output_dir = ?',
+                                      (self.get_key(output_file_dir),)).fetchone()
+        return None if row is None or row[0] is None else json.loads(row[0])
+
+    def get_documents(self) -> Iterator[tuple]:
+        """
+        Iterate over the documents with language averages, in a deterministic order.
+
+        Returns:
+            An iterator of (meta, avgs) tuples.
+        """
+        rows = self.connection.execute('SELECT meta, avgs FROM documents WHERE avgs IS NOT NULL ORDER BY output_dir')
+        for meta, avgs in rows:
+            yield json.loads(meta), json.loads(avgs)
+
+    def commit(self):
+        """
+        Commit the pending writes in a single transaction.
+        """
+        self.connection.commit()
+
+
+
+class MemoryStore:
+    STORE_NAME = 'memory'
+
+    def __init__(self):
+        """
+        Initialize the MemoryStore class, the results of documents kept in memory
+        by a detector embedded in another program, without an output directory.
+        It has the interface of SqliteStore, and documents are identified by their
+        output directory as well, without touching the file system.
+        """
+        self.documents = dict()
+
+    def get_key(self, output_file_dir: Path) -> str:
+        return str(output_file_dir)
+
+    def get_document(self, output_file_dir: Path) -> dict:
+        return self.documents.setdefault(self.get_key(output_file_dir), dict(meta=dict(), avgs=None, pages=dict()))
+
+    def save_meta(self, output_file_dir: Path, meta: dict):
+        self.get_document(output_file_dir)['meta'] = dict(meta)
+
+    def get_meta(self, output_file_dir: Path) -> dict:
+        return dict(self.get_document(output_file_dir)['meta'])
+
+    def update_meta(self, output_file_dir: Path, values: dict):
+        self.get_document(output_file_dir)['meta'].update(values)
+
+    def save_page(self, output_file_dir: Path, page_name: str, text: str, langs: dict):
+        self.get_document(output_file_dir)['pages'][page_name] = dict(name=page_name, text=text, langs=langs)
+
+    def get_pages(self, output_file_dir: Path) -> List[dict]:
+        # Same order as SqliteStore
+        pages = self.get_document(output_file_dir)['pages']
+        return [pages[page_name] for page_name in sorted(pages, key=get_page_order)]
+
+    def save_avgs(self, output_file_dir: Path, avgs: dict):
+        self.get_document(output_file_dir)['avgs'] = avgs
+
+    def get_avgs(self, output_file_dir: Path) -> Optional[dict]:
+        return self.get_document(output_file_dir)['avgs']
+
+    def get_documents(self) -> Iterator[tuple]:
+        for key in sorted(self.documents):
+            document = self.documents[key]
+            if document['avgs'] is not None:
+                yield document['meta'], document['avgs']
+
+    def delete(self, output_file_dir: Path):
+        """
+        Forget the results of a document.
+
+        Args:
+            output_file_dir: Directory of the analysis results, identifying the document.
+        """
+        self.documents.pop(self.get_key(output_file_dir), None)
+
+    def commit(self):
+        pass
+
+
+STORES = (DIRECTORY_STORE, SqliteStore.STORE_NAME)
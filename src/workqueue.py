@@ -0,0 +1,403 @@
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import time
+
+from contextlib import contextmanager
+from pathlib import Path
+from rich import print
+from src.manifest import Manifest
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+class WorkQueue:
+    """
+    Base class for the queues of PDF files shared by several pld nodes. Files
+    are claimed with a lease: a file whose lease expired (e.g. because its node
+    died) can be claimed again by another node.
+    """
+    BACKEND_NAME = None
+    STATE_PENDING = 'PENDING'
+    STATE_CLAIMED = 'CLAIMED'
+    STATE_DONE = 'DONE'
+    STATE_FAILED = 'FAILED'
+    # Seconds a claimed file is reserved to its node
+    LEASE_DURATION = 600
+    # Seconds between two checks for files to claim when all are claimed by other nodes
+    POLL_INTERVAL = 5
+
+    def __init__(self, location: Path, lease_duration: Optional[float] = LEASE_DURATION):
+        """
+        Args:
+            location: Path to the queue, shared by all the nodes.
+            lease_duration: Seconds a claimed file is reserved to its node.
+        """
+        self.location = location
+        self.lease_duration = lease_duration
+        # Identify this node and process in the queue
+        self.worker = f'{socket.gethostname()}:{os.getpid()}'
+        # Files claimed by this node and not completed yet
+        self.claims = set()
+        self.renewed_at = time.monotonic()
+
+    def put(self, input_files: Iterable[Path]) -> int:
+        """
+        Add PDF files to the queue. Files already in the queue are ignored.
+
+        Args:
+            input_files: Paths to PDF files.
+
+        Returns:
+            The number of files added.
+        """
+        raise NotImplementedError()
+
+    def claim(self) -> Optional[Path]:
+        """
+        Claim a pending PDF file, or a file whose lease expired.
+
+        Returns:
+            The path to the claimed PDF file, or None if there is none to claim.
+        """
+        raise NotImplementedError()
+
+    def renew(self, input_files: List[Path]):
+        """
+        Extend the lease of PDF files claimed by this node.
+
+        Args:
+            input_files: Paths to the claimed PDF files.
+        """
+        raise NotImplementedError()
+
+    def complete(self, input_file: Path, status: dict):
+        """
+        Mark a claimed PDF file as done (or failed) and report its status.
+
+        Args:
+            input_file: Path to the claimed PDF file.
+            status: The status of the file, with the detected language if any.
+        """
+        raise NotImplementedError()
+
+    def get_counts(self) -> dict:
+        """
+        Count the PDF files in each state.
+
+        Returns:
+            The number of files by state.
+        """
+        raise NotImplementedError()
+
+    def get_results(self, cursor: int = 0) -> Tuple[List[dict], int]:
+        """
+        Get the statuses reported since a cursor.
+
+        Args:
+            cursor: Cursor returned by the previous call, 0 to get all the statuses.
+
+        Returns:
+            A list of statuses, with the path to their file as input_file, and the next cursor.
+        """
+        raise NotImplementedError()
+
+    def renew_claims(self):
+        """
+        Extend the lease of the files claimed by this node, if a third of the
+        lease elapsed since the last renewal.
+        """
+        if self.claims and time.monotonic() - self.renewed_at >= self.lease_duration / 3:
+            self.renew(list(self.claims))
+            self.renewed_at = time.monotonic()
+
+    def is_finished(self) -> bool:
+        """
+        Check if all the PDF files of the queue are done or failed.
+        """
+        counts = self.get_counts()
+        return counts[self.STATE_PENDING] == 0 and counts[self.STATE_CLAIMED] == 0
+
+    def get_state(self, status: dict) -> str:
+        """
+        Get the state of a completed PDF file from its status.
+        """
+        return self.STATE_FAILED if status['status'].strip() == self.STATE_FAILED else self.STATE_DONE
+
+
+class SqliteWorkQueue(WorkQueue):
+    """
+    Queue saved in a SQLite database. Claims are serialized by the database lock.
+    """
+    BACKEND_NAME = 'sqlite'
+
+    def __init__(self, location: Path, lease_duration: Optional[float] = WorkQueue.LEASE_DURATION):
+        super().__init__(location, lease_duration)
+        self._connection = None
+
+    def __getstate__(self):
+        # SQLite connections can't be shared between processes: each
+        # process opens its own connection.
+        return dict(self.__dict__, _connection=None)
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """
+        Get the connection to the database, creating it on first use.
+
+        Returns:
+            A sqlite3.Connection instance.
+        """
+        if self._connection is None:
+            self.location.parent.mkdir(parents=True, exist_ok=True)
+            # Transactions are explicit to take the write lock before reading the file to claim
+            self._connection = sqlite3.connect(str(self.location), timeout=60, isolation_level=None)
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute('CREATE TABLE IF NOT EXISTS tasks ('
+                                     'input_file TEXT PRIMARY KEY, state TEXT NOT NULL, worker TEXT, lease_expires REAL)')
+            self._connection.execute('CREATE INDEX IF NOT EXISTS tasks_state ON tasks (state, lease_expires)')
+            self._connection.execute('CREATE TABLE IF NOT EXISTS results ('
+                                     'id INTEGER PRIMARY KEY AUTOINCREMENT, input_file TEXT NOT NULL, status TEXT NOT NULL)')
+        return self._connection
+
+    def put(self, input_files: Iterable[Path]) -> int:
+        with self.transaction():
+            cursor = self.connection.executemany('INSERT OR IGNORE INTO tasks (input_file, state) VALUES (?, ?)',
+                                                 ((str(input_file.resolve()), self.STATE_PENDING) for input_file in input_files))
+            return cursor.rowcount
+
+    def claim(self) -> Optional[Path]:
+        now = time.time()
+        with self.transaction():
+            row = self.connection.execute('SELECT input_file FROM tasks WHERE state = ? OR (state = ? AND lease_expires < ?) LIMIT 1',
+                                          (self.STATE_PENDING, self.STATE_CLAIMED, now)).fetchone()
+            if row is None:
+                return None
+            self.connection.execute('UPDATE tasks SET state = ?, worker = ?, lease_expires = ? WHERE input_file = ?',
+                                    (self.STATE_CLAIMED, self.worker, now + self.lease_duration, row[0]))
+        input_file = Path(row[0])
+        self.claims.add(input_file)
+        return input_file
+
+    def renew(self, input_files: List[Path]):
+        lease_expires = time.time() + self.lease_duration
+        with self.transaction():
+            self.connection.executemany('UPDATE tasks SET lease_expires = ? WHERE input_file = ? AND worker = ? AND state = ?',
+                                        ((lease_expires, str(input_file), self.worker, self.STATE_CLAIMED) for input_file in input_files))
+
+    def complete(self, input_file: Path, status: dict):
+        with self.transaction():
+            self.connection.execute('UPDATE tasks SET state = ?, lease_expires = NULL WHERE input_file = ?',
+                                    (self.get_state(status), str(input_file)))
+            self.connection.execute('INSERT INTO results (input_file, status) VALUES (?, ?)',
+                                    (str(input_file), json.dumps(status)))
+        self.claims.discard(input_file)
+
+    def get_counts(self) -> dict:
+        counts = dict.fromkeys((self.STATE_PENDING, self.STATE_CLAIMED, self.STATE_DONE, self.STATE_FAILED), 0)
+        for state, count in self.connection.execute('SELECT state, COUNT(*) FROM tasks GROUP BY state'):
+            counts[state] = count
+        return counts
+
+    def get_results(self, cursor: int = 0) -> Tuple[List[dict], int]:
+        rows = self.connection.execute('SELECT id, input_file, status FROM results WHERE id > ? ORDER BY id', (cursor,)).fetchall()
+        results = [dict(json.loads(status), input_file=input_file) for _, input_file, status in rows]
+        return results, rows[-1][0] if rows else cursor
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """
+        Open a transaction holding the write lock of the database, committed
+        at the end of the block or rolled back on errors.
+
+        Returns:
+            The connection to the database.
+        """
+        self.connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield self.connection
+        except BaseException:
+            self.connection.execute('ROLLBACK')
+            raise
+        self.connection.execute('COMMIT')
+
+
+class FilesystemWorkQueue(WorkQueue):
+    """
+    Queue saved in a directory, with one file per PDF file in a directory per
+    state. Files are claimed by renaming them, which only one node can do, and
+    their lease expires with their modification time.
+    """
+    BACKEND_NAME = 'fs'
+    RESULTS_FILE = 'results.jsonl'
+
+    def put(self, input_files: Iterable[Path]) -> int:
+        self.create_state_directories()
+        count = 0
+        for input_file in input_files:
+            input_file = input_file.resolve()
+            task_name = self.get_task_name(input_file)
+            states = (self.STATE_PENDING, self.STATE_CLAIMED, self.STATE_DONE, self.STATE_FAILED)
+            if any(self.get_task_file(state, task_name).exists() for state in states):
+                continue
+            # Write the task aside, then move it in place so it's never claimed half written
+            temporary_file = self.location / f'.{task_name}'
+            temporary_file.write_text(json.dumps(dict(input_file=str(input_file))), encoding="UTF-8")
+            os.rename(temporary_file, self.get_task_file(self.STATE_PENDING, task_name))
+            count += 1
+        return count
+
+    def claim(self) -> Optional[Path]:
+        self.create_state_directories()
+        for state in (self.STATE_PENDING, self.STATE_CLAIMED):
+            expired_before = time.time() - self.lease_duration
+            with os.scandir(self.get_state_dir(state)) as entries:
+                for entry in entries:
+                    # Tasks being claimed by another node have a suffix
+                    if not entry.name.endswith('.json'):
+                        continue
+                    if state == self.STATE_CLAIMED:
+                        # Cached by scandir: checked again once the task is moved aside
+                        try:
+                            seen = entry.stat()
+                        except FileNotFoundError:
+                            continue
+                        if seen.st_mtime >= expired_before:
+                            continue
+                    claimed_file = self.get_task_file(self.STATE_CLAIMED, entry.name)
+                    # Only one node can rename the task: it's moved aside under a name
+                    # unique to this node, so a claimed task can be claimed again
+                    claiming_file = f'{claimed_file}.{self.worker}'
+                    try:
+                        os.rename(entry.path, claiming_file)
+                    except FileNotFoundError:
+                        # Claimed by another node in the meantime
+                        continue
+                    # Another node may have claimed the expired task again, or its node renewed
+                    # it, since it was listed: the task is put back unless it is unchanged
+                    if state == self.STATE_CLAIMED and os.stat(claiming_file).st_mtime_ns != seen.st_mtime_ns:
+                        os.rename(claiming_file, entry.path)
+                        continue
+                    # Start the lease before the task is visible in the claimed directory
+                    os.utime(claiming_file)
+                    os.rename(claiming_file, claimed_file)
+                    input_file = Path(json.loads(claimed_file.read_text(encoding="UTF-8"))['input_file'])
+                    self.claims.add(input_file)
+                    return input_file
+        return None
+
+    def renew(self, input_files: List[Path]):
+        for input_file in input_files:
+            try:
+                os.utime(self.get_task_file(self.STATE_CLAIMED, self.get_task_name(input_file)))
+            except FileNotFoundError:
+                continue
+
+    def complete(self, input_file: Path, status: dict):
+        task_name = self.get_task_name(input_file)
+        task_file = self.get_task_file(self.get_state(status), task_name)
+        task_file.write_text(json.dumps(dict(status, input_file=str(input_file))), encoding="UTF-8")
+        self.get_task_file(self.STATE_CLAIMED, task_name).unlink(missing_ok=True)
+        Manifest(self.location / self.RESULTS_FILE).append(dict(status, input_file=str(input_file)))
+        self.claims.discard(input_file)
+
+    def get_counts(self) -> dict:
+        self.create_state_directories()
+        counts = dict()
+        for state in (self.STATE_PENDING, self.STATE_CLAIMED, self.STATE_DONE, self.STATE_FAILED):
+            with os.scandir(self.get_state_dir(state)) as entries:
+                # Tasks being claimed have a suffix
+                counts[state] = sum(1 for entry in entries if entry.name.endswith('.json'))
+        return counts
+
+    def get_results(self, cursor: int = 0) -> Tuple[List[dict], int]:
+        results_file = self.location / self.RESULTS_FILE
+        if not results_file.is_file():
+            return [], cursor
+        results = []
+        with results_file.open('rb') as source:
+            source.seek(cursor)
+            for line in source:
+                # The last line may be written at the moment
+                if not line.endswith(b'\n'):
+                    break
+                results.append(json.loads(line))
+                cursor += len(line)
+        return results, cursor
+
+    def create_state_directories(self):
+        """
+        Create the directory of each state.
+        """
+        for state in (self.STATE_PENDING, self.STATE_CLAIMED, self.STATE_DONE, self.STATE_FAILED):
+            self.get_state_dir(state).mkdir(parents=True, exist_ok=True)
+
+    def get_state_dir(self, state: str) -> Path:
+        return self.location / state.lower()
+
+    def get_task_name(self, input_file: Path) -> str:
+        return hashlib.sha1(str(input_file).encode('UTF-8')).hexdigest() + '.json'
+
+    def get_task_file(self, state: str, task_name: str) -> Path:
+        return self.get_state_dir(state) / task_name
+
+
+class Coordinator:
+    """
+    Fill a work queue with PDF files, and report their status as the pld
+    detect nodes working from the queue analyse them.
+    """
+
+    def __init__(self, work_queue: WorkQueue):
+        """
+        Args:
+            work_queue: The queue shared with the pld detect nodes.
+        """
+        self.work_queue = work_queue
+
+    def enqueue(self, input_files: Iterable[Path]) -> int:
+        """
+        Add PDF files to the work queue.
+
+        Args:
+            input_files: Paths to PDF files.
+
+        Returns:
+            The number of files added.
+        """
+        count = self.work_queue.put(input_files)
+        print(f"{count} PDF files added to the work queue")
+        return count
+
+    def wait(self):
+        """
+        Print the status of the PDF files as they are analysed, until they all are.
+        """
+        cursor = 0
+        while True:
+            finished = self.work_queue.is_finished()
+            results, cursor = self.work_queue.get_results(cursor)
+            for result in results:
+                self.print_result(result)
+            if finished:
+                break
+            time.sleep(self.work_queue.POLL_INTERVAL)
+        counts = self.work_queue.get_counts()
+        print(f"{counts[WorkQueue.STATE_DONE]} PDF files done, {counts[WorkQueue.STATE_FAILED]} failed")
+
+    def print_result(self, result: dict):
+        """
+        Print the status of an analysed PDF file.
+
+        Args:
+            result: The status of the file, with its path as input_file.
+        """
+        if self.work_queue.get_state(result) == WorkQueue.STATE_FAILED:
+            print(f"✕ {result['input_file']} [red]FAILED[/red]")
+        elif 'lang' in result:
+            print(f"✓ {result['input_file']} [green]{result['lang']}[/green]")
+        else:
+            print(f"→ {result['input_file']} [blue]{result['status']}[/blue]")
+
+
+WORK_QUEUES = {work_queue.BACKEND_NAME: work_queue for work_queue in (SqliteWorkQueue, FilesystemWorkQueue)}
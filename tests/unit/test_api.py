@@ -0,0 +1,77 @@
+import io
+import pytest
+
+from pathlib import Path
+from sh import ErrorReturnCode_1
+from src.api import InMemoryDetector
+from src.pld import PdfLanguageDetector
+from unittest.mock import patch
+
+ENGLISH = "The quick brown fox jumps over the lazy dog while the children are playing in the garden."
+FRENCH = "Le renard brun saute par-dessus le chien paresseux pendant que les enfants jouent dans le jardin."
+
+@pytest.fixture
+def detector():
+    return InMemoryDetector(['eng', 'fra'], min_text_chars=10)
+
+def read_text_layer(*args):
+    # The PDF file is the last but one argument, before the output file
+    assert Path(args[-2]).read_bytes() == b'%PDF-1.4 content'
+    return f'{FRENCH}\f{ENGLISH}\f{FRENCH}\f'
+
+def test_detect_bytes(detector, tmp_path, monkeypatch):
+    # Given
+    monkeypatch.chdir(tmp_path)
+    with patch('src.pld.pdftotext', side_effect=read_text_layer):
+        # When
+        result = detector.detect(b'%PDF-1.4 content')
+    # Then
+    assert result['status'] == PdfLanguageDetector.STATUS_DONE
+    assert result['lang'] == 'FRA'
+    assert result['avgs']['FRA'] > result['avgs']['ENG']
+    assert [page['name'] for page in result['pages']] == ['page-1', 'page-2', 'page-3']
+    assert result['pages'][1]['langs']['source'] == PdfLanguageDetector.SOURCE_TEXT_LAYER
+    assert (result['pages_used'], result['pages_skipped']) == (3, dict())
+    assert result['timings']['detect']['calls'] == 3
+    assert list(tmp_path.iterdir()) == []
+    assert detector.detector.store.documents == dict()
+
+def test_detect_file_object(detector):
+    # Given
+    with patch('src.pld.pdftotext', side_effect=read_text_layer):
+        # When
+        result = detector.detect(io.BytesIO(b'%PDF-1.4 content'))
+    # Then
+    assert result['lang'] == 'FRA'
+
+def test_detect_path(detector, tmp_path):
+    # Given
+    input_file = tmp_path / 'test.pdf'
+    input_file.write_bytes(b'%PDF-1.4 content')
+    with patch('src.pld.pdftotext', side_effect=read_text_layer):
+        # When
+        result = detector.detect(str(input_file))
+    # Then
+    assert result['lang'] == 'FRA'
+    assert list(tmp_path.iterdir()) == [input_file]
+
+def test_detect_batch_continues_after_failure(detector):
+    # Given
+    def pdftotext(*args):
+        if Path(args[-2]).read_bytes() == b'broken':
+            raise ErrorReturnCode_1('pdftotext', b'', b'')
+        return f'{ENGLISH}\f'
+    with patch('src.pld.pdftotext', side_effect=pdftotext), \
+        patch.object(PdfLanguageDetector, 'get_pages', side_effect=ErrorReturnCode_1('pdfinfo', b'', b'')):
+        # When
+        result = list(detector.detect_batch([b'%PDF', b'broken', b'%PDF']))
+    # Then
+    assert [document['status'] for document in result] == [PdfLanguageDetector.STATUS_DONE,
+                                                           PdfLanguageDetector.STATUS_FAILED,
+                                                           PdfLanguageDetector.STATUS_DONE]
+    assert 'ErrorReturnCode_1' in result[1]['error']
+
+def test_unknown_option():
+    # When / Then
+    with pytest.raises(ValueError):
+        InMemoryDetector(['eng', 'fra'], keep_images=True)
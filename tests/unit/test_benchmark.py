@@ -0,0 +1,100 @@
+import os
+import re
+
+from pathlib import Path
+from PIL import Image
+from src.benchmark import Benchmark, Corpus, PdfWriter
+from unittest.mock import patch
+
+def test_pdf_writer(tmp_path):
+    # Given
+    writer = PdfWriter()
+    pdf_file = tmp_path / 'test.pdf'
+    # When
+    writer.add_text_page(['Première ligne (avec parenthèses)', 'Second line'])
+    writer.add_image_page(Image.new('L', (20, 30), 255))
+    writer.add_page()
+    writer.write(pdf_file)
+    # Then
+    data = pdf_file.read_bytes()
+    xref = int(re.search(rb'startxref\n(\d+)', data).group(1))
+    assert data[xref:].startswith(b'xref\n0 11\n')
+    offsets = re.findall(rb'(\d{10}) 00000 n \n', data[xref:])
+    for number, offset in enumerate(offsets, start=1):
+        assert data[int(offset):].startswith(f'{number} 0 obj\n'.encode())
+    assert b'/Count 3' in data
+    assert b'(Premi\xe8re ligne \\(avec parenth\xe8ses\\)) \'' in data
+
+def test_corpus_is_reproducible(tmp_path):
+    # Given
+    first = Corpus(tmp_path / 'first', ['eng', 'fra'], docs_per_kind=2, pages=3, seed=1)
+    second = Corpus(tmp_path / 'second', ['eng', 'fra'], docs_per_kind=2, pages=3, seed=1)
+    # When
+    documents = first.generate()
+    # Then
+    assert documents == second.generate()
+    assert len(documents) == 2 * len(Corpus.KINDS)
+    for name in documents:
+        assert (tmp_path / 'first' / name).read_bytes() == (tmp_path / 'second' / name).read_bytes()
+
+def test_corpus_ground_truth(tmp_path):
+    # Given
+    corpus = Corpus(tmp_path, ['eng', 'fra', 'deu'], docs_per_kind=3, pages=5)
+    # When
+    documents = corpus.generate()
+    # Then
+    assert documents['text/text-002-fra.pdf'] == dict(kind='text', lang='FRA', pages=['FRA'] * 5)
+    assert documents['blank/blank-001-eng.pdf']['pages'] == ['ENG', None, 'ENG', None, 'ENG']
+    for name, document in documents.items():
+        if document['kind'] == Corpus.KIND_MIXED:
+            assert document['pages'].count(document['lang']) > len(document['pages']) / 2
+            assert len(set(document['pages'])) == 2
+
+def test_corpus_is_generated_again_with_other_settings(tmp_path):
+    # Given
+    Corpus(tmp_path, ['eng', 'fra'], docs_per_kind=1).generate()
+    with patch.object(Corpus, 'generate', return_value=dict()) as mocked_generate:
+        # When
+        same = Corpus(tmp_path, ['eng', 'fra'], docs_per_kind=1).get_documents()
+        other = Corpus(tmp_path, ['eng', 'fra'], docs_per_kind=2).get_documents()
+        # Then
+        assert len(same) == len(Corpus.KINDS)
+        assert other == dict()
+        mocked_generate.assert_called_once_with()
+
+def test_get_accuracy(tmp_path):
+    # Given
+    benchmark = Benchmark(Corpus(tmp_path, ['eng', 'fra']))
+    results = [('text', 'ENG', 'ENG'), ('text', 'FRA', 'ENG'), ('image', 'FRA', 'FRA'), ('image', 'ENG', None)]
+    # When
+    accuracy = benchmark.get_accuracy(iter(results))
+    # Then
+    assert accuracy == dict(all=0.5, text=0.5, image=0.5)
+
+def test_run(tmp_path):
+    # Given
+    benchmark = Benchmark(Corpus(tmp_path, ['eng', 'fra'], docs_per_kind=1, pages=2), max_pages=1)
+    measure = dict(seconds=1.0, pages=4, pages_per_second=4.0)
+    with patch.object(Benchmark, 'measure_end_to_end', return_value=dict(measure, accuracy=dict(all=1.0))), \
+        patch.object(Benchmark, 'measure_text_layer', return_value=measure), \
+        patch.object(Benchmark, 'measure_render', return_value=measure), \
+        patch.object(Benchmark, 'measure_ocr', side_effect=RuntimeError('tesseract')), \
+        patch.object(Benchmark, 'measure_detect', return_value=measure), \
+        patch.object(Benchmark, 'measure_aggregate', return_value=measure):
+        # When
+        results = benchmark.run()
+    # Then
+    assert results['corpus'] == dict(docs=len(Corpus.KINDS), pages=len(Corpus.KINDS))
+    assert results['settings']['max_pages'] == 1
+    assert results['results']['end_to_end']['accuracy'] == dict(all=1.0)
+    assert results['results']['end_to_end']['peak_rss_mib']['self'] > 0
+    assert results['results']['stages']['ocr']['error'] == "RuntimeError('tesseract')"
+    assert list(results['results']['stages']) == list(Benchmark.STAGES)
+
+def test_run_isolated_when_process_dies(tmp_path):
+    # Given
+    benchmark = Benchmark(Corpus(tmp_path, ['eng', 'fra']))
+    # When
+    result = benchmark.run_isolated(lambda: os._exit(1))
+    # Then
+    assert result == dict(error='The measure process exited with code 1')
@@ -0,0 +1,63 @@
+import pickle
+import pytest
+
+from pathlib import Path
+from src.cache import ResultCache
+
+
+@pytest.fixture
+def result_cache(tmp_path):
+    return ResultCache(tmp_path / 'cache.sqlite')
+
+def test_get_key_same_content(result_cache, tmp_path):
+    # Given
+    (tmp_path / 'a.pdf').write_bytes(b'%PDF-1.4 content')
+    (tmp_path / 'b.pdf').write_bytes(b'%PDF-1.4 content')
+    # When
+    key_a = result_cache.get_key(tmp_path / 'a.pdf', ['ENG', 'FRA'], 5)
+    key_b = result_cache.get_key(tmp_path / 'b.pdf', ['FRA', 'ENG'], 5)
+    # Then
+    assert key_a == key_b
+
+def test_get_key_different_settings(result_cache, tmp_path):
+    # Given
+    (tmp_path / 'a.pdf').write_bytes(b'%PDF-1.4 content')
+    # When
+    key = result_cache.get_key(tmp_path / 'a.pdf', ['ENG', 'FRA'], 5)
+    # Then
+    assert key != result_cache.get_key(tmp_path / 'a.pdf', ['ENG', 'SPA'], 5)
+    assert key != result_cache.get_key(tmp_path / 'a.pdf', ['ENG', 'FRA'], 3)
+    assert key != result_cache.get_key(tmp_path / 'a.pdf', ['ENG', 'FRA'], 5, dict(confidence_margin=0.5))
+    assert key == result_cache.get_key(tmp_path / 'a.pdf', ['ENG', 'FRA'], 5, dict())
+
+def test_get_missing_key(result_cache):
+    # When
+    result = result_cache.get('unknown')
+    # Then
+    assert result is None
+    assert not result_cache.has('unknown')
+
+def test_set_and_get(result_cache):
+    # Given
+    result = dict(files={'avgs.json': '{"ENG": 1, "FRA": 0}'}, pages_used=1)
+    # When
+    result_cache.set('key', result)
+    # Then
+    assert result_cache.has('key')
+    assert result_cache.get('key') == result
+
+def test_persisted_across_instances(result_cache):
+    # Given
+    result_cache.set('key', dict(pages_used=2))
+    # When
+    result = ResultCache(result_cache.cache_file).get('key')
+    # Then
+    assert result == dict(pages_used=2)
+
+def test_pickle_without_connection(result_cache):
+    # Given
+    result_cache.set('key', dict(pages_used=2))
+    # When
+    copy = pickle.loads(pickle.dumps(result_cache))
+    # Then
+    assert copy.get('key') == dict(pages_used=2)
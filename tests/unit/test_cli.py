@@ -153,6 +153,20 @@ def test_dont_validate_one_language(runner, mocker, tmp_path):
   # Then
   assert result.exit_code == 2
 
+def test_dont_validate_benchmark_pages(runner, mocker, tmp_path):
+    # Given
+    mocker.patch('src.cli.Benchmark')
+    # When
+    result = runner.invoke(app, [
+        "benchmark",
+        str(tmp_path / 'results.json'),
+        "--pages", "0"
+    ])
+    # Then
+    assert result.exit_code == 2
+    assert "pages must be a positive integer" in result.output
+    assert "max_pages" not in result.output
+
 def test_dont_validate_max_pages(runner, mocker, tmp_path):
     # Given
     mocker.patch('src.pld.PdfLanguageDetector')
@@ -167,4 +181,235 @@ def test_dont_validate_max_pages(runner, mocker, tmp_path):
         "--max-page", max_page
     ])
     # Then
-    assert result.exit_code == 2
\ No newline at end of file
+    assert result.exit_code == 2
+
+def test_dont_validate_ocr_backend(runner, mocker, tmp_path):
+    # Given
+    mocker.patch('src.pld.PdfLanguageDetector')
+    # When
+    result = runner.invoke(app, [
+        "detect",
+        "--language", "spa",
+        "--language", "ell",
+        "--input-dir", tmp_path,
+        "--ocr-backend", "foo"
+    ])
+    # Then
+    assert result.exit_code == 2
+
+def test_dont_validate_missing_tesserocr(runner, mocker, tmp_path):
+    # Given
+    mocker.patch('src.pld.PdfLanguageDetector')
+    mocker.patch('src.pld.TesserocrBackend.is_available', return_value=False)
+    # When
+    result = runner.invoke(app, [
+        "detect",
+        "--language", "spa",
+        "--language", "ell",
+        "--input-dir", tmp_path,
+        "--ocr-backend", "tesserocr"
+    ])
+    # Then
+    assert result.exit_code == 2
+
+def test_validate_input_list(runner, mocker, tmp_path):
+    # Given
+    detector = mocker.patch('src.cli.PdfLanguageDetector')
+    input_list = tmp_path / 'files.txt'
+    input_list.write_text('a.pdf\n')
+    # When
+    result = runner.invoke(app, [
+        "detect",
+        "--language", "eng",
+        "--language", "fra",
+        "--input-list", input_list,
+        "--relative-to", tmp_path,
+        "--shard", "2/4"
+    ])
+    # Then
+    assert result.exit_code == 0
+    assert detector.call_args.kwargs['input_list'] == input_list
+    assert detector.call_args.kwargs['shard'] == (2, 4)
+
+def test_dont_validate_input_list_without_relative_to(runner, mocker, tmp_path):
+    # Given
+    mocker.patch('src.cli.PdfLanguageDetector')
+    input_list = tmp_path / 'files.txt'
+    input_list.write_text('a.pdf\n')
+    # When
+    result = runner.invoke(app, [
+        "detect",
+        "--language", "eng",
+        "--language", "fra",
+        "--input-list", input_list
+    ])
+    # Then
+    assert result.exit_code == 2
+
+def test_dont_validate_work_queue_without_relative_to(runner, mocker, tmp_path):
+    # Given
+    mocker.patch('src.cli.PdfLanguageDetector')
+    # When
+    result = runner.invoke(app, [
+        "detect",
+        "--language", "eng",
+        "--language", "fra",
+        "--work-queue", tmp_path / 'queue.sqlite',
+        "--relative-to", tmp_path / 'missing'
+    ])
+    # Then
+    assert result.exit_code == 2
+
+def test_dont_validate_missing_input(runner, mocker):
+    # Given
+    mocker.patch('src.cli.PdfLanguageDetector')
+    # When
+    result = runner.invoke(app, [
+        "detect",
+        "--language", "eng",
+        "--language", "fra"
+    ])
+    # Then
+    assert result.exit_code == 2
+
+@pytest.mark.parametrize('shard', ['0/4', '5/4', '2', 'a/b'])
+def test_dont_validate_shard(runner, mocker, tmp_path, shard):
+    # Given
+    mocker.patch('src.cli.PdfLanguageDetector')
+    # When
+    result = runner.invoke(app, [
+        "detect",
+        "--language", "eng",
+        "--language", "fra",
+        "--input-dir", tmp_path,
+        "--shard", shard
+    ])
+    # Then
+    assert result.exit_code == 2
+
+def test_coordinate_without_wait(runner, tmp_path):
+    # Given
+    (tmp_path / 'a.pdf').write_bytes(b'%PDF')
+    # When
+    result = runner.invoke(app, [
+        "coordinate", str(tmp_path / 'queue.sqlite'),
+        "--input-dir", str(tmp_path),
+        "--no-wait"
+    ])
+    # Then
+    assert result.exit_code == 0
+    assert '1 PDF files added to the work queue' in result.stdout
+
+def test_validate_pipeline(runner, mocker, tmp_path):
+    # Given
+    detector = mocker.patch('src.cli.PdfLanguageDetector')
+    # When
+    result = runner.invoke(app, [
+        "detect",
+        "--language", "eng",
+        "--language", "fra",
+        "--input-dir", str(tmp_path),
+        "--pipeline",
+        "--render-workers", "2",
+        "--ocr-workers", "6"
+    ])
+    # Then
+    assert result.exit_code == 0
+    assert detector.call_args.kwargs['pipeline'] is True
+    assert detector.call_args.kwargs['render_workers'] == 2
+    assert detector.call_args.kwargs['ocr_workers'] == 6
+    assert detector.call_args.kwargs['detect_workers'] == 1
+
+@pytest.mark.parametrize('option', [["--narrow-after", "2"], ["--confidence-margin", "0.3"], ["--skip-ocr"]])
+def test_dont_validate_pipeline_with_page_state(runner, mocker, tmp_path, option):
+    # Given
+    mocker.patch('src.cli.PdfLanguageDetector')
+    # When
+    result = runner.invoke(app, [
+        "detect",
+        "--language", "eng",
+        "--language", "fra",
+        "--input-dir", str(tmp_path),
+        "--pipeline",
+        *option
+    ])
+    # Then
+    assert result.exit_code == 2
+
+def test_validate_async_executor(runner, mocker, tmp_path):
+    # Given
+    detector = mocker.patch('src.cli.PdfLanguageDetector')
+    # When
+    result = runner.invoke(app, [
+        "detect",
+        "--language", "eng",
+        "--language", "fra",
+        "--input-dir", str(tmp_path),
+        "--async-executor",
+        "--confidence-margin", "0.3"
+    ])
+    # Then
+    assert result.exit_code == 0
+    assert detector.call_args.kwargs['async_executor'] is True
+
+@pytest.mark.parametrize('option', [["--script-detection"], ["--pages-per-task", "2"], ["--pipeline"]])
+def test_dont_validate_async_executor_with_workers_options(runner, mocker, tmp_path, option):
+    # Given
+    mocker.patch('src.cli.PdfLanguageDetector')
+    # When
+    result = runner.invoke(app, [
+        "detect",
+        "--language", "eng",
+        "--language", "fra",
+        "--input-dir", str(tmp_path),
+        "--async-executor",
+        *option
+    ])
+    # Then
+    assert result.exit_code == 2
+
+def test_dont_validate_async_executor_with_tesserocr(runner, mocker, tmp_path):
+    # Given
+    mocker.patch('src.cli.PdfLanguageDetector')
+    mocker.patch('src.cli.TesserocrBackend.is_available', return_value=True)
+    # When
+    result = runner.invoke(app, [
+        "detect",
+        "--language", "eng",
+        "--language", "fra",
+        "--input-dir", str(tmp_path),
+        "--async-executor",
+        "--ocr-backend", "tesserocr"
+    ])
+    # Then
+    assert result.exit_code == 2
+    assert "Invalid value for '--ocr-backend'" in result.output
+
+def test_dont_validate_metrics_format(runner, mocker, tmp_path):
+    # Given
+    mocker.patch('src.cli.PdfLanguageDetector')
+    # When
+    result = runner.invoke(app, [
+        "detect",
+        "--language", "eng",
+        "--language", "fra",
+        "--input-dir", str(tmp_path),
+        "--metrics-file", str(tmp_path / 'pld.prom'),
+        "--metrics-format", "csv"
+    ])
+    # Then
+    assert result.exit_code == 2
+
+def test_dont_validate_weighting(runner, mocker, tmp_path):
+    # Given
+    mocker.patch('src.cli.PdfLanguageDetector')
+    # When
+    result = runner.invoke(app, [
+        "detect",
+        "--language", "eng",
+        "--language", "fra",
+        "--input-dir", str(tmp_path),
+        "--weighting", "words"
+    ])
+    # Then
+    assert result.exit_code == 2
@@ -0,0 +1,55 @@
+import pytest
+
+from pathlib import Path
+from src.journal import Journal
+
+
+@pytest.fixture
+def journal(tmp_path):
+    return Journal.from_output_dir(tmp_path / 'out')
+
+def test_from_output_dir(tmp_path):
+    # When
+    journal = Journal.from_output_dir(tmp_path)
+    # Then
+    assert journal.manifest_file == tmp_path / 'journal.jsonl'
+
+def test_load_without_journal(journal):
+    # When
+    journal.load()
+    # Then
+    assert not journal.is_done(Path('/out/a'))
+    assert journal.get_pages(Path('/out/a')) == set()
+
+def test_load_pages_and_documents(journal):
+    # Given
+    journal.add_page(Path('/out/a'), 'page-1')
+    journal.add_page(Path('/out/a'), 'page-2')
+    journal.add_document(Path('/out/a'))
+    journal.add_page(Path('/out/b'), 'page-1')
+    # When
+    journal.load()
+    # Then
+    assert journal.is_done(Path('/out/a'))
+    assert not journal.is_done(Path('/out/b'))
+    assert journal.get_pages(Path('/out/a')) == {'page-1', 'page-2'}
+    assert journal.get_pages(Path('/out/b')) == {'page-1'}
+
+def test_load_skips_incomplete_line(journal):
+    # Given
+    journal.add_document(Path('/out/a'))
+    with journal.manifest_file.open('a') as target:
+        target.write('{"output_dir": "/out/b", "sta')
+    # When
+    journal.load()
+    # Then
+    assert journal.documents == {'/out/a'}
+
+def test_keys_are_absolute(journal, tmp_path, monkeypatch):
+    # Given
+    monkeypatch.chdir(tmp_path)
+    journal.add_document(Path('out/a'))
+    # When
+    journal.load()
+    # Then
+    assert journal.is_done(tmp_path / 'out' / 'a')
@@ -0,0 +1,64 @@
+import pytest
+
+from multiprocessing import Pool
+from pathlib import Path
+from src.manifest import Manifest
+
+
+@pytest.fixture
+def manifest(tmp_path):
+    return Manifest.from_output_dir(tmp_path / 'out')
+
+def append_entries(manifest_file, worker):
+    manifest = Manifest(manifest_file)
+    for index in range(50):
+        manifest.append(dict(output_dir=f'/out/{worker}-{index}', lang='ENG'))
+
+def test_from_output_dir(tmp_path):
+    # When
+    manifest = Manifest.from_output_dir(tmp_path)
+    # Then
+    assert manifest.manifest_file == tmp_path / 'manifest.jsonl'
+
+def test_exists(manifest):
+    # Then
+    assert not manifest.exists()
+    manifest.append(dict(output_dir='/out/a', lang='ENG'))
+    assert manifest.exists()
+
+def test_read_keeps_append_order(manifest):
+    # Given
+    manifest.append(dict(output_dir='/out/b', lang='ENG'))
+    manifest.append(dict(output_dir='/out/a', lang='FRA'))
+    # When
+    result = list(manifest.read())
+    # Then
+    assert result == [dict(output_dir='/out/b', lang='ENG'), dict(output_dir='/out/a', lang='FRA')]
+
+def test_read_keeps_last_entry(manifest):
+    # Given
+    manifest.append(dict(output_dir='/out/a', lang='ENG'))
+    manifest.append(dict(output_dir='/out/b', lang='ENG'))
+    manifest.append(dict(output_dir='/out/a', lang='FRA'))
+    # When
+    result = list(manifest.read())
+    # Then
+    assert result == [dict(output_dir='/out/b', lang='ENG'), dict(output_dir='/out/a', lang='FRA')]
+
+def test_read_skips_incomplete_lines(manifest):
+    # Given
+    manifest.append(dict(output_dir='/out/a', lang='ENG'))
+    with manifest.manifest_file.open('a') as manifest_file:
+        manifest_file.write('{"output_dir": "/out/b", "la')
+    manifest.append(dict(output_dir='/out/c', lang='FRA'))
+    # When
+    result = list(manifest.read())
+    # Then
+    assert result == [dict(output_dir='/out/a', lang='ENG')]
+
+def test_append_from_concurrent_processes(manifest):
+    # When
+    with Pool(4) as pool:
+        pool.starmap(append_entries, [(manifest.manifest_file, worker) for worker in range(4)])
+    # Then
+    assert len(list(manifest.read())) == 200
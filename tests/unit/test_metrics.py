@@ -0,0 +1,96 @@
+import asyncio
+import json
+
+from src.metrics import RunMetrics, StageTimings, TimingsSummary
+
+
+def test_measure_adds_to_active_timings():
+    # Given
+    timings = StageTimings()
+    # When
+    with timings.activate():
+        with StageTimings.measure(StageTimings.OCR):
+            pass
+        with StageTimings.measure(StageTimings.OCR):
+            pass
+        with StageTimings.measure(None):
+            pass
+    with StageTimings.measure(StageTimings.DETECT):
+        pass
+    # Then
+    assert list(timings.to_dict()) == [StageTimings.OCR]
+    assert timings.to_dict()[StageTimings.OCR]['calls'] == 2
+
+def test_activate_in_concurrent_tasks():
+    # Given
+    async def analyse(calls):
+        timings = StageTimings()
+        with timings.activate():
+            for _ in range(calls):
+                with StageTimings.measure(StageTimings.RENDER):
+                    await asyncio.sleep(0)
+        return timings.to_dict()[StageTimings.RENDER]['calls']
+    async def analyse_all():
+        return await asyncio.gather(analyse(1), analyse(3))
+    # When
+    result = asyncio.run(analyse_all())
+    # Then
+    assert result == [1, 3]
+
+def test_merge():
+    # Given
+    first = dict(ocr=dict(seconds=1.0, calls=1))
+    second = dict(ocr=dict(seconds=0.5, calls=2), detect=dict(seconds=0.1, calls=3))
+    # When
+    result = StageTimings.merge(first, None, second)
+    # Then
+    assert result == dict(ocr=dict(seconds=1.5, calls=3), detect=dict(seconds=0.1, calls=3))
+
+def test_summary_quantiles():
+    # Given
+    summary = TimingsSummary()
+    for seconds in [0.1] * 90 + [2.0] * 9 + [10.0]:
+        summary.add(dict(ocr=dict(seconds=seconds, calls=1)))
+    # When
+    result = summary.to_dict()['ocr']
+    # Then
+    assert 0.1 <= result['p50'] <= 0.1 * TimingsSummary.BUCKET_FACTOR
+    assert 2.0 <= result['p95'] <= 2.0 * TimingsSummary.BUCKET_FACTOR
+    assert result['max'] == 10.0
+    assert (result['calls'], result['documents']) == (100, 100)
+
+def test_summary_stages_in_analysis_order():
+    # Given
+    summary = TimingsSummary()
+    summary.add(dict(aggregate=dict(seconds=0.1, calls=1), render=dict(seconds=0.1, calls=1)))
+    # When
+    result = summary.get_lines()
+    # Then
+    assert [line.split(':')[0] for line in result] == [StageTimings.RENDER, StageTimings.AGGREGATE]
+
+def test_export_prometheus(tmp_path):
+    # Given
+    metrics = RunMetrics(tmp_path / 'pld.prom')
+    metrics.add(dict(status='DONE', lang='ENG', pages=3, timings=dict(ocr=dict(seconds=1.0, calls=3))))
+    metrics.add(dict(status='FAILED '))
+    # When
+    metrics.export()
+    # Then
+    lines = (tmp_path / 'pld.prom').read_text().splitlines()
+    assert 'pld_documents_total{status="DONE"} 1' in lines
+    assert 'pld_documents_total{status="FAILED"} 1' in lines
+    assert 'pld_pages_total 3' in lines
+    assert 'pld_stage_calls_total{stage="ocr"} 3' in lines
+    assert 'pld_stage_document_seconds_count{stage="ocr"} 1' in lines
+    assert list(tmp_path.iterdir()) == [tmp_path / 'pld.prom']
+
+def test_export_json(tmp_path):
+    # Given
+    metrics = RunMetrics(tmp_path / 'metrics.json', RunMetrics.FORMAT_JSON)
+    metrics.add(dict(status='DONE', lang='ENG', pages=3, timings=dict(ocr=dict(seconds=1.0, calls=3))))
+    # When
+    metrics.export()
+    # Then
+    result = json.loads((tmp_path / 'metrics.json').read_text())
+    assert result['documents'] == dict(DONE=1)
+    assert result['stages']['ocr']['max'] == 1.0
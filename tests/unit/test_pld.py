@@ -1,10 +1,21 @@
+import asyncio
+import io
 import json
+import multiprocessing
 import pytest
+import pytesseract
+import sqlite3
+import time
 
 from lingua import IsoCode639_3, Language
 from pathlib import Path
-from src.pld import PdfLanguageDetector
-from unittest.mock import call, mock_open, patch
+from PIL import Image, ImageDraw
+from sh import ErrorReturnCode_1
+from src.metrics import StageTimings
+from src.pld import AsyncExecutor, CoeffAverages, LanguageNarrowing, PageFilter, PdfLanguageDetector, Pipeline, PipelineStage, PytesseractBackend, RenderProfile, TesserocrBackend, Throughput
+from src.store import SqliteStore
+from typing import List
+from unittest.mock import MagicMock, call, mock_open, patch
 
 @pytest.fixture
 def pdf_language_detector():
@@ -43,7 +54,7 @@ def test_save_text(pdf_language_detector):
         # When
         pdf_language_detector.save_text(image_text, text_file)
         # Then
-        mock_file.assert_called_with("a")
+        mock_file.assert_called_with("w")
         mock_file().write.assert_called_once_with(image_text)
 
 def test_save_language(pdf_language_detector):
@@ -132,3 +143,1160 @@ def test_get_output_dir_with_relative_to(mocker):
     
     # Then
     assert actual_output_dir.resolve() == expected_output_dir.resolve()
+
+def test_save_language_with_source(pdf_language_detector):
+    # Given
+    detected_lang = [(Language.ENGLISH, 1), (Language.FRENCH, 0)]
+    lang_file = Path('/output/lang.json')
+    data = dict(ENG=1, FRA=0, source=PdfLanguageDetector.SOURCE_TEXT_LAYER)
+    with patch('pathlib.Path.open', new=mock_open()) as mock_file:
+        # When
+        pdf_language_detector.save_language(detected_lang, lang_file, PdfLanguageDetector.SOURCE_TEXT_LAYER)
+        # Then
+        mock_file().write.assert_called_once_with(json.dumps(data, indent=2))
+
+def test_extract_text_layer(pdf_language_detector):
+    # Given
+    input_file = Path('/input/test.pdf')
+    with patch('src.pld.pdftotext', return_value='First page\fSecond page\f') as mocked_pdftotext:
+        # When
+        result = pdf_language_detector.extract_text_layer(input_file)
+        # Then
+        mocked_pdftotext.assert_called_once_with('-l', 5, '-enc', 'UTF-8', input_file.resolve(), '-')
+        assert result == ['First page', 'Second page']
+
+def test_has_enough_text(pdf_language_detector):
+    # Given
+    pdf_language_detector.min_text_chars = 10
+    # When / Then
+    assert pdf_language_detector.has_enough_text('A sentence long enough')
+    assert not pdf_language_detector.has_enough_text('  a b c \n d  ')
+
+def test_process_text_layer(pdf_language_detector):
+    # Given
+    input_file = Path('/input/test.pdf')
+    pdf_language_detector.min_text_chars = 10
+    pages_texts = ['A sentence long enough', '', 'Another sentence long enough']
+    with patch.object(PdfLanguageDetector, 'extract_text_layer', return_value=pages_texts), \
+        patch.object(PdfLanguageDetector, 'process_text', return_value=dict(ENG=1, FRA=0)) as mocked_process_text:
+        # When
+        result = pdf_language_detector.process_text_layer(input_file, Path('/texts'), Path('/langs'))
+        # Then
+        assert result == [2]
+        mocked_process_text.assert_has_calls([
+            call(pages_texts[0], 'page-1', Path('/texts'), Path('/langs'), PdfLanguageDetector.SOURCE_TEXT_LAYER),
+            call(pages_texts[2], 'page-3', Path('/texts'), Path('/langs'), PdfLanguageDetector.SOURCE_TEXT_LAYER),
+        ])
+
+def test_process_text_layer_without_text_layer(pdf_language_detector):
+    # Given
+    input_file = Path('/input/test.pdf')
+    error = ErrorReturnCode_1('pdftotext', b'', b'Syntax Error')
+    with patch.object(PdfLanguageDetector, 'extract_text_layer', side_effect=error):
+        # When
+        result = pdf_language_detector.process_text_layer(input_file, Path('/texts'), Path('/langs'))
+        # Then
+        assert result is None
+
+def test_extract_images_with_pages(pdf_language_detector):
+    # Given
+    input_file = Path('/input/test.pdf')
+    images_dir = Path('/output/test/images')
+    with patch('src.pld.pdftoppm') as mocked_pdftoppm:
+        # When
+        pdf_language_detector.extract_images(input_file, images_dir, [2, 4])
+        # Then
+        mocked_pdftoppm.assert_has_calls([
+            call('-f', 2, '-l', 2, '-jpeg', '-singlefile', input_file.resolve(), images_dir / 'page-2'),
+            call('-f', 4, '-l', 4, '-jpeg', '-singlefile', input_file.resolve(), images_dir / 'page-4'),
+        ])
+
+def test_default_ocr_backend(pdf_language_detector):
+    # Then
+    assert isinstance(pdf_language_detector.ocr_backend, PytesseractBackend)
+
+def test_extract_text_with_ocr_backend(pdf_language_detector):
+    # Given
+    image_file = Path('/output/test/images/page-1.jpg')
+    with patch('src.pld.Image.open') as mocked_open, \
+        patch.object(PytesseractBackend, 'image_to_string', return_value='Sample Text') as mocked_image_to_string:
+        # When
+        result = pdf_language_detector.extract_text(image_file)
+        # Then
+        mocked_image_to_string.assert_called_once_with(mocked_open.return_value, 'eng+fra')
+        assert result == 'Sample Text'
+
+def test_extract_text_with_script_detection():
+    # Given
+    detector = PdfLanguageDetector(['eng', 'fra', 'rus', 'ell'], Path('/input'), Path('/output'), script_detection=True)
+    image = Image.new('RGB', (2480, 3508))
+    with patch.object(PytesseractBackend, 'detect_script', return_value='Latin') as mocked_detect_script, \
+        patch.object(PytesseractBackend, 'image_to_string', return_value='Sample Text') as mocked_image_to_string:
+        # When
+        detector.extract_text(image)
+        # Then
+        assert max(mocked_detect_script.call_args.args[0].size) == PdfLanguageDetector.SCRIPT_DETECTION_SIZE
+        mocked_image_to_string.assert_called_once_with(image, 'eng+fra')
+
+@pytest.mark.parametrize('script, lang', [('Cyrillic', 'rus'), ('Greek', 'ell'), ('Han', 'eng+fra+rus+ell'), (None, 'eng+fra+rus+ell')])
+def test_get_page_tesseract_langs_with_script_detection(script, lang):
+    # Given
+    detector = PdfLanguageDetector(['eng', 'fra', 'rus', 'ell'], Path('/input'), Path('/output'), script_detection=True)
+    with patch.object(PytesseractBackend, 'detect_script', return_value=script):
+        # When
+        result = detector.get_page_tesseract_langs(Image.new('RGB', (100, 100)))
+        # Then
+        assert '+'.join(result) == lang
+
+def test_get_page_tesseract_langs_with_a_single_script():
+    # Given
+    detector = PdfLanguageDetector(['eng', 'fra'], Path('/input'), Path('/output'), script_detection=True)
+    with patch.object(PytesseractBackend, 'detect_script') as mocked_detect_script:
+        # When
+        result = detector.get_page_tesseract_langs(Image.new('RGB', (100, 100)))
+        # Then
+        mocked_detect_script.assert_not_called()
+        assert result == ['eng', 'fra']
+
+def test_pytesseract_backend_detect_script_without_text():
+    # Given
+    backend = PytesseractBackend()
+    with patch('src.pld.pytesseract.image_to_osd', side_effect=pytesseract.TesseractError(1, 'Too few characters')):
+        # When
+        result = backend.detect_script(Image.new('RGB', (100, 100)))
+        # Then
+        assert result is None
+
+def test_tesserocr_backend_reuses_api():
+    # Given
+    backend = TesserocrBackend()
+    api = MagicMock()
+    api.GetUTF8Text.return_value = 'Sample Text'
+    backend.apis['eng+fra'] = api
+    # When
+    results = [backend.image_to_string(image, 'eng+fra') for image in ('image1', 'image2')]
+    # Then
+    assert results == ['Sample Text', 'Sample Text']
+    api.SetImage.assert_has_calls([call('image1'), call('image2')])
+
+def test_tesserocr_backend_state_has_no_api():
+    # Given
+    backend = TesserocrBackend()
+    backend.apis['eng+fra'] = MagicMock()
+    # When
+    state = backend.__getstate__()
+    # Then
+    assert state['apis'] == dict()
+
+def test_render_page(pdf_language_detector):
+    # Given
+    input_file = Path('/input/test.pdf')
+    ppm = io.BytesIO()
+    Image.new('RGB', (4, 2)).save(ppm, format='PPM')
+    with patch('src.pld.pdftoppm') as mocked_pdftoppm:
+        mocked_pdftoppm.return_value.stdout = ppm.getvalue()
+        # When
+        result = pdf_language_detector.render_page(input_file, 3)
+        # Then
+        mocked_pdftoppm.assert_called_once_with('-f', 3, '-l', 3, input_file.resolve(), _return_cmd=True)
+        assert result.size == (4, 2)
+
+def test_render_page_with_render_profile():
+    # Given
+    detector = PdfLanguageDetector(['eng', 'fra'], Path('/input'), Path('/output'), dpi=100, color='gray')
+    input_file = Path('/input/test.pdf')
+    pgm = io.BytesIO()
+    Image.new('L', (4, 2)).save(pgm, format='PPM')
+    with patch('src.pld.pdftoppm') as mocked_pdftoppm:
+        mocked_pdftoppm.return_value.stdout = pgm.getvalue()
+        # When
+        result = detector.render_page(input_file, 3)
+        detector.render_page(input_file, 3, 300)
+        # Then
+        mocked_pdftoppm.assert_has_calls([
+            call('-f', 3, '-l', 3, '-r', 100, '-gray', input_file.resolve(), _return_cmd=True),
+            call('-f', 3, '-l', 3, '-r', 300, '-gray', input_file.resolve(), _return_cmd=True),
+        ])
+        assert result.mode == 'L'
+
+@pytest.mark.parametrize('color, jpeg, args', [('color', False, []), ('gray', False, ['-gray']),
+                                               ('mono', False, ['-mono']), ('mono', True, ['-gray'])])
+def test_render_profile_pdftoppm_args(color, jpeg, args):
+    # When
+    result = RenderProfile(color=color).get_pdftoppm_args(jpeg=jpeg)
+    # Then
+    assert result == args
+
+def test_render_profile_crop_image():
+    # Given
+    image = Image.new('RGB', (100, 200))
+    # When
+    result = RenderProfile(crop=0.5).crop_image(image)
+    # Then
+    assert result.size == (100, 100)
+    assert RenderProfile().crop_image(image) is image
+
+def test_process_pages_with_adaptive_dpi(pdf_language_detector):
+    # Given
+    input_file = Path('/input/test.pdf')
+    pdf_language_detector.adaptive_dpi = 300
+    low, high = MagicMock(), MagicMock()
+    texts = {low: 'Too short', high: 'This page is long enough to detect its language once rendered at a higher resolution.'}
+    with patch.object(PdfLanguageDetector, 'render_page', side_effect=[low, high]) as mocked_render_page, \
+        patch.object(PdfLanguageDetector, 'extract_text', side_effect=lambda image, langs=None: texts[image]), \
+        patch.object(PdfLanguageDetector, 'process_text', return_value=dict(ENG=1, FRA=0)) as mocked_process_text:
+        # When
+        pdf_language_detector.process_pages(input_file, [2], Path('/images'), Path('/texts'), Path('/langs'))
+        # Then
+        mocked_render_page.assert_has_calls([call(input_file, 2), call(input_file, 2, 300)])
+        assert mocked_process_text.call_args.args[0] == texts[high]
+
+def test_get_pages(pdf_language_detector):
+    # Given
+    input_file = Path('/input/test.pdf')
+    with patch('src.pld.pdfinfo', return_value='Title:          Test\nPages:          12\nEncrypted:      no\n'):
+        # When
+        result = pdf_language_detector.get_pages(input_file)
+        # Then
+        assert result == [1, 2, 3, 4, 5]
+
+def test_process_pages_without_keep_images(pdf_language_detector):
+    # Given
+    input_file = Path('/input/test.pdf')
+    image = MagicMock()
+    with patch.object(PdfLanguageDetector, 'render_page', return_value=image), \
+        patch.object(PdfLanguageDetector, 'extract_text', return_value='Sample Text') as mocked_extract_text, \
+        patch.object(PdfLanguageDetector, 'process_text', return_value=dict(ENG=1, FRA=0)) as mocked_process_text:
+        # When
+        pdf_language_detector.process_pages(input_file, [2], Path('/images'), Path('/texts'), Path('/langs'))
+        # Then
+        image.save.assert_not_called()
+        mocked_extract_text.assert_called_once_with(image, None)
+        mocked_process_text.assert_called_once_with('Sample Text', 'page-2', Path('/texts'), Path('/langs'), PdfLanguageDetector.SOURCE_OCR)
+
+def test_process_pages_with_keep_images(pdf_language_detector):
+    # Given
+    input_file = Path('/input/test.pdf')
+    pdf_language_detector.keep_images = True
+    image = MagicMock()
+    with patch.object(PdfLanguageDetector, 'render_page', return_value=image), \
+        patch.object(PdfLanguageDetector, 'extract_text', return_value='Sample Text'), \
+        patch.object(PdfLanguageDetector, 'process_text', return_value=dict(ENG=1, FRA=0)):
+        # When
+        pdf_language_detector.process_pages(input_file, [2], Path('/images'), Path('/texts'), Path('/langs'))
+        # Then
+        image.save.assert_called_once_with(Path('/images/page-2.jpg'))
+
+def test_analyse_file(tmp_path):
+    # Given
+    detector = PdfLanguageDetector(['eng', 'fra'], tmp_path, tmp_path / 'out', min_text_chars=10)
+    input_file = tmp_path / 'test.pdf'
+    output_file_dir = detector.get_output_dir(input_file)
+    text_layer = 'This is a page written in English with enough text.\f\f'
+    with patch('src.pld.pdftotext', return_value=text_layer), \
+        patch.object(PdfLanguageDetector, 'render_page', return_value=Image.new('RGB', (4, 2))) as mocked_render_page, \
+        patch.object(PytesseractBackend, 'image_to_string', return_value='Ceci est une page écrite en français.'):
+        # When
+        result = detector.analyse_file(input_file, output_file_dir)
+        # Then
+        mocked_render_page.assert_called_once_with(input_file, 2)
+        assert not (output_file_dir / 'images').exists()
+        assert json.loads((output_file_dir / 'langs' / 'page-1.json').read_text())['source'] == 'text'
+        assert json.loads((output_file_dir / 'langs' / 'page-2.json').read_text())['source'] == 'ocr'
+        assert json.loads((output_file_dir / 'meta.json').read_text())['pages_used'] == 2
+        assert (output_file_dir / 'avgs.json').is_file()
+        assert result in ('ENG', 'FRA')
+
+def test_coeff_averages():
+    # Given
+    coeff_avgs = CoeffAverages(['ENG', 'FRA', 'SPA'])
+    # When
+    coeff_avgs.add(dict(ENG=0.9, FRA=0.1, SPA=0))
+    coeff_avgs.add(dict(ENG=0.5, FRA=0.3, SPA=0.2, source='ocr'))
+    # Then
+    assert coeff_avgs.count == 2
+    assert coeff_avgs.lang == 'ENG'
+    assert coeff_avgs.avgs == pytest.approx(dict(ENG=0.7, FRA=0.2, SPA=0.1))
+    assert coeff_avgs.margin == pytest.approx(0.5)
+
+def test_language_narrowing():
+    # Given
+    narrowing = LanguageNarrowing(['ENG', 'FRA', 'SPA'], after_pages=2, top_langs=2, min_confidence=0.5)
+    coeff_avgs = CoeffAverages(['ENG', 'FRA', 'SPA'])
+    # When
+    coeff_avgs.add(dict(ENG=0.2, FRA=0.7, SPA=0.1))
+    before = narrowing.get_langs(coeff_avgs)
+    coeff_avgs.add(dict(ENG=0.1, FRA=0.6, SPA=0.3))
+    after = narrowing.get_langs(coeff_avgs)
+    narrowing.widened = True
+    widened = narrowing.get_langs(coeff_avgs)
+    # Then
+    assert before == ['ENG', 'FRA', 'SPA']
+    assert after == ['FRA', 'SPA']
+    assert narrowing.is_narrowed(after)
+    assert widened == ['ENG', 'FRA', 'SPA']
+    assert narrowing.is_confident(dict(ENG=0.1, FRA=0.8, SPA=0.1), after)
+    assert not narrowing.is_confident(dict(ENG=0.9, FRA=0.05, SPA=0.05), after)
+
+def test_process_pages_with_language_narrowing(tmp_path):
+    # Given
+    detector = PdfLanguageDetector(['eng', 'fra', 'spa'], tmp_path, tmp_path / 'out', narrow_after=1, narrow_langs=1)
+    texts_dir, langs_dir = tmp_path / 'texts', tmp_path / 'langs'
+    detector.create_output_directories(texts_dir, langs_dir)
+    french = 'Ceci est une page écrite en français, avec des phrases assez longues.'
+    english = 'This is a page written in English, with rather long sentences.'
+    ocr_texts = {(1, 'eng+fra+spa'): french, (2, 'fra'): french, (3, 'fra'): 'Thiz iz a paje', (3, 'eng+fra+spa'): english}
+    with patch.object(PdfLanguageDetector, 'render_page', side_effect=lambda input_file, page: page), \
+        patch.object(PdfLanguageDetector, 'extract_text', side_effect=lambda page, langs=None: ocr_texts[(page, '+'.join(langs or detector.tesseract_langs))]) as mocked_extract_text:
+        # When
+        detector.process_pages(tmp_path / 'test.pdf', [1, 2, 3], tmp_path / 'images', texts_dir, langs_dir)
+        # Then
+        assert mocked_extract_text.call_count == 4
+        narrowings = [json.loads((langs_dir / f'page-{page}.json').read_text())['narrowing'] for page in (1, 2, 3)]
+        assert narrowings == [dict(ocr_langs=['ENG', 'FRA', 'SPA'], widened=False),
+                              dict(ocr_langs=['FRA'], widened=False),
+                              dict(ocr_langs=['ENG', 'FRA', 'SPA'], widened=True)]
+        assert (texts_dir / 'page-3.txt').read_text() == english
+
+def test_coeff_averages_skips_pages():
+    # Given
+    coeff_avgs = CoeffAverages(['ENG', 'FRA'])
+    # When
+    coeff_avgs.add(dict(ENG=0.8, FRA=0.2))
+    coeff_avgs.add(dict(skipped='blank'))
+    coeff_avgs.add(dict(skipped='duplicate', duplicate_of='page-1'))
+    coeff_avgs.add(dict(skipped='blank'))
+    # Then
+    assert coeff_avgs.count == 1
+    assert coeff_avgs.avgs == dict(ENG=0.8, FRA=0.2)
+    assert coeff_avgs.skipped == dict(blank=2, duplicate=1)
+
+def test_coeff_averages_weighted_by_chars():
+    # Given
+    coeff_avgs = CoeffAverages(['ENG', 'FRA'], CoeffAverages.WEIGHTING_CHARS)
+    # When
+    coeff_avgs.add(dict(ENG=0.9, FRA=0.1, chars=900))
+    coeff_avgs.add(dict(ENG=0, FRA=1, chars=3))
+    coeff_avgs.add(dict(ENG=0.1, FRA=0.9, chars=0))
+    # Then
+    assert coeff_avgs.count == 3
+    assert coeff_avgs.avgs == pytest.approx(dict(ENG=810 / 903, FRA=93 / 903))
+
+def test_coeff_averages_merge():
+    # Given
+    first, second = CoeffAverages(['ENG', 'FRA']), CoeffAverages(['ENG', 'FRA'])
+    first.add(dict(ENG=0.9, FRA=0.1))
+    second.add(dict(ENG=0.5, FRA=0.5))
+    second.add(dict(skipped='blank'))
+    # When
+    first.merge(json.loads(json.dumps(second.to_dict())))
+    first.merge(None)
+    # Then
+    assert first.count == 2
+    assert first.avgs == pytest.approx(dict(ENG=0.7, FRA=0.3))
+    assert first.skipped == dict(blank=1)
+
+def text_page(lines: List[int]) -> Image.Image:
+    image = Image.new('L', (600, 800), 255)
+    draw = ImageDraw.Draw(image)
+    for index, length in enumerate(lines):
+        draw.rectangle((50, 50 + index * 40, 50 + length, 70 + index * 40), fill=0)
+    return image
+
+def test_page_filter():
+    # Given
+    page_filter = PageFilter()
+    letterhead = text_page([500, 300, 450, 200])
+    # When
+    results = [page_filter.check(image, f'page-{index}') for index, image in enumerate([
+        Image.new('L', (600, 800), 255),
+        letterhead,
+        text_page([100, 500, 100, 500, 100, 500, 100, 500, 100, 500, 100, 500]),
+        letterhead.point(lambda level: min(level + 10, 255)),
+    ], start=1)]
+    # Then
+    assert results == [dict(skipped='blank'), None, None, dict(skipped='duplicate', duplicate_of='page-2')]
+
+def test_process_pages_skips_blank_pages(tmp_path):
+    # Given
+    detector = PdfLanguageDetector(['eng', 'fra'], tmp_path, tmp_path / 'out', skip_blank_pages=True)
+    output_file_dir = detector.get_output_dir(tmp_path / 'test.pdf')
+    detector.create_page_directories(output_file_dir)
+    images = [text_page([500, 300]), Image.new('L', (600, 800), 255)]
+    with patch.object(PdfLanguageDetector, 'render_page', side_effect=images), \
+        patch.object(PytesseractBackend, 'image_to_string', return_value='This is a page written in English.') as mocked_image_to_string:
+        # When
+        detector.process_pages(tmp_path / 'test.pdf', [1, 2], output_file_dir / 'images',
+                               output_file_dir / 'texts', output_file_dir / 'langs')
+        detector.extract_meta(tmp_path / 'test.pdf')
+        detector.aggregate_pages(output_file_dir)
+        # Then
+        assert mocked_image_to_string.call_count == 1
+        assert json.loads((output_file_dir / 'langs' / 'page-2.json').read_text()) == dict(skipped='blank')
+        assert not (output_file_dir / 'texts' / 'page-2.txt').exists()
+        meta = detector.read_meta(output_file_dir)
+        assert meta['pages_used'] == 1
+        assert meta['pages_skipped'] == dict(blank=1)
+
+def test_calculate_coeff_avgs(tmp_path, pdf_language_detector):
+    # Given
+    (tmp_path / 'page-1.json').write_text(json.dumps(dict(ENG=1, FRA=0, source='text')))
+    (tmp_path / 'page-2.json').write_text(json.dumps(dict(ENG=0.5, FRA=0.5, source='ocr')))
+    # When
+    result = pdf_language_detector.calculate_coeff_avgs(tmp_path)
+    # Then
+    assert result == dict(ENG=0.75, FRA=0.25)
+
+def test_get_lang_files_in_page_order(tmp_path, pdf_language_detector):
+    # Given
+    for page in (10, 2, 1, 3, 5, 4, 6):
+        (tmp_path / f'page-{page}.json').write_text(json.dumps(dict(ENG=1, FRA=0)))
+    # When
+    result = pdf_language_detector.get_lang_files(tmp_path)
+    # Then
+    assert [lang_file.stem for lang_file in result] == ['page-1', 'page-2', 'page-3', 'page-4', 'page-5']
+
+def test_process_pages_stops_when_converged(pdf_language_detector):
+    # Given
+    input_file = Path('/input/test.pdf')
+    pdf_language_detector.confidence_margin = 0.8
+    coeff_avgs = CoeffAverages(pdf_language_detector.coeff_langs)
+    with patch.object(PdfLanguageDetector, 'render_page'), \
+        patch.object(PdfLanguageDetector, 'extract_text', return_value='Sample Text'), \
+        patch.object(PdfLanguageDetector, 'process_text', return_value=dict(ENG=0.95, FRA=0.05)) as mocked_process_text:
+        # When
+        pdf_language_detector.process_pages(input_file, [1, 2, 3], Path('/images'), Path('/texts'), Path('/langs'), coeff_avgs)
+        # Then
+        assert mocked_process_text.call_count == 1
+        assert coeff_avgs.count == 1
+
+def test_process_pages_doesnt_stop_without_margin(pdf_language_detector):
+    # Given
+    input_file = Path('/input/test.pdf')
+    coeff_avgs = CoeffAverages(pdf_language_detector.coeff_langs)
+    with patch.object(PdfLanguageDetector, 'render_page'), \
+        patch.object(PdfLanguageDetector, 'extract_text', return_value='Sample Text'), \
+        patch.object(PdfLanguageDetector, 'process_text', return_value=dict(ENG=0.95, FRA=0.05)):
+        # When
+        pdf_language_detector.process_pages(input_file, [1, 2, 3], Path('/images'), Path('/texts'), Path('/langs'), coeff_avgs)
+        # Then
+        assert coeff_avgs.count == 3
+
+def test_process_text_layer_stops_when_converged(pdf_language_detector):
+    # Given
+    input_file = Path('/input/test.pdf')
+    pdf_language_detector.min_text_chars = 10
+    pdf_language_detector.confidence_margin = 0.8
+    pages_texts = ['A sentence long enough', '', 'Another sentence long enough']
+    with patch.object(PdfLanguageDetector, 'extract_text_layer', return_value=pages_texts), \
+        patch.object(PdfLanguageDetector, 'process_text', return_value=dict(ENG=0.95, FRA=0.05)):
+        # When
+        result = pdf_language_detector.process_text_layer(input_file, Path('/texts'), Path('/langs'))
+        # Then
+        assert result == []
+
+def test_get_page_tasks(pdf_language_detector):
+    # Given
+    input_file = Path('/input/test.pdf')
+    pdf_language_detector.pages_per_task = 2
+    with patch.object(PdfLanguageDetector, 'get_pages', return_value=[1, 2, 3, 4, 5]):
+        # When
+        result = pdf_language_detector.get_page_tasks(input_file)
+        # Then
+        assert result == [[1, 2], [3, 4], [5]]
+
+def test_get_page_tasks_without_pages_per_task(pdf_language_detector):
+    # Given
+    input_file = Path('/input/test.pdf')
+    with patch.object(PdfLanguageDetector, 'get_pages') as mocked_get_pages:
+        # When
+        result = pdf_language_detector.get_page_tasks(input_file)
+        # Then
+        mocked_get_pages.assert_not_called()
+        assert result == [None]
+
+def test_run_task_splits_file(pdf_language_detector):
+    # Given
+    input_file = Path('/input/test.pdf')
+    pdf_language_detector.pages_per_task = 2
+    with patch.object(PdfLanguageDetector, 'get_pages', return_value=[1, 2, 3, 4, 5]), \
+        patch.object(PdfLanguageDetector, 'analyse_file') as mocked_analyse_file, \
+        patch.object(PdfLanguageDetector, 'save_status') as mocked_save_status:
+        # When
+        result = pdf_language_detector.run_task(PdfLanguageDetector.TASK_FILE, input_file, Path('/output/test'), None)
+        # Then
+        mocked_analyse_file.assert_not_called()
+        mocked_save_status.assert_not_called()
+        assert result['status'] == PdfLanguageDetector.STATUS_SPLIT
+        assert result['page_tasks'] == [[1, 2], [3, 4], [5]]
+        assert result['cache_key'] is None
+
+def test_run_task_doesnt_split_cached_file(tmp_path):
+    # Given
+    input_file = tmp_path / 'test.pdf'
+    input_file.write_bytes(b'%PDF-1.4 content')
+    detector = PdfLanguageDetector(['eng', 'fra'], tmp_path, tmp_path / 'out', pages_per_task=2,
+                                   cache_file=tmp_path / 'cache.sqlite')
+    detector.cache.set(detector.get_cache_key(input_file), dict(pages=[], avgs=dict(ENG=1, FRA=0), pages_used=1))
+    with patch.object(PdfLanguageDetector, 'get_pages') as mocked_get_pages:
+        # When
+        result = detector.run_task(PdfLanguageDetector.TASK_FILE, input_file, detector.get_output_dir(input_file), None)
+        # Then
+        mocked_get_pages.assert_not_called()
+        assert result['status'] == PdfLanguageDetector.STATUS_CACHED
+
+def test_analyse_page_task(pdf_language_detector):
+    # Given
+    input_file = Path('/input/test.pdf')
+    coeff_avgs = CoeffAverages(['ENG', 'FRA'])
+    coeff_avgs.add(dict(ENG=0.8, FRA=0.2))
+    with patch.object(PdfLanguageDetector, 'create_page_directories'), \
+        patch.object(PdfLanguageDetector, 'analyse_pages', return_value=coeff_avgs) as mocked_analyse_pages, \
+        patch.object(PdfLanguageDetector, 'aggregate_pages') as mocked_aggregate_pages:
+        # When
+        result = pdf_language_detector.analyse_page_task(input_file, Path('/output/test'), [1, 2])
+        # Then
+        mocked_analyse_pages.assert_called_once_with(input_file, Path('/output/test'), [1, 2])
+        mocked_aggregate_pages.assert_not_called()
+        assert result == dict(status=PdfLanguageDetector.STATUS_DONE, averages=coeff_avgs.to_dict())
+
+def test_run_task_aggregate(pdf_language_detector):
+    # Given
+    input_file = Path('/input/test.pdf')
+    timings = dict(ocr=dict(seconds=1.5, calls=2))
+    with patch.object(PdfLanguageDetector, 'extract_meta'), \
+        patch.object(PdfLanguageDetector, 'aggregate_pages', return_value='ENG'), \
+        patch.object(PdfLanguageDetector, 'update_meta') as mocked_update_meta, \
+        patch.object(PdfLanguageDetector, 'save_status', side_effect=lambda input_file, output_file_dir, status: status):
+        # When
+        result = pdf_language_detector.run_task(PdfLanguageDetector.TASK_AGGREGATE, input_file, Path('/output/test'), None,
+                                                timings)
+        # Then
+        assert result == dict(status=PdfLanguageDetector.STATUS_DONE, lang='ENG', timings=timings)
+        mocked_update_meta.assert_called_once_with(Path('/output/test'), timings=timings)
+
+def test_run_task_measures_stages(pdf_language_detector):
+    # Given
+    input_file = Path('/input/test.pdf')
+    def analyse_pages(input_file, output_file_dir, pages):
+        with StageTimings.measure(StageTimings.OCR):
+            pass
+        return CoeffAverages(['ENG'])
+    with patch.object(PdfLanguageDetector, 'create_page_directories'), \
+        patch.object(PdfLanguageDetector, 'analyse_pages', side_effect=analyse_pages):
+        # When
+        result = pdf_language_detector.run_task(PdfLanguageDetector.TASK_PAGES, input_file, Path('/output/test'), [1, 2])
+        # Then
+        assert result['status'] == PdfLanguageDetector.STATUS_DONE
+        assert result['timings'][StageTimings.OCR]['calls'] == 1
+
+def test_run_task_failure(pdf_language_detector):
+    # Given
+    input_file = Path('/input/test.pdf')
+    with patch.object(PdfLanguageDetector, 'analyse_pages', side_effect=ErrorReturnCode_1('pdftoppm', b'', b'')), \
+        patch.object(PdfLanguageDetector, 'create_page_directories'):
+        # When
+        result = pdf_language_detector.run_task(PdfLanguageDetector.TASK_PAGES, input_file, Path('/output/test'), [1, 2])
+        # Then
+        assert result == dict(status=PdfLanguageDetector.STATUS_FAILED)
+
+def test_process_result_of_split_file(pdf_language_detector):
+    # Given
+    input_file = Path('/input/test.pdf')
+    output_file_dir = Path('/output/test')
+    tasks_queue = MagicMock()
+    tasks_pending = dict()
+    progress = MagicMock()
+    split = dict(status=PdfLanguageDetector.STATUS_SPLIT, page_tasks=[[1, 2], [3]], cache_key='key',
+                 timings=dict(ocr=dict(seconds=1.0, calls=2)))
+    # When
+    result = pdf_language_detector.process_result(((PdfLanguageDetector.TASK_FILE, input_file, output_file_dir, None), split),
+                                                  tasks_queue, tasks_pending, progress, 'task', Throughput())
+    # Then
+    assert result == 2
+    assert tasks_queue.put.call_args_list == [call((PdfLanguageDetector.TASK_PAGES, input_file, output_file_dir, [1, 2])),
+                                              call((PdfLanguageDetector.TASK_PAGES, input_file, output_file_dir, [3]))]
+    assert tasks_pending[input_file]['remaining'] == 2
+    assert tasks_pending[input_file]['cache_key'] == 'key'
+    assert tasks_pending[input_file]['timings'] == dict(ocr=dict(seconds=1.0, calls=2))
+    progress.update.assert_not_called()
+
+def test_process_result_of_page_tasks(pdf_language_detector):
+    # Given
+    input_file = Path('/input/test.pdf')
+    output_file_dir = Path('/output/test')
+    tasks_queue = MagicMock()
+    tasks_pending = {input_file: dict(remaining=2, failed=False, timings=None, averages=CoeffAverages(['ENG', 'FRA']),
+                                      cache_key='key')}
+    progress = MagicMock()
+    throughput = Throughput()
+    averages = CoeffAverages(['ENG', 'FRA'])
+    averages.add(dict(ENG=0.8, FRA=0.2))
+    done = dict(status=PdfLanguageDetector.STATUS_DONE, timings=dict(ocr=dict(seconds=1.0, calls=2)),
+                averages=averages.to_dict())
+    # When
+    first = pdf_language_detector.process_result(((PdfLanguageDetector.TASK_PAGES, input_file, output_file_dir, [1, 2]), done),
+                                                 tasks_queue, tasks_pending, progress, 'task', throughput)
+    second = pdf_language_detector.process_result(((PdfLanguageDetector.TASK_PAGES, input_file, output_file_dir, [3]), done),
+                                                  tasks_queue, tasks_pending, progress, 'task', throughput)
+    # Then
+    assert (first, second) == (0, 1)
+    assert tasks_pending == dict()
+    tasks_queue.put.assert_called_once_with((PdfLanguageDetector.TASK_AGGREGATE, input_file, output_file_dir, None,
+                                             dict(ocr=dict(seconds=2.0, calls=4)),
+                                             dict(sums=dict(ENG=1.6, FRA=0.4), weight=2, count=2, skipped=dict()), 'key'))
+    progress.update.assert_not_called()
+    assert throughput.docs == 0
+
+def test_process_result_of_failed_page_tasks(pdf_language_detector):
+    # Given
+    input_file = Path('/input/test.pdf')
+    output_file_dir = Path('/output/test')
+    tasks_queue = MagicMock()
+    tasks_pending = {input_file: dict(remaining=1, failed=True, timings=None, averages=CoeffAverages(['ENG', 'FRA']),
+                                      cache_key=None)}
+    throughput = Throughput()
+    with patch.object(PdfLanguageDetector, 'print_task_status') as mocked_print_task_status:
+        # When
+        result = pdf_language_detector.process_result(((PdfLanguageDetector.TASK_PAGES, input_file, output_file_dir, [3]),
+                                                       dict(status=PdfLanguageDetector.STATUS_DONE)),
+                                                      tasks_queue, tasks_pending, MagicMock(), 'task', throughput)
+        # Then
+        assert result == 0
+        tasks_queue.put.assert_not_called()
+        mocked_print_task_status.assert_called_once_with(input_file, dict(status=PdfLanguageDetector.STATUS_FAILED))
+        assert throughput.docs == 1
+
+def test_process_input_files(tmp_path, capsys):
+    # Given
+    input_dir = tmp_path / 'input'
+    input_dir.mkdir()
+    for name in ('a.pdf', 'b.pdf', 'c.pdf'):
+        (input_dir / name).write_bytes(b'%PDF-1.4 content')
+    detector = PdfLanguageDetector(['eng', 'fra'], input_dir, tmp_path / 'out', parallel=2)
+    with patch.object(PdfLanguageDetector, 'analyse_file_status', return_value=dict(status=PdfLanguageDetector.STATUS_DONE, lang='ENG')), \
+        patch.object(PdfLanguageDetector, 'update_meta'), \
+        patch.object(PdfLanguageDetector, 'read_meta', return_value=dict(pages_used=2)):
+        # When
+        detector.process_input_files()
+        # Then
+        assert sorted(Path(entry['input_file']).name for entry in detector.manifest.read()) == ['a.pdf', 'b.pdf', 'c.pdf']
+        assert '3 PDF files and 6 pages analysed' in capsys.readouterr().out
+
+def test_analyse_file_status_restores_cached_result(tmp_path):
+    # Given
+    input_dir = tmp_path / 'input'
+    input_dir.mkdir()
+    detector = PdfLanguageDetector(['eng', 'fra'], input_dir, tmp_path / 'out', cache_file=tmp_path / 'cache.sqlite')
+    for name in ('a.pdf', 'b.pdf'):
+        (input_dir / name).write_bytes(b'%PDF-1.4 content')
+    def analyse_file(input_file, output_file_dir):
+        detector.create_page_directories(output_file_dir)
+        detector.extract_meta(input_file)
+        (output_file_dir / 'texts' / 'page-1.txt').write_text('Ceci est une page.')
+        (output_file_dir / 'langs' / 'page-1.json').write_text(json.dumps(dict(ENG=0.1, FRA=0.9)))
+        return detector.aggregate_pages(output_file_dir)
+    with patch.object(detector, 'analyse_file', side_effect=analyse_file) as mocked_analyse_file:
+        # When
+        first = detector.analyse_file_status(input_dir / 'a.pdf', detector.get_output_dir(input_dir / 'a.pdf'))
+        second = detector.analyse_file_status(input_dir / 'b.pdf', detector.get_output_dir(input_dir / 'b.pdf'))
+        # Then
+        assert mocked_analyse_file.call_count == 1
+        assert first == dict(status=PdfLanguageDetector.STATUS_DONE, lang='FRA')
+        assert second == dict(status=PdfLanguageDetector.STATUS_CACHED, lang='FRA')
+        output_file_dir = detector.get_output_dir(input_dir / 'b.pdf')
+        meta = json.loads((output_file_dir / 'meta.json').read_text())
+        assert meta['input_file'] == str((input_dir / 'b.pdf').resolve())
+        assert meta['cache_hit'] is True
+        assert (output_file_dir / 'texts' / 'page-1.txt').read_text() == 'Ceci est une page.'
+        assert (output_file_dir / 'avgs.json').read_text() == (detector.get_output_dir(input_dir / 'a.pdf') / 'avgs.json').read_text()
+
+def test_analyse_file_with_skip_images(tmp_path):
+    # Given
+    detector = PdfLanguageDetector(['eng', 'fra'], tmp_path, tmp_path / 'out', min_text_chars=10, skip_images=True)
+    input_file = tmp_path / 'test.pdf'
+    output_file_dir = detector.get_output_dir(input_file)
+    detector.create_output_directories(output_file_dir / 'images')
+    for page in (1, 2):
+        Image.new('RGB', (4, 2)).save(output_file_dir / 'images' / f'page-{page}.jpg')
+    text_layer = 'This is a page written in English with enough text.\f\f'
+    with patch('src.pld.pdftotext', return_value=text_layer), \
+        patch.object(PytesseractBackend, 'image_to_string', return_value='Ceci est une page écrite en français.') as mocked_image_to_string:
+        # When
+        detector.analyse_file(input_file, output_file_dir)
+        # Then
+        assert mocked_image_to_string.call_count == 1
+        assert json.loads((output_file_dir / 'langs' / 'page-1.json').read_text())['source'] == 'text'
+        assert json.loads((output_file_dir / 'langs' / 'page-2.json').read_text())['source'] == 'ocr'
+        assert detector.read_meta(output_file_dir)['pages_used'] == 2
+
+def test_analyse_pages_with_skip_images_in_range(tmp_path):
+    # Given
+    detector = PdfLanguageDetector(['eng', 'fra'], tmp_path, tmp_path / 'out', text_layer=False, skip_images=True)
+    output_file_dir = detector.get_output_dir(tmp_path / 'test.pdf')
+    detector.create_page_directories(output_file_dir)
+    detector.create_output_directories(output_file_dir / 'images')
+    for page in (1, 2, 3):
+        Image.new('RGB', (4, 2)).save(output_file_dir / 'images' / f'page-{page}.jpg')
+    with patch.object(PytesseractBackend, 'image_to_string', return_value='Ceci est une page écrite en français.'):
+        # When
+        result = detector.analyse_pages(tmp_path / 'test.pdf', output_file_dir, [2, 3])
+        # Then
+        assert result.count == 2
+        assert sorted(path.name for path in (output_file_dir / 'langs').iterdir()) == ['page-2.json', 'page-3.json']
+
+def test_process_images_stops_when_converged(tmp_path, pdf_language_detector):
+    # Given
+    pdf_language_detector.confidence_margin = 0.8
+    for page in (1, 2, 3):
+        Image.new('RGB', (4, 2)).save(tmp_path / f'page-{page}.jpg')
+    with patch.object(PdfLanguageDetector, 'extract_text', return_value='Sample Text'), \
+        patch.object(PdfLanguageDetector, 'process_text', return_value=dict(ENG=0.95, FRA=0.05)) as mocked_process_text:
+        # When
+        pdf_language_detector.process_images(tmp_path, tmp_path, tmp_path)
+        # Then
+        assert mocked_process_text.call_count == 1
+
+def test_analyse_file_without_page_files(tmp_path):
+    # Given
+    detector = PdfLanguageDetector(['eng', 'fra'], tmp_path, tmp_path / 'out', min_text_chars=10, page_files=False,
+                                   weighting=CoeffAverages.WEIGHTING_CHARS)
+    input_file = tmp_path / 'test.pdf'
+    output_file_dir = detector.get_output_dir(input_file)
+    text_layer = 'This is a page written in English, with sentences long enough to outweigh the next page.\fCeci\f'
+    with patch('src.pld.pdftotext', return_value=text_layer), \
+        patch.object(PdfLanguageDetector, 'render_page', return_value=Image.new('RGB', (4, 2))), \
+        patch.object(PytesseractBackend, 'image_to_string', return_value='Ceci est en français.'), \
+        patch.object(PdfLanguageDetector, 'read_coeff_avgs') as mocked_read_coeff_avgs:
+        # When
+        result = detector.analyse_file(input_file, output_file_dir)
+        # Then
+        mocked_read_coeff_avgs.assert_not_called()
+        assert result == 'ENG'
+        assert list((output_file_dir / 'langs').iterdir()) == []
+        assert list((output_file_dir / 'texts').iterdir()) == []
+        assert detector.read_meta(output_file_dir)['pages_used'] == 2
+        assert (output_file_dir / 'avgs.json').is_file()
+
+@pytest.mark.parametrize('options', [dict(confidence_margin=0.5), dict(text_layer=False), dict(min_text_chars=10),
+                                     dict(weighting=CoeffAverages.WEIGHTING_CHARS)])
+def test_cache_misses_with_other_settings(tmp_path, options):
+    # Given
+    input_file = tmp_path / 'a.pdf'
+    input_file.write_bytes(b'%PDF-1.4 content')
+    detector = PdfLanguageDetector(['eng', 'fra'], tmp_path, tmp_path / 'out', cache_file=tmp_path / 'cache.sqlite')
+    other_detector = PdfLanguageDetector(['eng', 'fra'], tmp_path, tmp_path / 'out', cache_file=tmp_path / 'cache.sqlite',
+                                         **options)
+    detector.cache.set(detector.get_cache_key(input_file), dict(pages=[], avgs=dict(ENG=1, FRA=0), pages_used=1))
+    # When
+    result = other_detector.cache.has(other_detector.get_cache_key(input_file))
+    # Then
+    assert detector.cache.has(detector.get_cache_key(input_file))
+    assert not result
+
+def test_analyse_file_with_sqlite_store(tmp_path):
+    # Given
+    detector = PdfLanguageDetector(['eng', 'fra'], tmp_path, tmp_path / 'out', min_text_chars=10, store='sqlite')
+    input_file = tmp_path / 'test.pdf'
+    output_file_dir = detector.get_output_dir(input_file)
+    text_layer = 'This is a page written in English with enough text.\f'
+    with patch('src.pld.pdftotext', return_value=text_layer):
+        # When
+        result = detector.analyse_file(input_file, output_file_dir)
+        # Then
+        assert result == 'ENG'
+        assert not output_file_dir.exists()
+        assert detector.is_already_analyzed(output_file_dir)
+        assert detector.read_meta(output_file_dir)['pages_used'] == 1
+        assert detector.read_pages(output_file_dir)[0]['langs']['source'] == 'text'
+
+def write_to_sqlite_store(detector: PdfLanguageDetector, input_file: Path, written, done):
+    output_file_dir = detector.get_output_dir(input_file)
+    detector.extract_meta(input_file)
+    detector.process_text('This is a page written in English.', 'page-1', output_file_dir / 'texts',
+                          output_file_dir / 'langs', 'text')
+    written.set()
+    # Still analysing the document
+    done.wait(10)
+
+def test_sqlite_store_writes_concurrently(tmp_path):
+    # Given
+    detector = PdfLanguageDetector(['eng', 'fra'], tmp_path, tmp_path / 'out', store='sqlite')
+    written, done = multiprocessing.Event(), multiprocessing.Event()
+    process = multiprocessing.Process(target=write_to_sqlite_store,
+                                      args=(detector, tmp_path / 'a.pdf', written, done))
+    process.start()
+    try:
+        assert written.wait(10)
+        # When
+        connection = sqlite3.connect(str(detector.store.store_file), timeout=1)
+        connection.execute('BEGIN IMMEDIATE')
+        connection.rollback()
+        connection.close()
+        detector.extract_meta(tmp_path / 'b.pdf')
+        # Then
+        assert detector.read_meta(detector.get_output_dir(tmp_path / 'a.pdf'))['input_file'] == str(tmp_path / 'a.pdf')
+        assert detector.read_pages(detector.get_output_dir(tmp_path / 'a.pdf'))[0]['name'] == 'page-1'
+    finally:
+        done.set()
+        process.join()
+
+def test_save_timings_in_sqlite_store(tmp_path):
+    # Given
+    detector = PdfLanguageDetector(['eng', 'fra'], tmp_path, tmp_path / 'out', store='sqlite')
+    input_file = tmp_path / 'test.pdf'
+    output_file_dir = detector.get_output_dir(input_file)
+    detector.extract_meta(input_file)
+    stage_timings = StageTimings()
+    stage_timings.add_time(StageTimings.OCR, 1.5)
+    # When
+    detector.save_timings(input_file, output_file_dir, dict(status=PdfLanguageDetector.STATUS_DONE, lang='ENG'),
+                          stage_timings)
+    # Then
+    store = SqliteStore(detector.store.store_file)
+    assert store.get_meta(output_file_dir)['timings'] == stage_timings.to_dict()
+
+def test_is_already_analyzed_in_journal(tmp_path):
+    # Given
+    detector = PdfLanguageDetector(['eng', 'fra'], tmp_path, tmp_path / 'out', resume=True)
+    output_file_dir = detector.get_output_dir(tmp_path / 'test.pdf')
+    detector.journal.add_document(output_file_dir)
+    detector.journal.load()
+    with patch('pathlib.Path.exists') as mocked_exists:
+        # When
+        result = detector.is_already_analyzed(output_file_dir)
+        # Then
+        assert result
+        mocked_exists.assert_not_called()
+
+def test_analyse_pages_resumes_from_journal(tmp_path):
+    # Given
+    detector = PdfLanguageDetector(['eng', 'fra'], tmp_path, tmp_path / 'out', text_layer=False, resume=True)
+    input_file = tmp_path / 'test.pdf'
+    output_file_dir = detector.get_output_dir(input_file)
+    english = "The quick brown fox jumps over the lazy dog while the children are playing in the garden."
+    french = "Le renard brun saute par-dessus le chien paresseux pendant que les enfants jouent dans le jardin."
+    detector.create_page_directories(output_file_dir)
+    detector.process_text(english, 'page-1', output_file_dir / 'texts', output_file_dir / 'langs',
+                          PdfLanguageDetector.SOURCE_OCR)
+    # Killed after the text of page 2 was written, before its language
+    (output_file_dir / 'texts' / 'page-2.txt').write_text(english)
+    detector.journal.load()
+    with patch.object(PdfLanguageDetector, 'get_pages', return_value=[1, 2, 3]), \
+        patch.object(PdfLanguageDetector, 'render_page', return_value=Image.new('RGB', (10, 10), 'white')) as mocked_render_page, \
+        patch.object(PdfLanguageDetector, 'extract_text', return_value=french):
+        # When
+        detector.analyse_pages(input_file, output_file_dir)
+        # Then
+        assert mocked_render_page.call_args_list == [call(input_file, 2), call(input_file, 3)]
+        assert (output_file_dir / 'texts' / 'page-1.txt').read_text() == english
+        assert (output_file_dir / 'texts' / 'page-2.txt').read_text() == french
+        assert detector.read_coeff_avgs(output_file_dir / 'langs').count == 3
+
+def test_save_status_appends_to_manifest(tmp_path):
+    # Given
+    detector = PdfLanguageDetector(['eng', 'fra'], tmp_path, tmp_path / 'out')
+    input_file = tmp_path / 'test.pdf'
+    output_file_dir = detector.get_output_dir(input_file)
+    with patch.object(PdfLanguageDetector, 'read_meta', return_value=dict(pages_used=3)):
+        # When
+        done = detector.save_status(input_file, output_file_dir, dict(status=PdfLanguageDetector.STATUS_DONE, lang='FRA'))
+        failed = detector.save_status(input_file, output_file_dir, dict(status=PdfLanguageDetector.STATUS_FAILED))
+        # Then
+        assert list(detector.manifest.read()) == [dict(input_file=str(input_file.resolve()),
+                                                       output_dir=str(output_file_dir.resolve()),
+                                                       lang='FRA')]
+        assert done == dict(status=PdfLanguageDetector.STATUS_DONE, lang='FRA', pages=3)
+        assert failed == dict(status=PdfLanguageDetector.STATUS_FAILED)
+        detector.journal.load()
+        assert detector.journal.is_done(output_file_dir)
+
+def test_save_status_appends_skipped_to_manifest(tmp_path):
+    # Given
+    detector = PdfLanguageDetector(['eng', 'fra'], tmp_path, tmp_path / 'out', resume=True)
+    input_file = tmp_path / 'test.pdf'
+    output_file_dir = detector.get_output_dir(input_file)
+    # Analysed before the manifest and the journal existed
+    output_file_dir.mkdir(parents=True)
+    (output_file_dir / 'avgs.json').write_text(json.dumps(dict(ENG=0.2, FRA=0.8)))
+    detector.journal.load()
+    # When
+    result = detector.save_status(input_file, output_file_dir, dict(status=PdfLanguageDetector.STATUS_SKIPPED))
+    # Then
+    assert result == dict(status=PdfLanguageDetector.STATUS_SKIPPED)
+    assert list(detector.manifest.read()) == [dict(input_file=str(input_file.resolve()),
+                                                   output_dir=str(output_file_dir.resolve()), lang='FRA')]
+    detector.journal.load()
+    assert detector.journal.is_done(output_file_dir)
+
+def test_get_input_files_walks_input_dir(tmp_path):
+    # Given
+    for path in ('b.pdf', 'a.pdf', 'notes.txt', 'sub/c.pdf', 'sub/deeper/d.pdf'):
+        (tmp_path / path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / path).write_bytes(b'%PDF')
+    detector = PdfLanguageDetector(['eng', 'fra'], tmp_path, tmp_path / 'out')
+    # When
+    result = list(detector.get_input_files())
+    # Then
+    assert [path.relative_to(tmp_path).as_posix() for path in result] == ['a.pdf', 'b.pdf', 'sub/c.pdf', 'sub/deeper/d.pdf']
+
+def test_get_input_files_doesnt_follow_symlinks(tmp_path):
+    # Given
+    (tmp_path / 'sub').mkdir()
+    (tmp_path / 'sub' / 'a.pdf').write_bytes(b'%PDF')
+    (tmp_path / 'sub' / 'loop').symlink_to(tmp_path, target_is_directory=True)
+    detector = PdfLanguageDetector(['eng', 'fra'], tmp_path, tmp_path / 'out')
+    # When
+    result = list(detector.get_input_files())
+    # Then
+    assert [path.relative_to(tmp_path).as_posix() for path in result] == ['sub/a.pdf']
+
+def test_get_input_files_from_input_list(tmp_path):
+    # Given
+    input_list = tmp_path / 'files.txt'
+    input_list.write_text(f'{tmp_path}/a.pdf\n\n{tmp_path}/my file.pdf\n')
+    detector = PdfLanguageDetector(['eng', 'fra'], tmp_path, tmp_path / 'out', input_list=input_list)
+    # When
+    result = list(detector.get_input_files())
+    # Then
+    assert result == [tmp_path / 'a.pdf', tmp_path / 'my file.pdf']
+
+def test_get_input_files_from_stdin(tmp_path):
+    # Given
+    detector = PdfLanguageDetector(['eng', 'fra'], tmp_path, tmp_path / 'out', input_list=Path('-'))
+    with patch('src.inputs.sys.stdin', io.StringIO(f'{tmp_path}/a.pdf\n{tmp_path}/b.pdf\n')):
+        # When
+        result = list(detector.get_input_files())
+        # Then
+        assert result == [tmp_path / 'a.pdf', tmp_path / 'b.pdf']
+
+def test_get_input_files_with_shards(tmp_path):
+    # Given
+    input_files = [tmp_path / f'{index}.pdf' for index in range(100)]
+    input_list = tmp_path / 'files.txt'
+    input_list.write_text(''.join(f'{input_file}\n' for input_file in input_files))
+    detectors = [PdfLanguageDetector(['eng', 'fra'], tmp_path, tmp_path / 'out', input_list=input_list, shard=(index, 3))
+                 for index in (1, 2, 3)]
+    # When
+    shards = [list(detector.get_input_files()) for detector in detectors]
+    # Then
+    assert sorted(sum(shards, []), key=input_files.index) == input_files
+    assert all(len(shard) > 0 for shard in shards)
+    assert shards[0] == list(detectors[0].get_input_files())
+
+def test_process_input_files_split_in_page_tasks(tmp_path):
+    # Given
+    input_dir = tmp_path / 'input'
+    input_dir.mkdir()
+    (input_dir / 'a.pdf').write_bytes(b'%PDF-1.4 content')
+    detector = PdfLanguageDetector(['eng', 'fra'], input_dir, tmp_path / 'out', parallel=2, pages_per_task=2)
+    def analyse_pages(input_file, output_file_dir, pages):
+        coeff_avgs = detector.create_coeff_avgs()
+        for _ in pages:
+            coeff_avgs.add(dict(ENG=0.9, FRA=0.1))
+        return coeff_avgs
+    with patch.object(PdfLanguageDetector, 'get_pages', return_value=[1, 2, 3, 4, 5]), \
+        patch.object(PdfLanguageDetector, 'analyse_pages', side_effect=analyse_pages):
+        # When
+        detector.process_input_files()
+        # Then
+        [entry] = detector.manifest.read()
+        assert entry['lang'] == 'ENG'
+        assert detector.read_meta(detector.get_output_dir(input_dir / 'a.pdf'))['pages_used'] == 5
+
+def test_process_input_files_outside_relative_to(tmp_path, capsys):
+    # Given
+    input_dir = tmp_path / 'input'
+    input_dir.mkdir()
+    input_list = tmp_path / 'files.txt'
+    input_list.write_text(f'{input_dir}/a.pdf\n{tmp_path}/elsewhere/b.pdf\n')
+    detector = PdfLanguageDetector(['eng', 'fra'], input_dir, tmp_path / 'out', input_list=input_list,
+                                   shard=(1, 1))
+    with patch.object(PdfLanguageDetector, 'analyse_file_status', return_value=dict(status=PdfLanguageDetector.STATUS_DONE, lang='ENG')), \
+        patch.object(PdfLanguageDetector, 'update_meta'), \
+        patch.object(PdfLanguageDetector, 'read_meta', return_value=dict(pages_used=2)):
+        # When
+        detector.process_input_files()
+        # Then
+        assert [Path(entry['input_file']).name for entry in detector.manifest.read()] == ['a.pdf']
+        output = capsys.readouterr().out
+        assert 'FAILED' in output
+        assert '2 PDF files and 2 pages analysed' in output
+
+def test_process_input_files_from_work_queue(tmp_path):
+    # Given
+    input_dir = tmp_path / 'input'
+    input_dir.mkdir()
+    input_files = [input_dir / f'{name}.pdf' for name in ('a', 'b', 'c')]
+    detector = PdfLanguageDetector(['eng', 'fra'], input_dir, tmp_path / 'out', parallel=2, work_queue=tmp_path / 'queue.sqlite')
+    detector.work_queue.put(input_files)
+    with patch.object(PdfLanguageDetector, 'analyse_file_status', return_value=dict(status=PdfLanguageDetector.STATUS_DONE, lang='ENG')), \
+        patch.object(PdfLanguageDetector, 'read_meta', return_value=dict(pages_used=1)):
+        # When
+        detector.process_input_files()
+        # Then
+        results, _ = detector.work_queue.get_results()
+        assert sorted(result['input_file'] for result in results) == [str(input_file) for input_file in input_files]
+        assert detector.work_queue.is_finished()
+
+def test_process_input_files_from_work_queue_outside_relative_to(tmp_path):
+    # Given
+    input_dir = tmp_path / 'input'
+    input_dir.mkdir()
+    input_files = [input_dir / 'a.pdf', tmp_path / 'elsewhere' / 'b.pdf']
+    detector = PdfLanguageDetector(['eng', 'fra'], input_dir, tmp_path / 'out', work_queue=tmp_path / 'queue.sqlite')
+    detector.work_queue.put(input_files)
+    with patch.object(PdfLanguageDetector, 'analyse_file_status', return_value=dict(status=PdfLanguageDetector.STATUS_DONE, lang='ENG')), \
+        patch.object(PdfLanguageDetector, 'update_meta'), \
+        patch.object(PdfLanguageDetector, 'read_meta', return_value=dict(pages_used=1)):
+        # When
+        detector.process_input_files()
+        # Then
+        results, _ = detector.work_queue.get_results()
+        results = {Path(result['input_file']).name: result for result in results}
+        assert results['a.pdf']['status'] == PdfLanguageDetector.STATUS_DONE
+        assert results['b.pdf']['status'] == PdfLanguageDetector.STATUS_FAILED
+        assert results['b.pdf']['error'] == f"{input_files[1]} isn't under {input_dir}"
+        assert detector.work_queue.is_finished()
+
+def test_pipeline_stage_utilisation():
+    # Given
+    stage = PipelineStage('ocr', 2, 4)
+    stage.queue.put(('task',))
+    # When
+    task = stage.get()
+    with stage.measure():
+        pass
+    stage.busy_time.value = 1.0
+    # Then
+    assert task == ('task',)
+    assert stage.tasks.value == 1
+    assert stage.get_utilisation(1.0) == 0.5
+    assert stage.get_utilisation(0.1) == 1.0
+
+def test_process_stage_result_aggregates_once_rendered(pdf_language_detector):
+    # Given
+    input_file = Path('/input/test.pdf')
+    output_file_dir = Path('/output/test')
+    pipeline = MagicMock()
+    files_pending = {input_file: dict(remaining=0, rendered=False, failed=False, timings=None,
+                                      averages=CoeffAverages(['ENG', 'FRA']))}
+    done = dict(status=PdfLanguageDetector.STATUS_DONE)
+    throughput = Throughput()
+    # When
+    # A page may be detected before the file is fully rendered
+    pdf_language_detector.process_stage_result(((PdfLanguageDetector.TASK_PAGES, input_file, output_file_dir, [1]), done),
+                                               pipeline, files_pending, MagicMock(), 'task', throughput)
+    pdf_language_detector.process_stage_result(((PdfLanguageDetector.TASK_FILE, input_file, output_file_dir, None),
+                                                dict(done, pages_queued=2)),
+                                               pipeline, files_pending, MagicMock(), 'task', throughput)
+    pipeline.detect.queue.put.assert_not_called()
+    pdf_language_detector.process_stage_result(((PdfLanguageDetector.TASK_PAGES, input_file, output_file_dir, [2]), done),
+                                               pipeline, files_pending, MagicMock(), 'task', throughput)
+    # Then
+    pipeline.detect.queue.put.assert_called_once_with((PdfLanguageDetector.TASK_AGGREGATE, input_file, output_file_dir, None,
+                                                       dict(), CoeffAverages(['ENG', 'FRA']).to_dict()))
+    assert throughput.docs == 0
+
+def test_process_stage_result_of_failed_page(pdf_language_detector):
+    # Given
+    input_file = Path('/input/test.pdf')
+    output_file_dir = Path('/output/test')
+    pipeline = MagicMock()
+    files_pending = {input_file: dict(remaining=1, rendered=True, failed=False, timings=None,
+                                      averages=CoeffAverages(['ENG', 'FRA']))}
+    throughput = Throughput()
+    with patch.object(PdfLanguageDetector, 'print_task_status') as mocked_print_task_status:
+        # When
+        pdf_language_detector.process_stage_result(((PdfLanguageDetector.TASK_PAGES, input_file, output_file_dir, [1]),
+                                                    dict(status=PdfLanguageDetector.STATUS_FAILED)),
+                                                   pipeline, files_pending, MagicMock(), 'task', throughput)
+        # Then
+        pipeline.detect.queue.put.assert_not_called()
+        mocked_print_task_status.assert_called_once_with(input_file, dict(status=PdfLanguageDetector.STATUS_FAILED))
+        assert files_pending == dict()
+        assert throughput.docs == 1
+
+def test_process_input_files_in_pipeline(tmp_path, capsys):
+    # Given
+    input_dir = tmp_path / 'input'
+    input_dir.mkdir()
+    for name in ('a.pdf', 'b.pdf'):
+        (input_dir / name).write_bytes(b'%PDF-1.4 content')
+    english = "The quick brown fox jumps over the lazy dog while the children are playing in the garden. " * 3
+    french = "Le renard brun saute par-dessus le chien paresseux pendant que les enfants jouent dans le jardin. " * 3
+    detector = PdfLanguageDetector(['eng', 'fra'], input_dir, tmp_path / 'out', pipeline=True, ocr_workers=2)
+    with patch.object(PdfLanguageDetector, 'extract_text_layer', return_value=[english, '', english]), \
+        patch.object(PdfLanguageDetector, 'render_page', return_value=Image.new('RGB', (10, 10), 'white')), \
+        patch.object(PdfLanguageDetector, 'extract_text', return_value=french):
+        # When
+        detector.process_input_files()
+    # Then
+    output = capsys.readouterr().out
+    assert '2 PDF files and 6 pages analysed' in output
+    assert 'Stage render: 1 workers, 2 tasks' in output
+    assert 'Stage ocr: 2 workers, 2 tasks' in output
+    assert 'Stage detect: 1 workers, 8 tasks' in output
+    langs = json.loads((tmp_path / 'out' / 'a' / 'langs' / 'page-2.json').read_text())
+    assert langs['source'] == PdfLanguageDetector.SOURCE_OCR
+    assert max(['ENG', 'FRA'], key=langs.get) == 'FRA'
+    assert json.loads((tmp_path / 'out' / 'b' / 'avgs.json').read_text())['ENG'] > 0.5
+    meta = json.loads((tmp_path / 'out' / 'a' / 'meta.json').read_text())
+    assert meta['timings'][StageTimings.DETECT]['calls'] == 3
+    assert meta['timings'][StageTimings.AGGREGATE]['calls'] == 1
+
+def test_async_executor_run():
+    # Given
+    executor = AsyncExecutor(2)
+    # When
+    output = asyncio.run(executor.run('cat', stdin=b'page text'))
+    # Then
+    assert output == b'page text'
+
+def test_async_executor_run_failure():
+    # Given
+    executor = AsyncExecutor(2)
+    # When / Then
+    with pytest.raises(ErrorReturnCode_1):
+        asyncio.run(executor.run('false'))
+
+def test_async_executor_caps_processes():
+    # Given
+    executor = AsyncExecutor(2)
+    async def run_all():
+        await asyncio.gather(*(executor.run('sleep', 0.2) for _ in range(4)))
+    # When
+    start = time.monotonic()
+    asyncio.run(run_all())
+    # Then
+    assert time.monotonic() - start >= 0.4
+
+def test_process_input_files_async(tmp_path, capsys):
+    # Given
+    input_dir = tmp_path / 'input'
+    input_dir.mkdir()
+    for name in ('a.pdf', 'b.pdf'):
+        (input_dir / name).write_bytes(b'%PDF-1.4 content')
+    english = "The quick brown fox jumps over the lazy dog while the children are playing in the garden. " * 3
+    french = "Le renard brun saute par-dessus le chien paresseux pendant que les enfants jouent dans le jardin. " * 3
+    page = io.BytesIO()
+    Image.new('RGB', (10, 10), 'white').save(page, format='PPM')
+    programs = []
+    async def run(self, program, *args, stdin=None, env=None, stage=None):
+        programs.append(program)
+        outputs = dict(pdftotext=f'{english}\f\f{english}\f'.encode(), pdftoppm=page.getvalue(), tesseract=french.encode())
+        return outputs[program]
+    detector = PdfLanguageDetector(['eng', 'fra'], input_dir, tmp_path / 'out', async_executor=True)
+    with patch.object(AsyncExecutor, 'run', new=run):
+        # When
+        detector.process_input_files()
+    # Then
+    output = capsys.readouterr().out
+    assert '2 PDF files and 6 pages analysed' in output
+    assert 'Stage timings per PDF file' in output
+    meta = json.loads((tmp_path / 'out' / 'a' / 'meta.json').read_text())
+    assert meta['timings'][StageTimings.DETECT]['calls'] == 3
+    assert sorted(programs) == ['pdftoppm'] * 2 + ['pdftotext'] * 2 + ['tesseract'] * 2
+    langs = json.loads((tmp_path / 'out' / 'a' / 'langs' / 'page-2.json').read_text())
+    assert langs['FRA'] > langs['ENG']
+    assert json.loads((tmp_path / 'out' / 'b' / 'avgs.json').read_text())['ENG'] > 0.5
@@ -1,9 +1,12 @@
 import json
+import os
 import pytest
 
 from pathlib import Path
 from unittest.mock import patch, MagicMock, Mock
+from src.manifest import Manifest
 from src.report import Report
+from src.store import SqliteStore
 
 
 def test_get_coeff_avgs():
@@ -22,21 +25,6 @@ def test_get_coeff_avgs():
         # Then
         assert result == coeff_avgs_content
 
-def test_is_valid_output_dir():
-    # Given
-    report = Report(report_file=Path('dummy_report_file'))
-    output_dir = Path('/valid/dir')
-    # Mock the Path objects and their is_dir and is_file methods
-    with patch('pathlib.Path.is_dir') as mock_is_dir, patch('pathlib.Path.is_file') as mock_is_file:
-        mock_is_dir.return_value = True
-        mock_is_file.return_value = True
-
-        # When
-        result = report.is_valid_output_dir(output_dir)
-
-        # Then
-        assert result
-
 def test_get_output_dir_meta():
     # Given
     report = Report(report_file=Path('dummy_report_file'))
@@ -54,24 +42,17 @@ def test_get_output_dir_meta():
         # Then
         assert result == meta_content
 
-def test_fetch_valid_reports():
+def test_fetch_valid_reports(tmp_path):
     # Given
-    report = Report(report_file=Path('dummy_report_file'), output_dir=Path('dummy_output_dir'))
-    
-    # Mock methods
-    with patch.object(Report, 'is_valid_output_dir') as mock_is_valid, \
-        patch.object(Report, 'get_reports_dirs') as mock_get_reports_dirs, \
-        patch.object(Report, 'get_output_dir_report') as mock_get_report:
-        
-        mock_is_valid.return_value = True
-        mock_get_reports_dirs.return_value = ['dummy_report']
-        mock_get_report.return_value = 'dummy_report'
+    create_output_dir(tmp_path / 'doc')
+    (tmp_path / 'incomplete' / 'langs').mkdir(parents=True)
+    report = Report(report_file=Path('dummy_report_file'), output_dir=tmp_path)
 
-        # When
-        result = report.fetch_reports()
-        
-        # Then
-        assert result == ['dummy_report']
+    # When
+    result = report.fetch_reports()
+
+    # Then
+    assert [output_dir_report['input_file'] for output_dir_report in result] == ['doc.pdf']
 
 def test_write_report():
     # Given
@@ -96,7 +77,7 @@ def test_write_report():
 
 def test_generate():
     # Given
-    report = Report(report_file=Path('dummy_report_file'), output_dir=Path('dummy_output_dir'))
+    report = Report(report_file=Path('dummy_report_file'), output_dir=Path('dummy_output_dir'), report_format='yaml')
     
     # Mock methods
     with patch.object(Report, 'fetch_reports') as mock_fetch_reports, \
@@ -132,3 +113,171 @@ def test_get_output_unsupported_format():
     # When
     with pytest.raises(NotImplementedError):
         report.get_output(output_dirs)
+
+def test_get_reports_from_sqlite_store(tmp_path):
+    # Given
+    store = SqliteStore.from_output_dir(tmp_path)
+    store.save_meta(tmp_path / 'test', dict(input_file='/input/test.pdf', output_dir=str(tmp_path / 'test')))
+    store.save_avgs(tmp_path / 'test', dict(ENG=0.2, FRA=0.8))
+    store.commit()
+    report = Report(report_file=Path('dummy_report_file'), output_dir=tmp_path, store='sqlite')
+
+    # When
+    result = list(report.get_reports())
+
+    # Then
+    assert result == [dict(lang='FRA', input_file='/input/test.pdf', output_dir=str(tmp_path / 'test'))]
+
+@pytest.fixture
+def reports():
+    return [
+        {'lang': 'ENG', 'input_file': '/input/a.pdf', 'output_dir': '/out/a'},
+        {'lang': 'FRA', 'input_file': '/input/b.pdf', 'output_dir': '/out/b'},
+    ]
+
+def test_generate_streams_json(tmp_path, reports):
+    # Given
+    report = Report(report_file=tmp_path / 'report.json', output_dir=tmp_path)
+    expected = report.spytula_builder(reports).to_json(indent=2)
+
+    with patch.object(Report, 'get_reports', return_value=iter(reports)), \
+        patch.object(Report, 'fetch_reports') as mock_fetch_reports:
+        # When
+        report.generate()
+
+        # Then
+        mock_fetch_reports.assert_not_called()
+        assert (tmp_path / 'report.json').read_text() == expected
+
+def test_generate_streams_empty_json(tmp_path):
+    # Given
+    report = Report(report_file=tmp_path / 'report.json', output_dir=tmp_path)
+
+    with patch.object(Report, 'get_reports', return_value=iter([])):
+        # When
+        report.generate()
+
+        # Then
+        assert json.loads((tmp_path / 'report.json').read_text()) == []
+
+def test_generate_streams_jsonl(tmp_path, reports):
+    # Given
+    report = Report(report_file=tmp_path / 'report.jsonl', output_dir=tmp_path, report_format='jsonl')
+
+    with patch.object(Report, 'get_reports', return_value=iter(reports)):
+        # When
+        report.generate()
+
+        # Then
+        lines = (tmp_path / 'report.jsonl').read_text().splitlines()
+        assert [json.loads(line) for line in lines] == [
+            {'lang': 'ENG', 'inputFile': '/input/a.pdf', 'outputDir': '/out/a', 'langName': 'ENGLISH'},
+            {'lang': 'FRA', 'inputFile': '/input/b.pdf', 'outputDir': '/out/b', 'langName': 'FRENCH'},
+        ]
+
+def test_generate_streams_csv(tmp_path, reports):
+    # Given
+    report = Report(report_file=tmp_path / 'report.csv', output_dir=tmp_path, report_format='csv')
+
+    with patch.object(Report, 'get_reports', return_value=iter(reports)):
+        # When
+        report.generate()
+
+        # Then
+        assert (tmp_path / 'report.csv').read_text().splitlines() == [
+            'lang,inputFile,outputDir,langName',
+            'ENG,/input/a.pdf,/out/a,ENGLISH',
+            'FRA,/input/b.pdf,/out/b,FRENCH',
+        ]
+
+def test_camelize():
+    # Then
+    assert Report.camelize('lang') == 'lang'
+    assert Report.camelize('input_file') == 'inputFile'
+    assert Report.camelize('lang_name') == 'langName'
+
+def create_output_dir(output_dir: Path, lang: str = 'ENG'):
+    for sub_dir in ('images', 'langs', 'texts'):
+        (output_dir / sub_dir).mkdir(parents=True)
+    (output_dir / 'langs' / 'page-1.json').write_text(json.dumps({lang: 1}))
+    (output_dir / 'avgs.json').write_text(json.dumps({lang: 1}))
+    (output_dir / 'meta.json').write_text(json.dumps({'input_file': f'{output_dir.name}.pdf', 'output_dir': str(output_dir)}))
+
+def test_get_reports_dirs(tmp_path):
+    # Given
+    create_output_dir(tmp_path / 'b')
+    create_output_dir(tmp_path / 'a' / 'doc')
+    create_output_dir(tmp_path / 'a' / 'doc' / 'nested')
+    (tmp_path / 'a' / 'empty').mkdir()
+    (tmp_path / 'a' / 'incomplete' / 'langs').mkdir(parents=True)
+    report = Report(report_file=Path('dummy_report_file'), output_dir=tmp_path)
+
+    # When
+    result = list(report.get_reports_dirs())
+
+    # Then
+    assert result == [tmp_path / 'a' / 'doc', tmp_path / 'a' / 'doc' / 'nested', tmp_path / 'b']
+
+def test_get_reports_dirs_doesnt_walk_pages_dirs(tmp_path):
+    # Given
+    create_output_dir(tmp_path / 'doc')
+    report = Report(report_file=Path('dummy_report_file'), output_dir=tmp_path)
+
+    with patch('src.report.os.scandir', wraps=os.scandir) as mock_scandir:
+        # When
+        list(report.get_reports_dirs())
+
+        # Then
+        assert [call.args[0] for call in mock_scandir.call_args_list] == [tmp_path, tmp_path / 'doc']
+
+def test_get_reports_dirs_doesnt_follow_symlinks(tmp_path):
+    # Given
+    create_output_dir(tmp_path / 'a' / 'doc')
+    (tmp_path / 'a' / 'loop').symlink_to(tmp_path, target_is_directory=True)
+    report = Report(report_file=Path('dummy_report_file'), output_dir=tmp_path)
+
+    # When
+    result = list(report.get_reports_dirs())
+
+    # Then
+    assert result == [tmp_path / 'a' / 'doc']
+
+def test_get_reports_keeps_order_with_threads(tmp_path):
+    # Given
+    for index, name in enumerate(['d', 'c', 'b', 'a', 'e']):
+        create_output_dir(tmp_path / name, ['ENG', 'FRA'][index % 2])
+    report = Report(report_file=Path('dummy_report_file'), output_dir=tmp_path, threads=3)
+
+    # When
+    result = list(report.get_reports())
+
+    # Then
+    assert [Path(r['output_dir']).name for r in result] == ['a', 'b', 'c', 'd', 'e']
+    assert [r['lang'] for r in result] == ['FRA', 'ENG', 'FRA', 'ENG', 'ENG']
+
+def test_get_reports_from_manifest(tmp_path):
+    # Given
+    create_output_dir(tmp_path / 'a')
+    manifest = Manifest.from_output_dir(tmp_path)
+    manifest.append(dict(input_file='/input/b.pdf', output_dir=str(tmp_path / 'b'), lang='FRA'))
+    report = Report(report_file=Path('dummy_report_file'), output_dir=tmp_path)
+
+    with patch('src.report.os.scandir') as mock_scandir:
+        # When
+        result = list(report.get_reports())
+
+        # Then
+        mock_scandir.assert_not_called()
+        assert result == [dict(input_file='/input/b.pdf', output_dir=str(tmp_path / 'b'), lang='FRA')]
+
+def test_get_reports_with_rescan(tmp_path):
+    # Given
+    create_output_dir(tmp_path / 'a')
+    Manifest.from_output_dir(tmp_path).append(dict(input_file='/input/b.pdf', output_dir=str(tmp_path / 'b'), lang='FRA'))
+    report = Report(report_file=Path('dummy_report_file'), output_dir=tmp_path, rescan=True)
+
+    # When
+    result = list(report.get_reports())
+
+    # Then
+    assert [Path(r['output_dir']).name for r in result] == ['a']
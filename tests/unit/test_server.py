@@ -0,0 +1,126 @@
+import json
+import pytest
+import socket
+import threading
+import urllib.error
+import urllib.request
+
+from pathlib import Path
+from src.pld import PdfLanguageDetector
+from src.server import DetectionServer
+from unittest.mock import patch
+
+ENGLISH = "The quick brown fox jumps over the lazy dog while the children are playing in the garden."
+
+@pytest.fixture
+def serve():
+    servers = []
+    def serve(detection_server, **options):
+        http_server = detection_server.create_http_server(**options)
+        thread = threading.Thread(target=http_server.serve_forever, daemon=True)
+        thread.start()
+        servers.append(http_server)
+        return http_server
+    yield serve
+    for http_server in servers:
+        http_server.shutdown()
+        http_server.server_close()
+
+def post(http_server, body, content_type='application/pdf'):
+    url = f'http://127.0.0.1:{http_server.server_address[1]}/detect'
+    request = urllib.request.Request(url, data=body, headers={'Content-Type': content_type})
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, json.load(response)
+    except urllib.error.HTTPError as error:
+        return error.code, json.load(error)
+
+def pdftotext(*args):
+    if Path(args[-2]).read_bytes() == b'broken':
+        raise Exception('broken PDF file')
+    return f'{ENGLISH}\f'
+
+def test_detect(serve, tmp_path):
+    # Given
+    input_file = tmp_path / 'test.pdf'
+    input_file.write_bytes(b'%PDF-1.4 content')
+    detection_server = DetectionServer(['eng', 'fra'], workers=1, batch_size=2, min_text_chars=10)
+    with patch('src.pld.pdftotext', side_effect=pdftotext), detection_server.start():
+        http_server = serve(detection_server, host='127.0.0.1', port=0)
+        # When
+        uploaded = post(http_server, b'%PDF-1.4 content')
+        listed = post(http_server, json.dumps(dict(path=str(input_file))).encode(), 'application/json')
+        broken = post(http_server, b'broken')
+    # Then
+    assert uploaded[0] == 200
+    assert uploaded[1]['lang'] == 'ENG'
+    assert uploaded[1]['avgs']['ENG'] > uploaded[1]['avgs']['FRA']
+    assert listed[1]['lang'] == 'ENG'
+    assert broken[0] == 422
+    assert broken[1]['status'] == PdfLanguageDetector.STATUS_FAILED
+    assert detection_server.futures == dict()
+
+def test_reject_when_queue_is_full(serve):
+    # Given
+    detection_server = DetectionServer(['eng', 'fra'], queue_size=1)
+    http_server = serve(detection_server, host='127.0.0.1', port=0)
+    # Without workers, the first request stays in the queue
+    detection_server.submit(b'%PDF')
+    # When
+    code, result = post(http_server, b'%PDF')
+    # Then
+    assert code == 503
+    assert list(detection_server.futures) == [1]
+
+def test_timeout_when_worker_doesnt_answer(serve):
+    # Given
+    detection_server = DetectionServer(['eng', 'fra'], request_timeout=0.1)
+    http_server = serve(detection_server, host='127.0.0.1', port=0)
+    # When, without workers to analyse the request
+    code, result = post(http_server, b'%PDF')
+    # Then
+    assert code == 504
+    assert detection_server.futures == dict()
+
+def test_dispatch_result_of_forgotten_request():
+    # Given
+    detection_server = DetectionServer(['eng', 'fra'])
+    future = detection_server.submit(b'%PDF')
+    detection_server.forget(future)
+    detection_server.results_queue.put((1, dict(status=PdfLanguageDetector.STATUS_DONE)))
+    detection_server.results_queue.put((None, None))
+    # When
+    detection_server.dispatch_results()
+    # Then
+    assert not future.done()
+    assert detection_server.futures == dict()
+
+def test_reject_invalid_json(serve):
+    # Given
+    detection_server = DetectionServer(['eng', 'fra'])
+    http_server = serve(detection_server, host='127.0.0.1', port=0)
+    # When
+    code, result = post(http_server, b'{"file": "test.pdf"}', 'application/json')
+    # Then
+    assert code == 400
+
+def test_health_on_unix_socket(serve, tmp_path):
+    # Given
+    socket_path = tmp_path / 'pld.sock'
+    detection_server = DetectionServer(['eng', 'fra'], workers=2)
+    serve(detection_server, socket_path=socket_path)
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.connect(str(socket_path))
+    # When
+    client.sendall(b'GET /health HTTP/1.0\r\n\r\n')
+    with client.makefile('rb') as source:
+        response = source.read()
+    client.close()
+    # Then
+    assert response.startswith(b'HTTP/1.0 200')
+    assert json.loads(response.split(b'\r\n\r\n', 1)[1]) == dict(status='ok', workers=2, pending=0)
+
+def test_unknown_option():
+    # When / Then
+    with pytest.raises(ValueError):
+        DetectionServer(['eng', 'fra'], resume=True)
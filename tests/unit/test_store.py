@@ -0,0 +1,111 @@
+import pickle
+import pytest
+
+from pathlib import Path
+from src.store import MemoryStore, SqliteStore
+
+
+@pytest.fixture
+def sqlite_store(tmp_path):
+    return SqliteStore.from_output_dir(tmp_path / 'out')
+
+def test_from_output_dir(tmp_path):
+    # When
+    store = SqliteStore.from_output_dir(tmp_path)
+    # Then
+    assert store.store_file == tmp_path / 'results.sqlite'
+
+def test_get_unknown_meta(sqlite_store, tmp_path):
+    # When
+    result = sqlite_store.get_meta(tmp_path / 'out' / 'test')
+    # Then
+    assert result == dict()
+
+def test_save_and_update_meta(sqlite_store, tmp_path):
+    # Given
+    output_file_dir = tmp_path / 'out' / 'test'
+    sqlite_store.save_meta(output_file_dir, dict(input_file='/input/test.pdf'))
+    # When
+    sqlite_store.update_meta(output_file_dir, dict(pages_used=2))
+    # Then
+    assert sqlite_store.get_meta(output_file_dir) == dict(input_file='/input/test.pdf', pages_used=2)
+
+def test_save_and_get_pages(sqlite_store, tmp_path):
+    # Given
+    output_file_dir = tmp_path / 'out' / 'test'
+    sqlite_store.save_page(output_file_dir, 'page-2', 'Deux', dict(ENG=0, FRA=1))
+    sqlite_store.save_page(output_file_dir, 'page-1', 'One', dict(ENG=1, FRA=0))
+    # When
+    result = sqlite_store.get_pages(output_file_dir)
+    # Then
+    assert result == [
+        dict(name='page-1', text='One', langs=dict(ENG=1, FRA=0)),
+        dict(name='page-2', text='Deux', langs=dict(ENG=0, FRA=1)),
+    ]
+
+@pytest.mark.parametrize('store', ['sqlite', 'memory'])
+def test_get_pages_by_number(tmp_path, store):
+    # Given
+    store = SqliteStore.from_output_dir(tmp_path / 'out') if store == 'sqlite' else MemoryStore()
+    output_file_dir = tmp_path / 'out' / 'test'
+    for number in (10, 2, 11, 1, 3, 4, 5, 6, 7, 8, 9):
+        store.save_page(output_file_dir, f'page-{number}', 'text', dict(ENG=1.0))
+    # When
+    result = store.get_pages(output_file_dir)
+    # Then
+    assert [page['name'] for page in result] == [f'page-{number}' for number in range(1, 12)]
+
+def test_save_and_get_avgs(sqlite_store, tmp_path):
+    # Given
+    output_file_dir = tmp_path / 'out' / 'test'
+    sqlite_store.save_meta(output_file_dir, dict(input_file='/input/test.pdf'))
+    assert sqlite_store.get_avgs(output_file_dir) is None
+    # When
+    sqlite_store.save_avgs(output_file_dir, dict(ENG=0.2, FRA=0.8))
+    # Then
+    assert sqlite_store.get_avgs(output_file_dir) == dict(ENG=0.2, FRA=0.8)
+
+def test_get_documents(sqlite_store, tmp_path):
+    # Given
+    for name in ('b', 'a', 'c'):
+        sqlite_store.save_meta(tmp_path / 'out' / name, dict(input_file=f'/input/{name}.pdf'))
+    sqlite_store.save_avgs(tmp_path / 'out' / 'b', dict(ENG=1, FRA=0))
+    sqlite_store.save_avgs(tmp_path / 'out' / 'a', dict(ENG=0, FRA=1))
+    sqlite_store.commit()
+    # When
+    result = list(SqliteStore(sqlite_store.store_file).get_documents())
+    # Then
+    assert result == [
+        (dict(input_file='/input/a.pdf'), dict(ENG=0, FRA=1)),
+        (dict(input_file='/input/b.pdf'), dict(ENG=1, FRA=0)),
+    ]
+
+def test_uncommitted_writes_are_not_visible(sqlite_store, tmp_path):
+    # Given
+    sqlite_store.save_meta(tmp_path / 'out' / 'test', dict(input_file='/input/test.pdf'))
+    # When
+    result = SqliteStore(sqlite_store.store_file).get_meta(tmp_path / 'out' / 'test')
+    # Then
+    assert result == dict()
+
+def test_pickle_without_connection(sqlite_store, tmp_path):
+    # Given
+    sqlite_store.save_meta(tmp_path / 'out' / 'test', dict(input_file='/input/test.pdf'))
+    sqlite_store.commit()
+    # When
+    copy = pickle.loads(pickle.dumps(sqlite_store))
+    # Then
+    assert copy.get_meta(tmp_path / 'out' / 'test') == dict(input_file='/input/test.pdf')
+
+def test_memory_store_keeps_documents_apart():
+    # Given
+    store = MemoryStore()
+    store.save_meta(Path('document-1'), dict())
+    store.save_page(Path('document-1'), 'page-2', 'text', dict(ENG=1.0))
+    store.save_page(Path('document-1'), 'page-1', 'text', dict(FRA=1.0))
+    store.save_page(Path('document-2'), 'page-1', 'text', dict(ENG=1.0))
+    # When
+    store.delete(Path('document-2'))
+    # Then
+    assert [page['name'] for page in store.get_pages(Path('document-1'))] == ['page-1', 'page-2']
+    assert list(store.documents) == ['document-1']
@@ -0,0 +1,129 @@
+import contextlib
+import os
+import pytest
+import time
+
+from multiprocessing import Pool
+from pathlib import Path
+from src.workqueue import WORK_QUEUES, Coordinator, FilesystemWorkQueue, SqliteWorkQueue, WorkQueue
+from unittest.mock import patch
+
+
+@pytest.fixture(params=[SqliteWorkQueue.BACKEND_NAME, FilesystemWorkQueue.BACKEND_NAME])
+def work_queue_class(request):
+    return WORK_QUEUES[request.param]
+
+@pytest.fixture
+def work_queue(work_queue_class, tmp_path):
+    return work_queue_class(tmp_path / 'queue')
+
+def claim_all(work_queue_class, location):
+    work_queue = work_queue_class(location)
+    claimed = []
+    while (input_file := work_queue.claim()) is not None:
+        claimed.append(str(input_file))
+    return claimed
+
+def test_put_ignores_files_already_queued(work_queue, tmp_path):
+    # When
+    first = work_queue.put([tmp_path / 'a.pdf', tmp_path / 'b.pdf'])
+    second = work_queue.put([tmp_path / 'b.pdf', tmp_path / 'c.pdf'])
+    # Then
+    assert (first, second) == (2, 1)
+    assert work_queue.get_counts()[WorkQueue.STATE_PENDING] == 3
+
+def test_claim_and_complete(work_queue, tmp_path):
+    # Given
+    work_queue.put([tmp_path / 'a.pdf', tmp_path / 'b.pdf'])
+    # When
+    first, second, third = work_queue.claim(), work_queue.claim(), work_queue.claim()
+    work_queue.complete(first, dict(status='DONE', lang='ENG'))
+    work_queue.complete(second, dict(status='FAILED '))
+    results, cursor = work_queue.get_results()
+    # Then
+    assert sorted([first, second]) == [tmp_path / 'a.pdf', tmp_path / 'b.pdf']
+    assert third is None
+    assert work_queue.claims == set()
+    assert results == [dict(status='DONE', lang='ENG', input_file=str(first)),
+                       dict(status='FAILED ', input_file=str(second))]
+    assert work_queue.get_results(cursor) == ([], cursor)
+    assert work_queue.get_counts() == {WorkQueue.STATE_PENDING: 0, WorkQueue.STATE_CLAIMED: 0,
+                                       WorkQueue.STATE_DONE: 1, WorkQueue.STATE_FAILED: 1}
+    assert work_queue.is_finished()
+
+def test_claim_expired_lease(work_queue_class, tmp_path):
+    # Given
+    dead_node = work_queue_class(tmp_path / 'queue', lease_duration=0.5)
+    node = work_queue_class(tmp_path / 'queue', lease_duration=0.5)
+    dead_node.put([tmp_path / 'a.pdf'])
+    claimed = dead_node.claim()
+    # When
+    before_expiry = node.claim()
+    time.sleep(1)
+    after_expiry = node.claim()
+    # Then
+    assert before_expiry is None
+    assert not node.is_finished()
+    assert after_expiry == claimed
+
+def test_dont_claim_lease_renewed_after_listing(tmp_path):
+    # Given
+    busy_node = FilesystemWorkQueue(tmp_path / 'queue', lease_duration=0.5)
+    node = FilesystemWorkQueue(tmp_path / 'queue', lease_duration=0.5)
+    busy_node.put([tmp_path / 'a.pdf'])
+    claimed = busy_node.claim()
+    time.sleep(1)
+    claimed_dir = busy_node.get_state_dir(WorkQueue.STATE_CLAIMED)
+    real_scandir = os.scandir
+    def scandir(path):
+        # List the expired task, then renew it before the node takes it
+        entries = list(real_scandir(path))
+        for entry in entries:
+            entry.stat()
+        if Path(path) == claimed_dir:
+            busy_node.renew([claimed])
+        return contextlib.nullcontext(entries)
+    with patch('src.workqueue.os.scandir', side_effect=scandir):
+        # When
+        result = node.claim()
+    # Then
+    assert result is None
+    assert busy_node.get_counts()[WorkQueue.STATE_CLAIMED] == 1
+
+def test_renew_keeps_lease(work_queue_class, tmp_path):
+    # Given
+    busy_node = work_queue_class(tmp_path / 'queue', lease_duration=1)
+    node = work_queue_class(tmp_path / 'queue', lease_duration=1)
+    busy_node.put([tmp_path / 'a.pdf'])
+    busy_node.claim()
+    # When
+    time.sleep(0.7)
+    busy_node.renew_claims()
+    time.sleep(0.7)
+    # Then
+    assert node.claim() is None
+
+def test_concurrent_claims(work_queue_class, tmp_path):
+    # Given
+    input_files = [tmp_path / f'{index}.pdf' for index in range(100)]
+    work_queue_class(tmp_path / 'queue').put(input_files)
+    # When
+    with Pool(4) as pool:
+        claims = pool.starmap(claim_all, [(work_queue_class, tmp_path / 'queue')] * 4)
+    # Then
+    claimed = sum(claims, [])
+    assert sorted(claimed) == sorted(str(input_file) for input_file in input_files)
+
+def test_coordinator_wait(work_queue, tmp_path, capsys):
+    # Given
+    coordinator = Coordinator(work_queue)
+    coordinator.enqueue([tmp_path / 'a.pdf', tmp_path / 'b.pdf'])
+    work_queue.complete(work_queue.claim(), dict(status='DONE', lang='FRA'))
+    work_queue.complete(work_queue.claim(), dict(status='FAILED '))
+    # When
+    coordinator.wait()
+    # Then
+    output = capsys.readouterr().out
+    assert '2 PDF files added to the work queue' in output
+    assert 'FRA' in output and 'FAILED' in output
+    assert '1 PDF files done, 1 failed' in output